@@ -1,34 +1,153 @@
-from typing import List, Optional
-from ninja import NinjaAPI, Schema
-from core import llm_service
+from datetime import datetime
+from typing import Literal
+from uuid import UUID
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from ninja import Field, NinjaAPI, Query, Schema
+from ninja.errors import HttpError
+from pydantic import AnyHttpUrl
+from typing_extensions import TypedDict
+from core import batch, llm_service
+from core.admission import CostExceedsBurst, RateLimitExceeded, aadmit, aclient_identity, in_flight
+from core.conversation_store import conversation_store
+from core.idempotency import IdempotencyConflict, IdempotencyInProgress, idempotency, idempotency_key
+from core.jobs import UnsafeWebhookURL, aenqueue, check_webhook_url, job_payload
+from core.metrics import render_metrics
+from core.streaming import format_sse_event
+from travel_app.models import GuidanceJob
+from .renderers import ORJSONParser, ORJSONRenderer
+
+Role = Literal["system", "user", "assistant"]
+
+# A TypedDict rather than a Schema/model: messages are still validated field by field, but
+# stay plain dicts, so long histories need no per-message object construction and are passed
+# to the LLM service as-is
+class Message(TypedDict):
+    role: Role
+    content: str
 
 # Define request schema for travel guidance
 class TravelGuidanceRequest(Schema):
     user_message: str
-    messages: Optional[List[dict]] = None
+    messages: list[Message] | None = None
+    bypass_cache: bool = False
 
 class TravelGuidanceResponse(Schema):
     response: str
-    messages: List[dict]
+    messages: list[Message]
+
+class ConversationRequest(Schema):
+    user_message: str
+    conversation_id: str | None = None
+    bypass_cache: bool = False
+
+class ConversationResponse(Schema):
+    conversation_id: str
+    response: str
+
+class ConversationSummary(Schema):
+    conversation_id: str
+    title: str
+    turn_count: int
+    created_at: datetime
+    updated_at: datetime
+
+class ConversationListResponse(Schema):
+    conversations: list[ConversationSummary]
+    next_cursor: str | None = None
+
+class TurnSchema(Schema):
+    index: int
+    messages: list[Message]
+
+class TurnPageResponse(Schema):
+    turns: list[TurnSchema]
+    next_cursor: int | None = None
+
+class BatchTravelGuidanceRequest(Schema):
+    requests: list[TravelGuidanceRequest] = Field(..., min_length=1)
+    concurrency: int | None = Field(None, ge=1)
+    stream: bool = False
+
+class BatchItemResult(Schema):
+    index: int
+    response: str | None = None
+    messages: list[Message] | None = None
+    error: str | None = None
+
+class BatchTravelGuidanceResponse(Schema):
+    results: list[BatchItemResult]
+
+class TravelGuidanceJobRequest(TravelGuidanceRequest):
+    webhook_url: AnyHttpUrl | None = None
+
+class JobResponse(Schema):
+    job_id: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    response: str | None = None
+    messages: list[Message] | None = None
+    error: str | None = None
+    created_at: datetime
+    finished_at: datetime | None = None
 
 # Create the main API instance
 api = NinjaAPI(
     title="Travel Copilot API",
     version="1.0.0",
-    description="API for travel planning co-pilot assistance"
+    description="API for travel planning co-pilot assistance",
+    # orjson parses and renders large message histories several times faster than the stdlib
+    parser=ORJSONParser(),
+    renderer=ORJSONRenderer(),
 )
 
+@api.exception_handler(RateLimitExceeded)
+def rate_limited(request, exc):
+    """Reject requests that are over their rate limit or cannot get an LLM slot in time."""
+    response = api.create_response(request, {"detail": exc.detail}, status=429)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+@api.exception_handler(CostExceedsBurst)
+def cost_exceeds_burst(request, exc):
+    """Reject requests (e.g. batches) needing more LLM calls than the rate limit ever allows at once."""
+    return api.create_response(request, {"detail": exc.detail}, status=413)
+
+@api.exception_handler(IdempotencyConflict)
+def idempotency_conflict(request, exc):
+    """Reject reuse of an idempotency key for a different request."""
+    return api.create_response(request, {"detail": exc.detail}, status=422)
+
+@api.exception_handler(IdempotencyInProgress)
+def idempotency_in_progress(request, exc):
+    """The original request for this idempotency key is still running - retry later."""
+    response = api.create_response(request, {"detail": exc.detail}, status=409)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
+
+
 # Register the travel guidance endpoint - singleton for LLM service
+# Async handler so that under ASGI the LLM round trip does not pin a worker
 @api.post("/travel-guidance/", response=TravelGuidanceResponse)
-def travel_guidance(request, data: TravelGuidanceRequest):
+async def travel_guidance(request, data: TravelGuidanceRequest, response: HttpResponse):
     """
     Endpoint to get travel guidance from the LLM service. Text responses are generated based on user input 
     and returned along with the updated conversation history. Returned text is raw and unformatted (markdown).
     Please note that this endpoint is designed to be a singleton, meaning it does not support multiple concurrent requests 
     as it maintains a single conversation state.
     
+    Identical requests are served from the response cache; set `bypass_cache` to force a fresh answer.
+    Requests over the per-client rate limit, or arriving while the server is saturated, get a
+    429 with a `Retry-After` header.
+
+    Send an `Idempotency-Key` header to make retries safe: the first answer for a key is
+    replayed (with `Idempotent-Replayed: true`) to retries and concurrent duplicates instead
+    of calling the LLM again. Error responses are not replayed, so a retry runs again.
+    Reusing a key for a different request body gets a 422.
+    
     Args:
-        data: TravelGuidanceRequest containing user_message and optional messages history
+        data: TravelGuidanceRequest containing user_message, optional messages history and bypass_cache flag
         
     Returns:
         TravelGuidanceResponse: AI response and updated message history.
@@ -53,16 +172,314 @@ def travel_guidance(request, data: TravelGuidanceRequest):
         }
     ```
     """
+    key = idempotency_key(request)
+    if key is None:
+        return await _travel_guidance(request, data)
+
+    result, replayed = await idempotency.arun(
+        f"travel-guidance:{await aclient_identity(request)}", key, idempotency.fingerprint(request.body),
+        lambda: _travel_guidance(request, data),
+        store=lambda result: result.messages[-1]["role"] == "assistant",
+    )
+    if replayed:
+        response["Idempotent-Replayed"] = "true"
+    return result
+
+async def _travel_guidance(request, data: TravelGuidanceRequest) -> TravelGuidanceResponse:
+    await aadmit(request)
+    async with in_flight.aslot():
+        try:
+            response, updated_messages = await llm_service.aget_travel_guidance(
+                data.user_message, data.messages, bypass_cache=data.bypass_cache
+            )
+            return TravelGuidanceResponse(response=response, messages=updated_messages)
+        except Exception as e:
+            # Handle any unexpected errors
+            error_response = f"An error occurred: {e!s}"
+            return TravelGuidanceResponse(
+                response=error_response, 
+                messages=[{"role": "system", "content": "Error occurred during processing"}]
+            )
+
+async def _travel_guidance_event_stream(data: TravelGuidanceRequest):
+    """
+    Translate LLM stream events into SSE frames while holding an in-flight slot.
+    The slot is only taken once the body is iterated, so a response that is never consumed
+    (or whose client disconnects first) cannot leak it.
+    """
     try:
-        response, updated_messages = llm_service.get_travel_guidance(data.user_message, data.messages)
-        return TravelGuidanceResponse(response=response, messages=updated_messages)
-    except Exception as e:
-        # Handle any unexpected errors
-        error_response = f"An error occurred: {str(e)}"
-        return TravelGuidanceResponse(
-            response=error_response, 
-            messages=[{"role": "system", "content": "Error occurred during processing"}]
+        async with in_flight.aslot():
+            async for event in llm_service.astream_travel_guidance(
+                data.user_message, data.messages, bypass_cache=data.bypass_cache
+            ):
+                event_type = event.pop("type")
+                yield format_sse_event(event_type, event)
+    except RateLimitExceeded as e:
+        # Headers are already sent, so a saturated process reports the rejection as an error event
+        yield format_sse_event("error", {"response": e.detail, "messages": []})
+
+
+@api.post("/travel-guidance/stream/")
+async def travel_guidance_stream(request, data: TravelGuidanceRequest):
+    """
+    Streaming variant of the travel guidance endpoint using Server-Sent Events (SSE).
+    Text is emitted token-by-token as it is generated, so clients can render the answer
+    within a few hundred milliseconds instead of waiting for the full completion.
+
+    Args:
+        data: TravelGuidanceRequest containing user_message and optional messages history
+
+    Returns:
+        StreamingHttpResponse: `text/event-stream` with the following events:
+            - `delta`: `{"text": "..."}` for each generated text fragment
+            - `done`: `{"response": "...", "messages": [...]}` once generation completes
+            - `error`: `{"response": "...", "messages": [...]}` if the LLM call fails or
+              no in-flight slot frees up in time
+
+    ```
+    EXAMPLE:
+
+        POST /travel-guidance/stream/
+        {
+            "user_message": "What are the best places to visit in Tokyo?",
+            "messages": []
+        }
+
+        event: delta
+        data: {"text": "Tokyo"}
+
+        event: delta
+        data: {"text": " is a vibrant city..."}
+
+        event: done
+        data: {"response": "Tokyo is a vibrant city...", "messages": [...]}
+    ```
+    """
+    # The rate limit is checked before the response starts so rejections can still be a 429
+    await aadmit(request)
+    response = StreamingHttpResponse(
+        _travel_guidance_event_stream(data),
+        content_type="text/event-stream"
+    )
+    # Disable caching and proxy buffering so events are flushed as they are produced
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _batch_ndjson_stream(items: list, concurrency: int | None):
+    """Emit one NDJSON line per batch item as soon as it finishes."""
+    async for result in batch.iter_batch_travel_guidance(items, concurrency):
+        yield orjson.dumps(result) + b"\n"
+
+
+@api.post("/travel-guidance/batch/", response=BatchTravelGuidanceResponse)
+async def travel_guidance_batch(request, data: BatchTravelGuidanceRequest):
+    """
+    Batch endpoint running many independent travel guidance requests concurrently against
+    the LLM. Fan-out is bounded by `concurrency` (capped by the server-side limit). Results
+    are returned in request order and a failing item reports its own `error` without
+    failing the batch. Set `stream` to receive NDJSON lines in completion order instead.
+    Each item costs one rate limit token; a batch with more items than `LLM_RATE_LIMIT_BURST`
+    could never be admitted and is rejected with a 413.
+
+    Args:
+        data: BatchTravelGuidanceRequest containing the list of requests, optional concurrency and stream flag
+
+    Returns:
+        BatchTravelGuidanceResponse: per-item results in request order, or an
+        `application/x-ndjson` stream of results as each one finishes.
+
+    ```
+    EXAMPLE:
+
+        POST /travel-guidance/batch/
+        {
+            "requests": [
+                {"user_message": "What are the best places to visit in Tokyo?"},
+                {"user_message": "What are the best places to visit in Lisbon?"}
+            ],
+            "concurrency": 4
+        }
+    ```
+    """
+    max_items = getattr(settings, 'LLM_BATCH_MAX_ITEMS', 100)
+    if len(data.requests) > max_items:
+        raise HttpError(400, f"A batch may contain at most {max_items} requests")
+    # Each item is one LLM call; items also take in-flight slots individually as they run
+    await aadmit(request, cost=len(data.requests))
+
+    items = [item.model_dump() for item in data.requests]
+    if data.stream:
+        return StreamingHttpResponse(
+            _batch_ndjson_stream(items, data.concurrency),
+            content_type="application/x-ndjson"
+        )
+
+    results = await batch.batch_travel_guidance(items, data.concurrency)
+    return BatchTravelGuidanceResponse(results=results)
+
+
+@api.post("/conversations/", response=ConversationResponse)
+async def conversation_turn(request, data: ConversationRequest):
+    """
+    Stateful variant of the travel guidance endpoint. The conversation history is stored
+    server-side, so clients only send the new user message and receive only the new
+    assistant message - payload size stays constant however long the conversation gets.
+    Omit `conversation_id` to start a new conversation; the returned ID continues it.
+
+    Args:
+        data: ConversationRequest containing user_message and optional conversation_id
+
+    Returns:
+        ConversationResponse: conversation ID and the new AI response.
+
+    ```
+    EXAMPLES:
+
+        POST /conversations/ (new conversation)
+        {
+            "user_message": "What are the best places to visit in Tokyo?"
+        }
+
+        POST /conversations/ (follow-up)
+        {
+            "conversation_id": "3f2b9c0d8e7a4b6c9d1e2f3a4b5c6d7e",
+            "user_message": "What about cultural sites?"
+        }
+    ```
+    """
+    await aadmit(request)
+    user = await request.auser()
+    if data.conversation_id is None:
+        conversation_id, turns = conversation_store.new_id(), []
+    else:
+        conversation_id = data.conversation_id
+        # Conversations owned by another user are indistinguishable from unknown ones
+        turns = await conversation_store.aget(conversation_id)
+        if turns is None or not await conversation_store.acan_access(conversation_id, user):
+            raise HttpError(404, "Conversation not found or expired")
+
+    async with in_flight.aslot():
+        response, updated_messages = await llm_service.aget_travel_guidance(
+            data.user_message, conversation_store.to_llm_messages(turns), bypass_cache=data.bypass_cache
         )
+    # Only record the exchange when the LLM actually answered - only the new turn is written
+    if updated_messages[-1]["role"] == "assistant":
+        await conversation_store.aappend(conversation_id, updated_messages[-2:], user=user)
+    elif data.conversation_id is None:
+        await conversation_store.acreate(conversation_id, user=user)
+
+    return ConversationResponse(conversation_id=conversation_id, response=response)
+
+
+@api.get("/conversations/", response=ConversationListResponse)
+async def list_conversations(request, before: str | None = None, limit: int = Query(20, ge=1, le=100)):
+    """
+    List the logged-in user's conversations, most recently updated first.
+    Pass the returned `next_cursor` as `before` to get the next page; it is null on the last page.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise HttpError(401, "Authentication required")
+    try:
+        conversations, next_cursor = await conversation_store.alist_conversations(user, before=before, limit=limit)
+    except ValueError:
+        raise HttpError(400, "Invalid cursor")
+    return ConversationListResponse(
+        conversations=[
+            ConversationSummary(
+                conversation_id=conversation.pk.hex, title=conversation.title, turn_count=conversation.turn_count,
+                created_at=conversation.created_at, updated_at=conversation.updated_at,
+            )
+            for conversation in conversations
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@api.get("/conversations/{conversation_id}/turns/", response=TurnPageResponse)
+async def conversation_turns(request, conversation_id: str, before: int | None = Query(None, ge=0),
+                             limit: int = Query(20, ge=1, le=100)):
+    """
+    Page through a conversation's turns, newest page first and each page in order.
+    Pass the returned `next_cursor` (the index of the oldest turn returned) as `before`
+    to get the previous page; it is null once the first turn has been returned.
+    """
+    length = await conversation_store.alength(conversation_id)
+    if length is None or not await conversation_store.acan_access(conversation_id, await request.auser()):
+        raise HttpError(404, "Conversation not found or expired")
+    end = length if before is None else min(before, length)
+    start = max(0, end - limit)
+    turns = await conversation_store.aget_turns(conversation_id, start, end)
+    return TurnPageResponse(
+        turns=[TurnSchema(index=start + offset, messages=messages) for offset, messages in enumerate(turns)],
+        next_cursor=start or None,
+    )
+
+
+@api.post("/jobs/", response={202: JobResponse})
+async def create_job(request, data: TravelGuidanceJobRequest):
+    """
+    Background variant of the travel guidance endpoint for long answers (e.g. itineraries).
+    The request is queued and a job ID returned immediately, so no connection or web worker
+    is held while the LLM generates. Poll `GET /jobs/{job_id}/` for the result, or pass a
+    `webhook_url` to have the finished job POSTed to it (signed with `X-Signature-256` when
+    a webhook secret is configured).
+
+    Args:
+        data: TravelGuidanceJobRequest containing user_message, optional messages history,
+              bypass_cache flag and optional webhook_url
+
+    Returns:
+        JobResponse: the queued job, with status `queued`.
+
+    ```
+    EXAMPLE:
+
+        POST /jobs/
+        {
+            "user_message": "Plan a two week itinerary through Japan.",
+            "webhook_url": "https://example.com/hooks/travel-copilot"
+        }
+    ```
+    """
+    await aadmit(request)
+    webhook_url = str(data.webhook_url) if data.webhook_url else ""
+    if webhook_url:
+        try:
+            # Resolving the host blocks, so it runs off the event loop
+            await sync_to_async(check_webhook_url)(webhook_url)
+        except UnsafeWebhookURL as e:
+            raise HttpError(422, str(e))
+    job = await aenqueue(
+        data.user_message, data.messages, bypass_cache=data.bypass_cache, webhook_url=webhook_url,
+    )
+    return job_payload(job)
+
+
+@api.get("/jobs/{job_id}/", response=JobResponse)
+async def get_job(request, job_id: UUID):
+    """
+    Status and, once finished, result of a background job. `status` moves from `queued`
+    to `running` to `succeeded` (with `response` and `messages`) or `failed` (with `error`).
+    """
+    job = await GuidanceJob.objects.filter(pk=job_id).afirst()
+    if job is None:
+        raise HttpError(404, "Job not found or expired")
+    return job_payload(job)
+
+
+@api.get("/metrics/", include_in_schema=False)
+def metrics(request):
+    """
+    Prometheus scrape endpoint - LLM latency, errors and tokens, cache hit rates, markdown
+    render time, session size and in-flight gauges, aggregated across worker processes
+    when `PROMETHEUS_MULTIPROC_DIR` is set.
+    """
+    payload, content_type = render_metrics()
+    return HttpResponse(payload, content_type=content_type)
+
 
 @api.get("/health-check/")
 def health_check(request):
@@ -0,0 +1,22 @@
+import orjson
+from ninja.parser import Parser
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+
+class ORJSONParser(Parser):
+    """Parse JSON request bodies with orjson."""
+
+    def parse_body(self, request):
+        return orjson.loads(request.body)
+
+
+class ORJSONRenderer(BaseRenderer):
+    """
+    Render JSON responses with orjson. Types orjson does not handle natively (e.g. Decimal,
+    pydantic models) fall back to Ninja's JSON encoder.
+    """
+    media_type = "application/json"
+
+    def render(self, request, data, *, response_status):
+        return orjson.dumps(data, default=NinjaJSONEncoder().default)
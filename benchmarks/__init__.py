@@ -0,0 +1,7 @@
+"""
+Offline load-testing harness.
+
+`fake_cohere` is a local stand-in for Cohere's v2 chat API, `loadgen` drives the app's
+endpoints with concurrent clients, and `run` wires the two together around a gunicorn
+server: `python -m benchmarks.run --help`.
+"""
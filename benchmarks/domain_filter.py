@@ -0,0 +1,95 @@
+"""
+Offline evaluation of the domain pre-filter (see core.domain_filter) on the labeled questions in
+`benchmarks/domain_queries.jsonl`, which are kept disjoint from the training examples. For each
+threshold it reports the share of out-of-domain questions that would be refused without an LLM
+call, the share of travel questions wrongly refused, and the precision of the refusals, plus
+the training time and the per-question scoring latency.
+
+    python -m benchmarks.domain_filter --thresholds 0.9 0.95 0.98 0.99
+"""
+import argparse
+import json
+import os
+import time
+
+QUERIES = os.path.join(os.path.dirname(__file__), "domain_queries.jsonl")
+
+
+def load(path: str = QUERIES) -> list:
+    """Return the labeled questions as `(text, label)` pairs."""
+    with open(path, encoding="utf-8") as f:
+        return [(row["text"], row["label"]) for row in map(json.loads, f) if row]
+
+
+def evaluate(scored: list, threshold: float) -> dict:
+    """Rejection and false-refusal rates for `(score, label)` pairs at `threshold`."""
+    from core.domain_filter import OUT_OF_DOMAIN, TRAVEL
+
+    out = [score for score, label in scored if label == OUT_OF_DOMAIN]
+    travel = [score for score, label in scored if label == TRAVEL]
+    rejected = sum(score >= threshold for score in out)
+    false_refusals = sum(score >= threshold for score in travel)
+    return {
+        "threshold": threshold,
+        "llm_calls_saved": round(rejected / len(out), 3) if out else 0.0,
+        "false_refusals": round(false_refusals / len(travel), 3) if travel else 0.0,
+        "precision": round(rejected / (rejected + false_refusals), 3) if rejected + false_refusals else 1.0,
+    }
+
+
+def run(thresholds, repeat: int, path: str = QUERIES) -> dict:
+    from core import domain_examples
+    from core.domain_filter import OUT_OF_DOMAIN, TRAVEL, DomainClassifier
+
+    started = time.perf_counter()
+    classifier = DomainClassifier().fit(
+        [(text, TRAVEL) for text in domain_examples.TRAVEL]
+        + [(text, OUT_OF_DOMAIN) for text in domain_examples.OUT_OF_DOMAIN]
+    )
+    train_ms = (time.perf_counter() - started) * 1000
+
+    queries = load(path)
+    scored = [(classifier.score(text), label) for text, label in queries]
+
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for text, _ in queries:
+                classifier.score(text)
+        best = min(best, (time.perf_counter() - started) / (repeat * len(queries)))
+
+    return {
+        "queries": len(queries),
+        "train_ms": round(train_ms, 2),
+        "score_us": round(best * 1e6, 1),
+        "thresholds": [evaluate(scored, threshold) for threshold in thresholds],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thresholds", nargs="+", type=float, default=[0.9, 0.95, 0.98, 0.99])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--queries", default=QUERIES, help="JSONL file of {\"text\", \"label\"} rows")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "travel_copilot.settings")
+    import django
+    django.setup()
+
+    report = run(args.thresholds, args.repeat, args.queries)
+    print(f"{report['queries']} questions, trained in {report['train_ms']}ms, {report['score_us']}us per question")
+    for row in report["thresholds"]:
+        print(
+            f"threshold={row['threshold']:<5} LLM calls saved={row['llm_calls_saved']:>6.1%}  "
+            f"false refusals={row['false_refusals']:>6.1%}  precision={row['precision']:>6.1%}"
+        )
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
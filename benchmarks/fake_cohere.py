@@ -0,0 +1,212 @@
+"""
+Local stand-in for Cohere's v2 chat API.
+
+Implements `POST /v2/chat` for both the JSON and the streaming (SSE) contract used by
+`cohere.ClientV2.chat` / `chat_stream`, with configurable latency, error rates and token
+rate, so the app can be load tested without calling the real service. Point the app at
+it with `LLM_API_BASE_URL=http://127.0.0.1:<port>`.
+
+    python -m benchmarks.fake_cohere --port 8123 --ttft-median 0.4 --tokens-per-second 80
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = (
+    "explore", "the", "old", "town", "at", "sunrise", "then", "take", "the", "tram",
+    "to", "the", "riverside", "market", "where", "local", "vendors", "sell", "pastries",
+    "and", "fresh", "fruit", "before", "an", "afternoon", "museum", "visit", "and",
+    "dinner",
+)
+
+
+@dataclass
+class FakeCohereConfig:
+    """
+    Behaviour of the fake server.
+
+    Args:
+        ttft_median (float): Median time to first token in seconds (log-normally distributed)
+        ttft_sigma (float): Log-normal sigma of the time to first token - higher means a longer tail
+        tokens_per_second (float): Generation speed after the first token
+        output_tokens (int): Number of generated tokens per response
+        error_rate (float): Fraction of requests failing with a 500
+        rate_limit_rate (float): Fraction of requests rejected with a 429
+    """
+    ttft_median: float = 0.3
+    ttft_sigma: float = 0.5
+    tokens_per_second: float = 100.0
+    output_tokens: int = 120
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+
+    def sample_ttft(self) -> float:
+        if self.ttft_median <= 0:
+            return 0.0
+        return random.lognormvariate(0, self.ttft_sigma) * self.ttft_median
+
+
+def _estimate_input_tokens(messages: list) -> int:
+    return sum(len(str(message.get("content", ""))) // 4 + 1 for message in messages)
+
+
+def _response_tokens(config: FakeCohereConfig) -> list:
+    return [random.choice(WORDS) + " " for _ in range(config.output_tokens)]
+
+
+def _usage(input_tokens: int, output_tokens: int) -> dict:
+    counts = {"input_tokens": input_tokens, "output_tokens": output_tokens}
+    return {"billed_units": counts, "tokens": counts}
+
+
+class FakeCohereHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeCohere/1.0"
+
+    @property
+    def config(self) -> FakeCohereConfig:
+        return self.server.config
+
+    def log_message(self, format, *args):
+        # Access logs would dominate the benchmark output
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send_json(400, {"message": "invalid JSON body"})
+        if self.path.rstrip("/") != "/v2/chat":
+            return self._send_json(404, {"message": f"unknown path {self.path}"})
+
+        self.server.count("requests")
+        roll = random.random()
+        if roll < self.config.rate_limit_rate:
+            self.server.count("rate_limited")
+            return self._send_json(429, {"message": "fake rate limit"})
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self.server.count("errors")
+            return self._send_json(500, {"message": "fake internal error"})
+
+        input_tokens = _estimate_input_tokens(request.get("messages", []))
+        tokens = _response_tokens(self.config)
+        time.sleep(self.config.sample_ttft())
+        if request.get("stream"):
+            self._stream(tokens, input_tokens)
+        else:
+            time.sleep(len(tokens) / self.config.tokens_per_second)
+            self._send_json(200, {
+                "id": uuid.uuid4().hex,
+                "finish_reason": "COMPLETE",
+                "message": {"role": "assistant", "content": [{"type": "text", "text": "".join(tokens).strip()}]},
+                "usage": _usage(input_tokens, len(tokens)),
+            })
+
+    def _stream(self, tokens: list, input_tokens: int):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        # No length is known up front, so the end of the stream is signalled by closing the connection
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def send(event: dict):
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+        send({"type": "message-start", "id": uuid.uuid4().hex, "delta": {"message": {"role": "assistant"}}})
+        send({"type": "content-start", "index": 0, "delta": {"message": {"content": {"type": "text", "text": ""}}}})
+        delay = 1 / self.config.tokens_per_second
+        for token in tokens:
+            time.sleep(delay)
+            send({"type": "content-delta", "index": 0, "delta": {"message": {"content": {"text": token}}}})
+        send({"type": "content-end", "index": 0})
+        send({
+            "type": "message-end",
+            "delta": {"finish_reason": "COMPLETE", "usage": _usage(input_tokens, len(tokens))},
+        })
+
+
+class FakeCohereServer(ThreadingHTTPServer):
+    """Threaded HTTP server serving `FakeCohereHandler` with request counters."""
+    daemon_threads = True
+
+    def __init__(self, address: tuple = ("127.0.0.1", 0), config: FakeCohereConfig = None):
+        super().__init__(address, FakeCohereHandler)
+        self.config = config or FakeCohereConfig()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def start(self) -> "FakeCohereServer":
+        """Serve in a background thread and return self."""
+        threading.Thread(target=self.serve_forever, name="fake-cohere", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser):
+    defaults = FakeCohereConfig()
+    parser.add_argument("--ttft-median", type=float, default=defaults.ttft_median)
+    parser.add_argument("--ttft-sigma", type=float, default=defaults.ttft_sigma)
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--output-tokens", type=int, default=defaults.output_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+
+
+def config_from_args(args: argparse.Namespace) -> FakeCohereConfig:
+    return FakeCohereConfig(
+        ttft_median=args.ttft_median,
+        ttft_sigma=args.ttft_sigma,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8123)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = FakeCohereServer((args.host, args.port), config_from_args(args))
+    print(f"Fake Cohere v2 API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Concurrent load generator for the travel guidance endpoints.
+
+Each virtual user owns an HTTP client (and therefore its own session cookie) and sends
+requests back to back for the configured duration. Targets:
+
+- `api`: `POST /api/travel-guidance/` with a JSON body
+- `api-stream`: `POST /api/travel-guidance/stream/`, reading the SSE stream to the end
+- `view`: the HTMX form `POST /`, including the CSRF handshake
+- `view-stream`: the flow the UI uses - the HTMX form `POST /stream/`, then the SSE stream
+  it subscribes to
+
+Streaming targets also report how long the first event took to arrive, and count a stream
+that ends with an `error` event as failed even though its status was 200.
+
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 --target view-stream --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import statistics
+import time
+import uuid
+from dataclasses import dataclass, field
+
+QUESTIONS = (
+    "What are the best places to visit in Tokyo?",
+    "Plan a three day itinerary for Lisbon.",
+    "What local dishes should I try in Mexico City?",
+    "Which museums are worth visiting in Paris?",
+    "What should I pack for a winter trip to Iceland?",
+)
+
+
+def percentile(samples: list, q: float) -> float:
+    """Nearest-rank percentile (0-100) of `samples`."""
+    if not samples:
+        return float("nan")
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+@dataclass
+class LoadResult:
+    """Outcome of one load run."""
+    target: str
+    concurrency: int
+    elapsed: float
+    latencies: list = field(default_factory=list)
+    first_event_latencies: list = field(default_factory=list)
+    statuses: dict = field(default_factory=dict)
+
+    @property
+    def requests(self) -> int:
+        return sum(self.statuses.values())
+
+    def summary(self) -> dict:
+        ok = self.statuses.get(200, 0)
+        summary = {
+            "target": self.target,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "throughput_rps": round(self.requests / self.elapsed, 2) if self.elapsed else 0.0,
+            "success_rate": round(ok / self.requests, 4) if self.requests else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "mean_ms": round(statistics.fmean(self.latencies) * 1000, 1) if self.latencies else float("nan"),
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+        }
+        if self.first_event_latencies:
+            summary["first_event_p50_ms"] = round(percentile(self.first_event_latencies, 50) * 1000, 1)
+            summary["first_event_p95_ms"] = round(percentile(self.first_event_latencies, 95) * 1000, 1)
+        return summary
+
+
+def _question(unique: bool) -> str:
+    question = random.choice(QUESTIONS)
+    # A unique suffix defeats the response cache so every request reaches the LLM
+    return f"{question} (ref {uuid.uuid4().hex[:8]})" if unique else question
+
+
+STREAM_URL = re.compile(r"streamAiResponse\(\$el, '([^']+)'\)")
+
+
+async def _read_event_stream(response, started: float):
+    """Consume an SSE response, returning its status and when the first event arrived."""
+    first_event_at, last_event = None, None
+    async for line in response.aiter_lines():
+        if line.startswith("event:"):
+            last_event = line.removeprefix("event:").strip()
+            if first_event_at is None:
+                first_event_at = time.perf_counter() - started
+    if response.status_code == 200 and last_event != "done":
+        return f"stream {last_event or 'incomplete'}", first_event_at
+    return response.status_code, first_event_at
+
+
+async def _api_request(client, unique: bool, started: float):
+    response = await client.post(
+        "/api/travel-guidance/",
+        content=json.dumps({"user_message": _question(unique)}),
+        headers={"Content-Type": "application/json"},
+    )
+    return response.status_code, None
+
+
+async def _api_stream_request(client, unique: bool, started: float):
+    async with client.stream(
+        "POST",
+        "/api/travel-guidance/stream/",
+        content=json.dumps({"user_message": _question(unique)}),
+        headers={"Content-Type": "application/json"},
+    ) as response:
+        return await _read_event_stream(response, started)
+
+
+async def _post_form(client, path: str, unique: bool):
+    if "csrftoken" not in client.cookies:
+        await client.get("/")
+    return await client.post(
+        path,
+        data={"user_message": _question(unique)},
+        headers={
+            "HX-Request": "true",
+            "X-CSRFToken": client.cookies.get("csrftoken", ""),
+            "Referer": f"{client.base_url}/",
+        },
+    )
+
+
+async def _view_request(client, unique: bool, started: float):
+    return (await _post_form(client, "/", unique)).status_code, None
+
+
+async def _view_stream_request(client, unique: bool, started: float):
+    response = await _post_form(client, "/stream/", unique)
+    match = STREAM_URL.search(response.text)
+    if response.status_code != 200 or match is None:
+        return response.status_code, None
+    async with client.stream("GET", match.group(1)) as events:
+        return await _read_event_stream(events, started)
+
+
+TARGETS = {
+    "api": _api_request,
+    "api-stream": _api_stream_request,
+    "view": _view_request,
+    "view-stream": _view_stream_request,
+}
+
+
+async def run_load(base_url: str, target: str = "api", concurrency: int = 16, duration: float = 10.0,
+                   unique: bool = True, timeout: float = 120.0) -> LoadResult:
+    """
+    Drive `target` with `concurrency` virtual users for `duration` seconds.
+
+    Args:
+        base_url (str): Root URL of the running app
+        target (str): One of TARGETS
+        concurrency (int): Number of concurrent virtual users
+        duration (float): Seconds to keep sending new requests
+        unique (bool): Make every question unique so responses are not served from cache
+        timeout (float): Per-request timeout in seconds
+
+    Returns:
+        LoadResult: Latencies of completed requests and counts per status code
+    """
+    import httpx
+
+    send = TARGETS[target]
+    result = LoadResult(target=target, concurrency=concurrency, elapsed=0.0)
+    deadline = time.monotonic() + duration
+
+    async def user():
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout) as client:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    status, first_event = await send(client, unique, started)
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                else:
+                    result.latencies.append(time.perf_counter() - started)
+                    if first_event is not None:
+                        result.first_event_latencies.append(first_event)
+                result.statuses[status] = result.statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def format_summary(summary: dict) -> str:
+    first_event = (
+        f"first_event_p50={summary['first_event_p50_ms']}ms  first_event_p95={summary['first_event_p95_ms']}ms  "
+        if "first_event_p50_ms" in summary else ""
+    )
+    return (
+        f"{summary['target']:>11} c={summary['concurrency']:<4} "
+        f"{summary['requests']:>6} req  {summary['throughput_rps']:>8.2f} req/s  "
+        f"ok={summary['success_rate']:.2%}  p50={summary['p50_ms']}ms  "
+        f"p95={summary['p95_ms']}ms  p99={summary['p99_ms']}ms  {first_event}statuses={summary['statuses']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="api")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--cacheable", action="store_true", help="Reuse a fixed set of questions so the cache can answer")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.base_url, args.target, args.concurrency, args.duration, unique=not args.cacheable))
+    print(format_summary(result.summary()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+End-to-end offline benchmark.
+
+Starts the fake Cohere server, launches the app under gunicorn pointed at it (via
+`LLM_API_BASE_URL`), drives each target with the load generator and reports throughput,
+p50/p95/p99 latency, time to the first streamed event and peak resident memory per worker
+process. Gunicorn runs with the production config (`travel_copilot.gunicorn_conf`), so the
+preload and warm-up in the master are part of what is measured; `--no-preload` turns them off
+for comparison. By default the streaming endpoints the UI and API clients use are driven.
+
+    python -m benchmarks.run --workers 2 --concurrency 8 32 --duration 20 --targets api-stream view-stream
+
+Rate limiting is disabled and every question is made unique by default, so the numbers
+measure the full request path rather than the limiter or the response cache. The app runs
+against a throwaway SQLite database, never the project's `db.sqlite3`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from .fake_cohere import FakeCohereServer, add_config_arguments, config_from_args
+from .loadgen import TARGETS, format_summary, run_load
+
+ROOT = Path(__file__).resolve().parent.parent
+WORKER_CLASSES = {
+    "asgi": ("uvicorn.workers.UvicornWorker", "travel_copilot.asgi:application"),
+    "wsgi": ("sync", "travel_copilot.wsgi:application"),
+}
+DATABASE_CACHE = "django.core.cache.backends.db.DatabaseCache"
+
+
+def _children(pid: int) -> list:
+    """Return the child PIDs of `pid` (Linux /proc only)."""
+    children = []
+    for task in Path(f"/proc/{pid}/task").glob("*/children"):
+        children.extend(int(child) for child in task.read_text().split())
+    return children
+
+
+def _rss_mb(pid: int):
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler:
+    """Samples the peak RSS of every gunicorn worker in a background thread."""
+
+    def __init__(self, master_pid: int, interval: float = 0.25):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in _children(self.master_pid):
+                rss = _rss_mb(pid)
+                if rss is not None:
+                    self.peaks[pid] = max(rss, self.peaks.get(pid, 0.0))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> dict:
+        return {str(pid): round(peak, 1) for pid, peak in sorted(self.peaks.items())}
+
+
+def _wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited before becoming ready")
+        try:
+            if httpx.get(f"{base_url}/api/health-check/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App did not become ready within {timeout}s")
+
+
+def _server_env(args, fake_url: str, data_dir: Path) -> dict:
+    return {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{data_dir / 'db.sqlite3'}",
+        "LLM_API_BASE_URL": fake_url,
+        "COHERE_API_KEY": os.environ.get("COHERE_API_KEY", "fake-benchmark-key"),
+        "LLM_RATE_LIMIT_ENABLED": "true" if args.rate_limit else "false",
+        "LLM_MAX_IN_FLIGHT": str(args.max_in_flight),
+        # Settings read by travel_copilot.gunicorn_conf
+        "GUNICORN_BIND": f"127.0.0.1:{args.port}",
+        "WEB_CONCURRENCY": str(args.workers),
+        "GUNICORN_WORKER_CLASS": WORKER_CLASSES[args.worker_type][0],
+        "GUNICORN_PRELOAD": "false" if args.no_preload else "true",
+        # The config wipes this directory on start, so it must never be one the caller uses
+        "PROMETHEUS_MULTIPROC_DIR": str(data_dir / "prometheus"),
+        # The local backend skips HTTP entirely and isolates the app's own overhead
+        "LLM_DEFAULT_BACKEND": "local" if args.backend == "local" else os.environ.get("LLM_DEFAULT_BACKEND", "command-a"),
+        "LLM_LOCAL_LATENCY": str(args.ttft_median),
+        # With several workers, the conversations and sessions of a virtual user must be visible
+        # to whichever worker serves its next request, so this run keeps them in the database
+        "CONVERSATION_CACHE_BACKEND": os.environ.get("CONVERSATION_CACHE_BACKEND", DATABASE_CACHE),
+        "SESSION_CACHE_BACKEND": os.environ.get("SESSION_CACHE_BACKEND", DATABASE_CACHE),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765, help="Port for the app under test")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--worker-type", choices=sorted(WORKER_CLASSES), default="asgi")
+    parser.add_argument("--threads", type=int, default=8, help="Threads per sync (wsgi) worker")
+    parser.add_argument("--targets", nargs="+", choices=sorted(TARGETS), default=["api-stream", "view-stream"])
+    parser.add_argument("--no-preload", action="store_true", help="Start workers cold instead of forking a warmed-up master")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[8, 32])
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--backend", choices=["fake-cohere", "local"], default="fake-cohere",
+                        help="Serve answers from the fake Cohere server or the in-process local backend")
+    parser.add_argument("--rate-limit", action="store_true", help="Keep per-client rate limiting enabled")
+    parser.add_argument("--cacheable", action="store_true", help="Reuse a fixed set of questions so the cache can answer")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    fake = FakeCohereServer(config=config_from_args(args)).start()
+    base_url = f"http://127.0.0.1:{args.port}"
+    app = WORKER_CLASSES[args.worker_type][1]
+    # Every worker shares the database, so it is a temporary file rather than in-memory
+    with tempfile.TemporaryDirectory(prefix="travel-copilot-benchmark-") as data_dir:
+        env = _server_env(args, fake.base_url, Path(data_dir))
+        os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+        # Sessions and conversations used by the HTMX view live in the database cache
+        for management_command in (["migrate", "--noinput"], ["createcachetable"]):
+            subprocess.run([sys.executable, "manage.py", *management_command], cwd=ROOT, env=env, check=True, capture_output=True)
+        command = [
+            sys.executable, "-m", "gunicorn", "-c", "python:travel_copilot.gunicorn_conf",
+            "--threads", str(args.threads), app,
+        ]
+        server = subprocess.Popen(command, cwd=ROOT, env=env)
+        report = {"fake_cohere": vars(config_from_args(args)), "runs": []}
+        try:
+            _wait_until_ready(base_url, server)
+            for target in args.targets:
+                for concurrency in args.concurrency:
+                    with MemorySampler(server.pid) as memory:
+                        result = asyncio.run(run_load(base_url, target, concurrency, args.duration, unique=not args.cacheable))
+                    summary = {**result.summary(), "peak_rss_mb_per_worker": memory.summary()}
+                    report["runs"].append(summary)
+                    print(format_summary(summary), f"rss_mb={summary['peak_rss_mb_per_worker']}")
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+            fake.stop()
+    report["fake_cohere"]["counters"] = fake.counters
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Microbenchmark of the travel guidance API's JSON path through Django Ninja: parse the request
+body, validate it against the request schema, then validate and render the response carrying
+the history back. The LLM call is left out - each variant is an echo endpoint. The stdlib
+parser/renderer with untyped `dict` messages is compared against the orjson parser/renderer
+with the typed `Message` schema used by the API.
+
+    python -m benchmarks.serialization --sizes 10 100 500 --repeat 200
+"""
+import argparse
+import json
+import os
+import time
+
+
+def _history(size: int) -> list:
+    roles = ("user", "assistant")
+    content = "Spend the morning in the old town, then take the tram to the river for lunch. " * 4
+    return [{"role": "system", "content": "You are a travel assistant."}] + [
+        {"role": roles[i % 2], "content": f"{i}: {content}"} for i in range(size - 1)
+    ]
+
+
+def _clients() -> dict:
+    """Build an echo endpoint per variant and return Ninja test clients for them."""
+    from ninja import NinjaAPI, Schema
+    from ninja.testing import TestClient
+
+    from api.api import TravelGuidanceRequest, TravelGuidanceResponse
+    from api.renderers import ORJSONParser, ORJSONRenderer
+
+    class UntypedRequest(Schema):
+        user_message: str
+        messages: list[dict] | None = None
+        bypass_cache: bool = False
+
+    class UntypedResponse(Schema):
+        response: str
+        messages: list[dict]
+
+    stdlib_api = NinjaAPI(urls_namespace="bench-stdlib")
+    orjson_api = NinjaAPI(urls_namespace="bench-orjson", parser=ORJSONParser(), renderer=ORJSONRenderer())
+
+    @stdlib_api.post("/", response=UntypedResponse)
+    def stdlib_echo(request, data: UntypedRequest):
+        return UntypedResponse(response="Enjoy!", messages=data.messages)
+
+    @orjson_api.post("/", response=TravelGuidanceResponse)
+    def orjson_echo(request, data: TravelGuidanceRequest):
+        return TravelGuidanceResponse(response="Enjoy!", messages=data.messages)
+
+    return {"stdlib": TestClient(stdlib_api), "orjson": TestClient(orjson_api)}
+
+
+def bench(client, body: bytes, repeat: int) -> float:
+    """Return the best-of-5 mean time per request in microseconds."""
+    response = client.post("/", data=body, content_type="application/json")
+    assert response.status_code == 200, response.content
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            client.post("/", data=body, content_type="application/json")
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1e6
+
+
+def run(sizes, repeat: int) -> list:
+    clients = _clients()
+    rows = []
+    for size in sizes:
+        body = json.dumps({"user_message": "And the food?", "messages": _history(size)}).encode()
+        timings = {name: bench(client, body, repeat) for name, client in clients.items()}
+        rows.append({
+            "messages": size,
+            "body_kb": round(len(body) / 1024, 1),
+            **{f"{name}_us": round(value, 1) for name, value in timings.items()},
+            "speedup": round(timings["stdlib"] / timings["orjson"], 2),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "travel_copilot.settings")
+    import django
+    django.setup()
+
+    for row in run(args.sizes, args.repeat):
+        print(
+            f"{row['messages']:>5} messages {row['body_kb']:>7} KB  stdlib={row['stdlib_us']:>9.1f}us  "
+            f"orjson={row['orjson_us']:>9.1f}us  speedup={row['speedup']}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
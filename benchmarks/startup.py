@@ -0,0 +1,138 @@
+"""
+Startup-time report: import cost of the app and first-request latency of a fresh worker.
+
+1. Imports - in a fresh interpreter, times `django.setup()`, loading the ASGI application
+   and each warm-up step (the work a cold worker would otherwise do on its first request).
+2. First requests - starts gunicorn with a single worker twice, cold (no preload, no
+   warm-up) and warm (the defaults of `travel_copilot/gunicorn_conf.py`), against the fake
+   Cohere server, and times the boot until the worker serves, then the first and second
+   page load and API call of each.
+
+    python -m benchmarks.startup
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from .fake_cohere import FakeCohereConfig, FakeCohereServer
+from .run import ROOT
+
+IMPORT_PROFILE = """
+import json, os, time
+started = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "travel_copilot.settings")
+import django
+django.setup()
+setup = time.perf_counter()
+from travel_copilot.asgi import application
+loaded = time.perf_counter()
+from core.startup import warm_up
+steps = warm_up(connect=False)
+print(json.dumps({"django_setup": setup - started, "asgi_application": loaded - setup, **steps}))
+"""
+
+# Logged by each uvicorn worker once it accepts requests
+READY_LINE = "Application startup complete"
+
+PROFILES = {
+    "cold": {"GUNICORN_PRELOAD": "false", "STARTUP_WARM_UP": "false", "STARTUP_PRECONNECT": "false"},
+    "warm": {"GUNICORN_PRELOAD": "true", "STARTUP_WARM_UP": "true", "STARTUP_PRECONNECT": "true"},
+}
+
+
+def profile_imports() -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROFILE], cwd=ROOT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _wait_until_booted(process: subprocess.Popen, timeout: float = 60.0):
+    """
+    Wait for the worker to report it is serving, without sending a request that would warm it up.
+    """
+    ready = threading.Event()
+
+    def watch():
+        # Keep draining after the worker is up so the server never blocks on a full pipe
+        for line in process.stderr:
+            if READY_LINE in line:
+                ready.set()
+
+    threading.Thread(target=watch, daemon=True).start()
+    if not ready.wait(timeout):
+        raise RuntimeError(f"gunicorn worker did not boot within {timeout}s")
+
+
+def _timed(send) -> float:
+    started = time.perf_counter()
+    response = send()
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def profile_first_requests(name: str, port: int, fake_url: str) -> dict:
+    import httpx
+
+    env = {
+        **os.environ,
+        **PROFILES[name],
+        "LLM_API_BASE_URL": fake_url,
+        "COHERE_API_KEY": os.environ.get("COHERE_API_KEY", "fake-benchmark-key"),
+        "LLM_RATE_LIMIT_ENABLED": "false",
+        "WEB_CONCURRENCY": "1",
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+    }
+    command = [sys.executable, "-m", "gunicorn", "-c", "python:travel_copilot.gunicorn_conf",
+               "travel_copilot.asgi:application"]
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    try:
+        _wait_until_booted(server)
+        report = {"profile": name, "boot": time.perf_counter() - started}
+        base_url = f"http://127.0.0.1:{port}"
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            for attempt in ("first", "second"):
+                report[f"{attempt}_page"] = _timed(lambda: client.get("/"))
+                report[f"{attempt}_api"] = _timed(lambda: client.post(
+                    "/api/travel-guidance/", json={"user_message": f"Where should I go? {uuid.uuid4().hex}"}
+                ))
+        return report
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    imports = profile_imports()
+    print("imports  " + "  ".join(f"{step}={seconds * 1000:.0f}ms" for step, seconds in imports.items()))
+
+    fake = FakeCohereServer(config=FakeCohereConfig(ttft_median=0, tokens_per_second=10000, output_tokens=16)).start()
+    runs = []
+    try:
+        for name in PROFILES:
+            run = profile_first_requests(name, args.port, fake.base_url)
+            runs.append(run)
+            print(f"{name:<5}    " + "  ".join(
+                f"{key}={value * 1000:.0f}ms" for key, value in run.items() if key != "profile"
+            ))
+    finally:
+        fake.stop()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"imports": imports, "runs": runs}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
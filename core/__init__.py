@@ -5,7 +5,17 @@ This module contains the core business logic for the Travel Copilot application,
 including LLM service integration with Cohere for travel guidance.
 """
 
-from .llm_service import get_travel_guidance
+from .llm_service import (
+    aget_travel_guidance,
+    astream_travel_guidance,
+    get_travel_guidance,
+    stream_travel_guidance,
+)
 
 __version__ = "0.1.0"
-__all__ = ["get_travel_guidance"]
+__all__ = [
+    "aget_travel_guidance",
+    "astream_travel_guidance",
+    "get_travel_guidance",
+    "stream_travel_guidance",
+]
@@ -0,0 +1,351 @@
+"""
+Admission control for the LLM endpoints.
+
+Every request is charged against a per-client token bucket kept in the shared
+`rate_limits` cache, so the limit holds across worker processes. Admitted requests then
+take one of a fixed number of in-flight LLM slots in this process; when all slots are
+busy a request queues briefly and is then rejected instead of piling up on the workers.
+Rejections raise `RateLimitExceeded`, which the API and views turn into a 429 with a
+`Retry-After` header. A request costing more than a full bucket (e.g. a large batch) could
+never be admitted and raises `CostExceedsBurst` instead.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+RATE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is not admitted. `retry_after` is in whole seconds."""
+
+    def __init__(self, retry_after: float, detail: str = "Too many requests, please try again later."):
+        super().__init__(detail)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class CostExceedsBurst(Exception):
+    """Raised when a single request needs more tokens than a full bucket holds."""
+
+    def __init__(self, cost: int, burst: int):
+        detail = f"This request needs {cost} LLM calls, but at most {burst} are allowed at once."
+        super().__init__(detail)
+        self.cost = cost
+        self.burst = burst
+        self.detail = detail
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """
+    Parse a rate such as "30/m" or "1000/day" into (requests, period in seconds).
+    Uses the same format as `NINJA_DEFAULT_THROTTLE_RATES`.
+    """
+    num, period = rate.split("/")
+    return int(num), RATE_UNITS[period.strip()[0]]
+
+
+def _hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def _api_key_identity(request):
+    # Only configured keys are trusted - otherwise a caller could send a fresh random key with
+    # every request to get a fresh bucket. Keys are hashed so they never reach the cache in clear.
+    api_key = request.headers.get("X-API-Key")
+    if api_key:
+        hashed = _hash_api_key(api_key)
+        known = {_hash_api_key(key) for key in getattr(settings, 'LLM_RATE_LIMIT_API_KEYS', ())}
+        if hashed in known:
+            return "key:" + hashed[:32]
+    return None
+
+
+def _session_key(request):
+    session = getattr(request, "session", None)
+    return session.session_key if session is not None else None
+
+
+def _ip_identity(request) -> str:
+    # Honour X-Forwarded-For only for as many proxies as we are configured to trust
+    num_proxies = getattr(settings, 'NINJA_NUM_PROXIES', 0)
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(",")]
+        return f"ip:{addresses[-min(num_proxies, len(addresses))]}"
+    return f"ip:{request.META.get('REMOTE_ADDR', 'unknown')}"
+
+
+def client_identity(request) -> str:
+    """
+    Identify the caller for rate limiting: trusted API key, then session, then client IP.
+    The session key is only the cookie the client sent, so it is used once the session
+    exists on the server - a forged cookie per request would otherwise get a fresh bucket.
+    """
+    identity = _api_key_identity(request)
+    if identity:
+        return identity
+    session_key = _session_key(request)
+    if session_key and request.session.exists(session_key):
+        return f"session:{session_key}"
+    return _ip_identity(request)
+
+
+async def aclient_identity(request) -> str:
+    """
+    Async variant of `client_identity`.
+    """
+    identity = _api_key_identity(request)
+    if identity:
+        return identity
+    session_key = _session_key(request)
+    if session_key and await request.session.aexists(session_key):
+        return f"session:{session_key}"
+    return _ip_identity(request)
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets stored in a Django cache alias.
+    Each bucket holds at most `burst` tokens and refills at the configured rate; a request
+    costs one token per LLM call it makes. Bucket updates are serialized per client with a short
+    `cache.add` lock so concurrent workers cannot double-spend tokens; a request that cannot take
+    the lock in time is rejected rather than admitted uncharged.
+    """
+    LOCK_TIMEOUT = 1
+    LOCK_WAIT = 0.05
+
+    def __init__(self, alias: str = "rate_limits"):
+        self.alias = alias
+        self._stats_lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_RATE_LIMIT_ENABLED', True)
+
+    def _policy(self) -> tuple[float, float]:
+        requests, period = parse_rate(getattr(settings, 'LLM_RATE_LIMIT', "30/m"))
+        burst = getattr(settings, 'LLM_RATE_LIMIT_BURST', None) or requests
+        return requests / period, burst
+
+    def _take(self, state, cost: int, now: float) -> tuple[dict, float]:
+        """Refill the bucket and try to take `cost` tokens; return the new state and the wait in seconds."""
+        rate, burst = self._policy()
+        if state is None:
+            tokens = burst
+        else:
+            tokens = min(burst, state["tokens"] + (now - state["updated"]) * rate)
+        if tokens >= cost:
+            return {"tokens": tokens - cost, "updated": now}, 0.0
+        return {"tokens": tokens, "updated": now}, (cost - tokens) / rate
+
+    def _check_cost(self, cost: int):
+        # Waiting would never help a request that needs more tokens than the bucket can hold
+        _, burst = self._policy()
+        if cost > burst:
+            with self._stats_lock:
+                self.limited += 1
+            raise CostExceedsBurst(cost, burst)
+
+    def _record(self, wait: float, identity: str):
+        with self._stats_lock:
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+        if wait:
+            logger.info("Rate limited %s for %.1fs", identity, wait)
+            raise RateLimitExceeded(wait)
+
+    def _ttl(self) -> int:
+        # A bucket left alone long enough to refill completely is equivalent to no bucket
+        rate, burst = self._policy()
+        return math.ceil(burst / rate) + 1
+
+    def consume(self, identity: str, cost: int = 1):
+        """
+        Take `cost` tokens from the caller's bucket.
+
+        Raises:
+            RateLimitExceeded: If the bucket does not hold enough tokens
+            CostExceedsBurst: If `cost` is more than a full bucket holds
+        """
+        if not self.enabled:
+            return
+        self._check_cost(cost)
+        key, lock_key = f"ratelimit:{identity}", f"ratelimit-lock:{identity}"
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while not self.cache.add(lock_key, 1, self.LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                # Failing open would let a concurrent burst through without being charged
+                self._record(self.LOCK_WAIT, identity)
+            time.sleep(0.002)
+        try:
+            state, wait = self._take(self.cache.get(key), cost, time.time())
+            self.cache.set(key, state, self._ttl())
+        finally:
+            self.cache.delete(lock_key)
+        self._record(wait, identity)
+
+    async def aconsume(self, identity: str, cost: int = 1):
+        """
+        Async variant of `consume`.
+        """
+        if not self.enabled:
+            return
+        self._check_cost(cost)
+        key, lock_key = f"ratelimit:{identity}", f"ratelimit-lock:{identity}"
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while not await self.cache.aadd(lock_key, 1, self.LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                self._record(self.LOCK_WAIT, identity)
+            await asyncio.sleep(0.002)
+        try:
+            state, wait = self._take(await self.cache.aget(key), cost, time.time())
+            await self.cache.aset(key, state, self._ttl())
+        finally:
+            await self.cache.adelete(lock_key)
+        self._record(wait, identity)
+
+    def stats(self) -> dict:
+        """Return counters for admitted and rate-limited requests in this process."""
+        with self._stats_lock:
+            return {"allowed": self.allowed, "limited": self.limited}
+
+    def reset_stats(self):
+        """Reset counters."""
+        with self._stats_lock:
+            self.allowed = 0
+            self.limited = 0
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the number of in-flight LLM calls in this process.
+    Callers wait up to `LLM_ADMISSION_QUEUE_TIMEOUT` seconds for a free slot and are then
+    rejected. Threads and coroutines share the same slots.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.rejected = 0
+
+    @property
+    def limit(self) -> int:
+        return getattr(settings, 'LLM_MAX_IN_FLIGHT', 32)
+
+    @property
+    def queue_timeout(self) -> float:
+        return getattr(settings, 'LLM_ADMISSION_QUEUE_TIMEOUT', 2.0)
+
+    def _try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return True
+            return False
+
+    def _reject(self):
+        with self._condition:
+            self.rejected += 1
+        raise RateLimitExceeded(
+            getattr(settings, 'LLM_ADMISSION_RETRY_AFTER', 1),
+            "The service is busy, please try again shortly."
+        )
+
+    def acquire(self):
+        """
+        Take an in-flight slot, waiting briefly for one to free up.
+
+        Raises:
+            RateLimitExceeded: If no slot frees up within the queue timeout
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        with self._condition:
+            while self.in_flight >= self.limit:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._reject()
+                self._condition.wait(remaining)
+            self.in_flight += 1
+
+    async def aacquire(self):
+        """
+        Async variant of `acquire` - polls so the event loop is never blocked on the lock.
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        while not self._try_acquire():
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(0.01)
+
+    def release(self):
+        """Give back an in-flight slot."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        """Return the current number of in-flight calls and the rejection counter."""
+        with self._condition:
+            return {"in_flight": self.in_flight, "limit": self.limit, "rejected": self.rejected}
+
+    def reset_stats(self):
+        """Reset counters."""
+        with self._condition:
+            self.rejected = 0
+
+
+# Process-wide admission control singletons
+rate_limiter = TokenBucketLimiter()
+in_flight = ConcurrencyLimiter()
+
+
+def admit(request, cost: int = 1):
+    """
+    Charge the caller's rate limit bucket.
+
+    Raises:
+        RateLimitExceeded: If the caller is over its rate limit
+        CostExceedsBurst: If `cost` is more than a full bucket holds
+    """
+    rate_limiter.consume(client_identity(request), cost)
+
+
+async def aadmit(request, cost: int = 1):
+    """
+    Async variant of `admit`.
+    """
+    await rate_limiter.aconsume(await aclient_identity(request), cost)
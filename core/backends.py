@@ -0,0 +1,415 @@
+"""
+Pluggable LLM backends and latency-aware routing between them.
+
+Backends are configured like Django caches, by name in `LLM_BACKENDS`:
+
+    LLM_BACKENDS = {
+        "command-a": {"BACKEND": "core.llm_service.CohereBackend", "MODEL": "command-a-03-2025"},
+        "local": {"BACKEND": "core.backends.LocalBackend", "OPTIONS": {"LATENCY": 0.05}},
+    }
+
+`router` picks the backend for each request. With `LLM_ROUTER_ENABLED`, short first-turn
+questions go to the fast backend and everything else to the default one; each backend's
+latency is tracked with an EWMA and a degraded backend (slow, failing or with an open
+circuit) is moved behind its alternative. Each backend has its own resilience policy, so
+one failing model never trips the circuit breaker of another.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .context_window import estimate_tokens
+from .metrics import track_llm_call
+from .resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientCaller,
+    is_retryable,
+    resilient_chat,
+)
+
+
+class LLMBackend:
+    """
+    Interface for chat backends. Messages use the Cohere v2 role/content format and
+    `timeout` is the per-attempt deadline in seconds.
+    """
+
+    def __init__(self, name: str, model: str | None = None, options: dict | None = None):
+        self.name = name
+        self.model = model
+        self.options = options or {}
+
+    @property
+    def model_name(self) -> str:
+        """Model answering for this backend - part of the response cache key."""
+        return self.model or self.name
+
+    def chat(self, messages: list, timeout: float) -> str:
+        """Return the assistant text for `messages`."""
+        raise NotImplementedError
+
+    async def achat(self, messages: list, timeout: float) -> str:
+        """Async variant of `chat`."""
+        raise NotImplementedError
+
+    def chat_stream(self, messages: list, timeout: float):
+        """Yield text fragments of the assistant response as they are generated."""
+        raise NotImplementedError
+
+    async def achat_stream(self, messages: list, timeout: float):
+        """Async variant of `chat_stream`."""
+        raise NotImplementedError
+        yield
+
+
+class LocalBackend(LLMBackend):
+    """
+    Deterministic in-process backend for tests and benchmarks.
+    The same conversation always produces the same answer, optionally after `LATENCY`
+    seconds and emitted in `TOKENS` word-sized fragments.
+    """
+    WORDS = (
+        "visit", "the", "historic", "centre", "early", "then", "try", "the", "local",
+        "market", "for", "lunch", "and", "spend", "the", "evening", "walking", "along",
+        "the", "waterfront", "before", "dinner", "at", "a", "family", "run",
+        "restaurant",
+    )
+
+    @property
+    def latency(self) -> float:
+        return self.options.get("LATENCY", 0.0)
+
+    def _tokens(self, messages: list) -> list:
+        question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        seed = int.from_bytes(hashlib.sha256(question.encode("utf-8")).digest()[:8], "big")
+        count = self.options.get("TOKENS", 24)
+        words = [self.WORDS[(seed + i * 7) % len(self.WORDS)] for i in range(count)]
+        return [f"{word} " for word in words]
+
+    def chat(self, messages: list, timeout: float) -> str:
+        time.sleep(self.latency)
+        return "".join(self._tokens(messages)).strip()
+
+    async def achat(self, messages: list, timeout: float) -> str:
+        await asyncio.sleep(self.latency)
+        return "".join(self._tokens(messages)).strip()
+
+    def chat_stream(self, messages: list, timeout: float):
+        time.sleep(self.latency)
+        yield from self._tokens(messages)
+
+    async def achat_stream(self, messages: list, timeout: float):
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(messages):
+            yield token
+
+
+class BackendRegistry:
+    """
+    Named backend instances, built on first use from `LLM_BACKENDS`.
+    Backends may also be registered programmatically with `register`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backends = {}
+
+    def __getitem__(self, name: str) -> LLMBackend:
+        backend = self._backends.get(name)
+        if backend is None:
+            with self._lock:
+                backend = self._backends.get(name)
+                if backend is None:
+                    config = getattr(settings, 'LLM_BACKENDS', {}).get(name)
+                    if config is None:
+                        raise KeyError(f"Unknown LLM backend {name!r}")
+                    backend_class = import_string(config["BACKEND"])
+                    backend = backend_class(name, config.get("MODEL"), config.get("OPTIONS"))
+                    self._backends[name] = backend
+        return backend
+
+    def register(self, name: str, backend: LLMBackend):
+        with self._lock:
+            self._backends[name] = backend
+
+    def clear(self):
+        """Drop built backends so they are rebuilt from settings."""
+        with self._lock:
+            self._backends.clear()
+
+
+class ModelRouter:
+    """
+    Routes chat requests to a backend and falls back to the alternative when it fails.
+
+    A degraded backend is only tried after the healthy one, so it would get no traffic to
+    prove it has recovered. Like the circuit breaker's half-open state, once it has been
+    demoted for `LLM_ROUTER_PROBE_INTERVAL` seconds a single request is routed to it first;
+    a successful probe replaces its latency history and failure streak.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._callers = {}
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_ROUTER_ENABLED', False)
+
+    @property
+    def default_backend(self) -> str:
+        return getattr(settings, 'LLM_DEFAULT_BACKEND', "command-a")
+
+    @property
+    def fast_backend(self) -> str:
+        return getattr(settings, 'LLM_ROUTER_FAST_BACKEND', "command-r7b")
+
+    @property
+    def probe_interval(self) -> float:
+        return getattr(settings, 'LLM_ROUTER_PROBE_INTERVAL', 30.0)
+
+    def caller(self, name: str) -> ResilientCaller:
+        """Return the resilience policy of a backend - the default backend uses `resilient_chat`."""
+        if name == self.default_backend:
+            return resilient_chat
+        with self._lock:
+            return self._callers.setdefault(name, ResilientCaller())
+
+    def _is_fast_request(self, messages: list) -> bool:
+        # Short first-turn questions do not need the large model
+        turns = [m for m in messages if m.get("role") != "system"]
+        max_tokens = getattr(settings, 'LLM_ROUTER_FAST_MAX_TOKENS', 48)
+        return len(turns) == 1 and estimate_tokens(turns[0].get("content", "")) <= max_tokens
+
+    def is_degraded(self, name: str) -> bool:
+        """Whether a backend is currently too slow, failing repeatedly, or behind an open circuit."""
+        if self.caller(name).breaker.state == CircuitBreaker.OPEN:
+            return True
+        with self._lock:
+            latency = self.latency.get(name)
+            failures = self.failures.get(name, 0)
+        if failures >= getattr(settings, 'LLM_ROUTER_DEGRADED_FAILURES', 3):
+            return True
+        return latency is not None and latency > getattr(settings, 'LLM_ROUTER_DEGRADED_LATENCY', 15.0)
+
+    def _is_demoted(self, name: str) -> bool:
+        """Whether to try a backend last for this request - degraded and not due a probe."""
+        degraded = self.is_degraded(name)
+        now = time.monotonic()
+        with self._lock:
+            if not degraded:
+                self.demoted_at.pop(name, None)
+                return False
+            if now - self.demoted_at.setdefault(name, now) < self.probe_interval:
+                return True
+            # Half-open: this request probes the backend, the next probe waits another interval
+            self.demoted_at[name] = now
+            self.probing.add(name)
+            return False
+
+    def _candidates(self, messages: list) -> list:
+        if not self.enabled:
+            return [self.default_backend]
+        if self._is_fast_request(messages):
+            return [self.fast_backend, self.default_backend]
+        return [self.default_backend, self.fast_backend]
+
+    def route(self, messages: list) -> list:
+        """
+        Return the backend names to try for `messages`, best first.
+        """
+        # Stable sort keeps the preferred order among healthy (and among demoted) backends
+        return sorted(self._candidates(messages), key=self._is_demoted)
+
+    def cache_model(self, messages: list) -> str:
+        """
+        Return the model expected to answer `messages`, for response cache keys.
+        Unlike `route`, this never starts a probe of a demoted backend.
+        """
+        name = min(self._candidates(messages), key=self.is_degraded)
+        return backends[name].model_name
+
+    def record(self, name: str, seconds: float | None = None, ok: bool = True):
+        """Fold a call outcome into the backend's EWMA latency and failure streak."""
+        alpha = getattr(settings, 'LLM_ROUTER_EWMA_ALPHA', 0.2)
+        with self._lock:
+            probed = name in self.probing
+            self.probing.discard(name)
+            if ok:
+                self.failures[name] = 0
+                # A successful probe starts a fresh history - the old EWMA describes the outage
+                previous = None if probed else self.latency.get(name)
+                self.latency[name] = seconds if previous is None else alpha * seconds + (1 - alpha) * previous
+            else:
+                self.failures[name] = self.failures.get(name, 0) + 1
+            self.routed[name] = self.routed.get(name, 0) + 1
+
+    def chat(self, messages: list) -> str:
+        """
+        Get the assistant text from the first backend that answers.
+        """
+        return self.chat_routed(messages)[0]
+
+    def chat_routed(self, messages: list) -> tuple[str, str]:
+        """
+        Variant of `chat` also reporting which backend answered.
+
+        Returns:
+            tuple: (assistant text, backend name)
+        """
+        names = self.route(messages)
+        for position, name in enumerate(names):
+            backend, caller = backends[name], self.caller(name)
+
+            def attempt(timeout, name=name, backend=backend):
+                with track_llm_call(name, "chat"):
+                    return backend.chat(messages, timeout)
+
+            started = time.monotonic()
+            try:
+                text = caller.call(attempt)
+            except Exception as e:
+                self._record_failure(name, e)
+                if position == len(names) - 1:
+                    raise
+                continue
+            self.record(name, time.monotonic() - started)
+            return text, name
+
+    async def achat(self, messages: list) -> str:
+        """
+        Async variant of `chat`.
+        """
+        return (await self.achat_routed(messages))[0]
+
+    async def achat_routed(self, messages: list) -> tuple[str, str]:
+        """
+        Async variant of `chat_routed`.
+        """
+        names = self.route(messages)
+        for position, name in enumerate(names):
+            backend, caller = backends[name], self.caller(name)
+
+            async def attempt(timeout, name=name, backend=backend):
+                with track_llm_call(name, "chat"):
+                    return await backend.achat(messages, timeout)
+
+            started = time.monotonic()
+            try:
+                text = await caller.acall(attempt)
+            except Exception as e:
+                self._record_failure(name, e)
+                if position == len(names) - 1:
+                    raise
+                continue
+            self.record(name, time.monotonic() - started)
+            return text, name
+
+    def _record_failure(self, name: str, error: BaseException):
+        # An open circuit is not a new failure - the backend was never called
+        if not isinstance(error, CircuitOpenError):
+            self.record(name, ok=False)
+
+    def _record_stream_failure(self, name: str, error: BaseException):
+        breaker = self.caller(name).breaker
+        if is_retryable(error):
+            breaker.record_failure()
+        else:
+            # Non-transient errors and client disconnects say nothing about upstream health
+            breaker.release_trial()
+        if isinstance(error, Exception):
+            self.record(name, ok=False)
+
+    def chat_stream(self, messages: list, routed: dict | None = None):
+        """
+        Stream text fragments from the first backend that starts answering.
+        A partially delivered stream cannot be retried, so fallback only happens before the
+        first fragment; the circuit breaker is still consulted and fed.
+
+        Args:
+            routed (dict, optional): Receives the answering backend's name under "backend"
+                once the stream completes
+        """
+        names = self.route(messages)
+        for position, name in enumerate(names):
+            backend, breaker = backends[name], self.caller(name).breaker
+            timeout = self.caller(name).attempt_timeout
+            started, emitted = time.monotonic(), False
+            try:
+                breaker.before_call()
+                with track_llm_call(name, "chat_stream"):
+                    for text in backend.chat_stream(messages, timeout):
+                        emitted = True
+                        yield text
+            except BaseException as e:
+                if not isinstance(e, CircuitOpenError):
+                    self._record_stream_failure(name, e)
+                if emitted or position == len(names) - 1 or not isinstance(e, Exception):
+                    raise
+                continue
+            breaker.record_success()
+            self.record(name, time.monotonic() - started)
+            if routed is not None:
+                routed["backend"] = name
+            return
+
+    async def achat_stream(self, messages: list, routed: dict | None = None):
+        """
+        Async variant of `chat_stream`.
+        """
+        names = self.route(messages)
+        for position, name in enumerate(names):
+            backend, breaker = backends[name], self.caller(name).breaker
+            timeout = self.caller(name).attempt_timeout
+            started, emitted = time.monotonic(), False
+            try:
+                breaker.before_call()
+                with track_llm_call(name, "chat_stream"):
+                    async for text in backend.achat_stream(messages, timeout):
+                        emitted = True
+                        yield text
+            except BaseException as e:
+                if not isinstance(e, CircuitOpenError):
+                    self._record_stream_failure(name, e)
+                if emitted or position == len(names) - 1 or not isinstance(e, Exception):
+                    raise
+                continue
+            breaker.record_success()
+            self.record(name, time.monotonic() - started)
+            if routed is not None:
+                routed["backend"] = name
+            return
+
+    def stats(self) -> dict:
+        """Return EWMA latency, failure streak and routed call count per backend."""
+        with self._lock:
+            return {
+                name: {
+                    "ewma_latency": self.latency.get(name),
+                    "failures": self.failures.get(name, 0),
+                    "routed": self.routed.get(name, 0),
+                }
+                for name in sorted(set(self.latency) | set(self.failures) | set(self.routed))
+            }
+
+    def reset(self):
+        """Forget latency history and reset the non-default backends' resilience policies."""
+        with self._lock:
+            self.latency = {}
+            self.failures = {}
+            self.routed = {}
+            self.demoted_at = {}
+            self.probing = set()
+            for caller in self._callers.values():
+                caller.reset()
+
+
+# Process-wide backend registry and router
+backends = BackendRegistry()
+router = ModelRouter()
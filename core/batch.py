@@ -0,0 +1,75 @@
+import asyncio
+
+from django.conf import settings
+
+from . import llm_service
+from .admission import RateLimitExceeded, in_flight
+
+
+def _batch_result(index: int, response: str | None = None, messages: list | None = None, error: str | None = None) -> dict:
+    return {"index": index, "response": response, "messages": messages, "error": error}
+
+
+async def _run_item(index: int, item: dict, semaphore: asyncio.Semaphore) -> dict:
+    async with semaphore:
+        try:
+            # Batch items count against the same in-flight cap as single requests
+            async with in_flight.aslot():
+                response, messages = await llm_service.aget_travel_guidance(
+                    item["user_message"], item.get("messages"), bypass_cache=item.get("bypass_cache", False)
+                )
+        except RateLimitExceeded as e:
+            return _batch_result(index, error=e.detail)
+        except Exception as e:
+            return _batch_result(index, error=f"Error getting travel guidance: {e!s}")
+
+    # The LLM service reports failures as an error message without an assistant turn
+    if not messages or messages[-1]["role"] != "assistant":
+        return _batch_result(index, error=response)
+    return _batch_result(index, response=response, messages=messages)
+
+
+def resolve_concurrency(concurrency: int | None = None) -> int:
+    """Clamp a requested concurrency to the configured limit."""
+    limit = getattr(settings, 'LLM_BATCH_MAX_CONCURRENCY', 8)
+    return max(1, min(concurrency or limit, limit))
+
+
+async def iter_batch_travel_guidance(items: list, concurrency: int | None = None):
+    """
+    Run independent travel guidance requests concurrently with bounded fan-out.
+
+    Args:
+        items (list): Request dicts with `user_message` and optional `messages`/`bypass_cache`
+        concurrency (int, optional): Maximum number of in-flight LLM calls, capped by
+                                 LLM_BATCH_MAX_CONCURRENCY
+
+    Yields:
+        dict: Per-item result `{"index", "response", "messages", "error"}` as each one finishes
+    """
+    semaphore = asyncio.Semaphore(resolve_concurrency(concurrency))
+    tasks = [asyncio.create_task(_run_item(index, item, semaphore)) for index, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding calls if the consumer goes away (e.g. client disconnects mid-stream)
+        for task in tasks:
+            task.cancel()
+
+
+async def batch_travel_guidance(items: list, concurrency: int | None = None) -> list:
+    """
+    Run independent travel guidance requests concurrently and return results in request order.
+
+    Args:
+        items (list): Request dicts with `user_message` and optional `messages`/`bypass_cache`
+        concurrency (int, optional): Maximum number of in-flight LLM calls
+
+    Returns:
+        list: Per-item results ordered by index
+    """
+    results = [None] * len(items)
+    async for result in iter_batch_travel_guidance(items, concurrency):
+        results[result["index"]] = result
+    return results
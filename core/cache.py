@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import record_cache_lookup
+
+
+class ResponseCache:
+    """
+    Exact-match cache for LLM responses backed by Django's cache framework.
+    Entries are keyed on a normalized hash of the full message list, model name and
+    temperature. Size and TTL limits come from the configured cache alias (`TIMEOUT`
+    and `OPTIONS.MAX_ENTRIES`) - the locmem backend evicts least recently used entries.
+    """
+    key_prefix = "llm-response"
+
+    def __init__(self, alias: str = "llm_responses"):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_RESPONSE_CACHE_ENABLED', True)
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _normalize_content(content: str) -> str:
+        # Collapse whitespace and case so trivially different inputs share an entry
+        return " ".join(str(content).split()).casefold()
+
+    def make_key(self, messages: list, model: str, temperature: float) -> str:
+        """
+        Build the cache key for a request.
+        
+        Args:
+            messages (list): Full message list sent to the LLM
+            model (str): Model name
+            temperature (float): Sampling temperature
+            
+        Returns:
+            str: Cache key
+        """
+        payload = json.dumps({
+            "model": model,
+            "temperature": temperature,
+            "messages": [
+                [message.get("role", "").lower(), self._normalize_content(message.get("content", ""))]
+                for message in messages
+            ],
+        }, separators=(",", ":"))
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{digest}"
+
+    def _record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache_lookup(self.alias, hit)
+
+    def get(self, key: str):
+        """Return the cached response for `key` or None, recording a hit or miss."""
+        if not self.enabled:
+            return None
+        response = self.backend.get(key)
+        self._record(response is not None)
+        return response
+
+    def set(self, key: str, response: str):
+        """Store a response under `key`."""
+        if self.enabled:
+            self.backend.set(key, response)
+
+    async def aget(self, key: str):
+        """Async variant of `get`."""
+        if not self.enabled:
+            return None
+        response = await self.backend.aget(key)
+        self._record(response is not None)
+        return response
+
+    async def aset(self, key: str, response: str):
+        """Async variant of `set`."""
+        if self.enabled:
+            await self.backend.aset(key, response)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def reset_stats(self):
+        """Reset hit/miss counters."""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+# Process-wide response cache used by the LLM service
+response_cache = ResponseCache()
@@ -0,0 +1,135 @@
+"""
+Lazily initialized, process-wide Cohere client factory.
+
+The Cohere SDK is only imported and the HTTP clients only built on the first LLM call,
+so management commands and test imports never pay for them. Clients are rebuilt after
+a fork (e.g. gunicorn with `preload_app`) so workers never share pooled connections,
+and async clients are kept per event loop because httpx async pools are loop-bound.
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+from django.conf import settings
+
+DEFAULT_BASE_URL = "https://api.cohere.com"
+
+_lock = threading.Lock()
+_sync_client = None
+_sync_client_pid = None
+_sync_http_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _client_options() -> dict:
+    return {
+        "api_key": os.getenv('COHERE_API_KEY'),
+        "base_url": getattr(settings, 'LLM_API_BASE_URL', None),
+    }
+
+
+def _httpx_options() -> dict:
+    import httpx
+
+    return {
+        "timeout": httpx.Timeout(
+            getattr(settings, 'LLM_HTTP_TIMEOUT', 60.0),
+            connect=getattr(settings, 'LLM_HTTP_CONNECT_TIMEOUT', 5.0),
+        ),
+        "limits": httpx.Limits(
+            max_connections=getattr(settings, 'LLM_HTTP_MAX_CONNECTIONS', 100),
+            max_keepalive_connections=getattr(settings, 'LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS', 20),
+            keepalive_expiry=getattr(settings, 'LLM_HTTP_KEEPALIVE_EXPIRY', 30.0),
+        ),
+    }
+
+
+def get_client():
+    """
+    Return the process-wide synchronous Cohere client, building it on first use.
+    """
+    global _sync_client, _sync_client_pid, _sync_http_client
+    pid = os.getpid()
+    if _sync_client is None or _sync_client_pid != pid:
+        with _lock:
+            if _sync_client is None or _sync_client_pid != pid:
+                import httpx
+                from cohere import ClientV2
+
+                _sync_http_client = httpx.Client(**_httpx_options())
+                _sync_client = ClientV2(**_client_options(), httpx_client=_sync_http_client)
+                _sync_client_pid = pid
+    return _sync_client
+
+
+def get_async_client():
+    """
+    Return the asynchronous Cohere client for the running event loop, building it on first use.
+    """
+    loop = asyncio.get_running_loop()
+    pid = os.getpid()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0] != pid:
+        with _lock:
+            entry = _async_clients.get(loop)
+            if entry is None or entry[0] != pid:
+                import httpx
+                from cohere import AsyncClientV2
+
+                client = AsyncClientV2(**_client_options(), httpx_client=httpx.AsyncClient(**_httpx_options()))
+                entry = (pid, client)
+                _async_clients[loop] = entry
+    return entry[1]
+
+
+def preconnect(timeout: float = 5.0) -> bool:
+    """
+    Open a pooled keep-alive connection to the LLM API on the synchronous client, so the
+    first LLM call does not pay for DNS, TCP and TLS setup. Async clients are bound to an
+    event loop that does not exist yet at startup, so they still connect on first use.
+
+    Returns:
+        bool: Whether the API answered
+    """
+    import httpx
+
+    get_client()
+    base_url = _client_options()["base_url"] or DEFAULT_BASE_URL
+    try:
+        _sync_http_client.head(base_url, timeout=timeout)
+    except httpx.HTTPError:
+        return False
+    return True
+
+
+def reset_clients():
+    """
+    Drop all cached clients so the next call builds fresh ones.
+    Registered to run in forked children so pooled connections are never shared across processes.
+    """
+    global _lock, _sync_client, _sync_client_pid, _sync_http_client
+    # A lock held by another thread at fork time would never be released in the child
+    _lock = threading.Lock()
+    _sync_client = None
+    _sync_client_pid = None
+    _sync_http_client = None
+    _async_clients.clear()
+
+
+class LazyClient:
+    """
+    Attribute proxy resolving to the client returned by `factory` on each access.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def __getattr__(self, name):
+        # Introspection (e.g. by mock.patch or copy) must not trigger building the client
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._factory(), name)
+
+
+os.register_at_fork(after_in_child=reset_clients)
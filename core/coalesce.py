@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import weakref
+
+from django.conf import settings
+
+
+class _Call:
+    """An in-flight call shared by the threads waiting on it."""
+    __slots__ = ("error", "event", "result")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into a single execution.
+    The first caller for a key (the leader) runs the function; callers arriving while it is
+    in flight wait for and share its result or exception. Works for threads (`do`) and for
+    coroutines on the same event loop (`ado`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._async_calls = weakref.WeakKeyDictionary()
+        self.executed = 0
+        self.deduplicated = 0
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_COALESCE_ENABLED', True)
+
+    def do(self, key: str, fn):
+        """
+        Run `fn()` unless a call with the same key is already in flight, in which case wait for its result.
+
+        Args:
+            key (str): Coalescing key - identical requests must map to the same key
+            fn (callable): Zero-argument function performing the call
+
+        Returns:
+            The result of the shared call (its exception is re-raised in every caller)
+        """
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.deduplicated += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def ado(self, key: str, coro_fn):
+        """
+        Async variant of `do` - `coro_fn()` must return a coroutine.
+        The shared call runs as its own task so a cancelled caller does not cancel it for the others.
+        """
+        if not self.enabled:
+            return await coro_fn()
+
+        calls = self._async_calls.setdefault(asyncio.get_running_loop(), {})
+        task = calls.get(key)
+        if task is None:
+            task = calls[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda _: calls.pop(key, None))
+            with self._lock:
+                self.executed += 1
+        else:
+            with self._lock:
+                self.deduplicated += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        """Return counters for executed and deduplicated calls in this process."""
+        with self._lock:
+            return {"executed": self.executed, "deduplicated": self.deduplicated}
+
+    def reset_stats(self):
+        """Reset counters."""
+        with self._lock:
+            self.executed = 0
+            self.deduplicated = 0
+
+
+# Process-wide coalescing of identical in-flight LLM requests
+single_flight = SingleFlight()
@@ -0,0 +1,209 @@
+import hashlib
+import logging
+import re
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+from .metrics import record_context_window
+
+logger = logging.getLogger(__name__)
+
+# Word pieces and punctuation - roughly tracks subword tokenizer counts for English text
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+SUMMARY_HEADER = "\n\nSummary of the earlier conversation:\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Fast local approximation of the number of tokens in `text`.
+    Long words are split by subword tokenizers, so each piece counts for one token
+    plus one extra token per 8 characters.
+    """
+    return sum(1 + len(piece) // 8 for piece in TOKEN_PATTERN.findall(text or ""))
+
+
+def _first_sentence(text: str, max_words: int = 30) -> str:
+    sentence = SENTENCE_END.split(" ".join((text or "").split()), maxsplit=1)[0]
+    words = sentence.split()
+    return " ".join(words[:max_words]) + (" ..." if len(words) > max_words else "")
+
+
+def extractive_summary(previous_summary: str, messages: list, max_tokens: int) -> str:
+    """
+    Default summarizer - fold turns into one line each without an extra LLM call.
+    The oldest lines are dropped once the summary exceeds `max_tokens`.
+
+    Args:
+        previous_summary (str): Summary of turns folded earlier ("" if none)
+        messages (list): Newly folded user/assistant messages
+        max_tokens (int): Token budget for the summary
+
+    Returns:
+        str: The updated rolling summary
+    """
+    lines = previous_summary.splitlines() if previous_summary else []
+    for message in messages:
+        speaker = "User" if message["role"] == "user" else "Assistant"
+        lines.append(f"- {speaker}: {_first_sentence(message['content'])}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """
+    Keeps the messages sent to the LLM within a token budget.
+    The system prompt and the most recent turns are sent verbatim; older turns are
+    folded into a rolling summary appended to the system prompt. Summaries are cached
+    by a hash of the folded turns so each prefix of a conversation is summarized once
+    and later turns only extend the previous summary.
+    """
+    cache_prefix = "context-summary"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_CONTEXT_WINDOW_ENABLED', True)
+
+    @property
+    def max_tokens(self) -> int:
+        return getattr(settings, 'LLM_CONTEXT_MAX_TOKENS', 6000)
+
+    @property
+    def summary_max_tokens(self) -> int:
+        return getattr(settings, 'LLM_CONTEXT_SUMMARY_MAX_TOKENS', 400)
+
+    def _summarizer(self):
+        return import_string(getattr(settings, 'LLM_CONTEXT_SUMMARIZER', 'core.context_window.extractive_summary'))
+
+    def _rolling_summary(self, folded: list) -> str:
+        # Hash every prefix of the folded turns so the longest already summarized prefix can be reused
+        prefix_keys = []
+        digest = hashlib.sha256()
+        for message in folded:
+            digest.update(f"{message['role']}\x00{message['content']}\x01".encode())
+            prefix_keys.append(f"{self.cache_prefix}:{digest.hexdigest()}")
+
+        cached = cache.get_many(prefix_keys)
+        summary, start = "", 0
+        for position in range(len(prefix_keys) - 1, -1, -1):
+            if prefix_keys[position] in cached:
+                summary, start = cached[prefix_keys[position]], position + 1
+                break
+
+        if start < len(folded):
+            summary = self._summarizer()(summary, folded[start:], self.summary_max_tokens)
+            cache.set(prefix_keys[-1], summary)
+        return summary
+
+    def _plan(self, messages: list) -> tuple[dict, tuple | None]:
+        """Count tokens and, when the history must be trimmed, pick the folded range."""
+        counts = [estimate_tokens(message["content"]) for message in messages]
+        total = sum(counts)
+        metrics = {"tokens_in_history": total, "tokens_sent": total, "tokens_saved": 0, "messages_summarized": 0}
+        if not self.enabled or total <= self.max_tokens:
+            return metrics, None
+
+        system_count = 0
+        while system_count < len(messages) and messages[system_count]["role"] == "system":
+            system_count += 1
+
+        # Walk back from the newest message keeping whatever fits next to the system prompt and summary
+        remaining = self.max_tokens - sum(counts[:system_count]) - self.summary_max_tokens
+        split = len(messages) - 1  # the new user message is always sent
+        remaining -= counts[split]
+        while split - 1 >= system_count and counts[split - 1] <= remaining:
+            split -= 1
+            remaining -= counts[split]
+        # Start the verbatim window on a user turn so exchanges are not cut in half
+        while split < len(messages) - 1 and messages[split]["role"] != "user":
+            split += 1
+
+        if split <= system_count:
+            return metrics, None
+        return metrics, (system_count, split)
+
+    def _apply(self, messages: list, metrics: dict, system_count: int, split: int, summary: str) -> tuple[list, dict]:
+        system_messages = [dict(message) for message in messages[:system_count]] or [{"role": "system", "content": ""}]
+        system_messages[-1]["content"] += SUMMARY_HEADER + summary
+        fitted = system_messages + messages[split:]
+
+        sent = sum(estimate_tokens(message["content"]) for message in fitted)
+        metrics.update(
+            tokens_sent=sent, tokens_saved=max(metrics["tokens_in_history"] - sent, 0),
+            messages_summarized=split - system_count,
+        )
+        return fitted, self._record(metrics)
+
+    def fit(self, messages: list) -> tuple[list, dict]:
+        """
+        Fit a conversation into the token budget.
+
+        Args:
+            messages (list): Full conversation, system prompt first and the new user message last
+
+        Returns:
+            tuple: (messages to send, metrics dict with tokens in history/sent/saved and turns summarized)
+        """
+        metrics, cut = self._plan(messages)
+        if cut is None:
+            return messages, self._record(metrics)
+        system_count, split = cut
+        summary = self._rolling_summary(messages[system_count:split])
+        return self._apply(messages, metrics, system_count, split, summary)
+
+    async def afit(self, messages: list) -> tuple[list, dict]:
+        """
+        Async variant of `fit` - only the summary (cache access and summarizer) runs off the
+        event loop, so conversations within the budget are handled inline.
+        """
+        metrics, cut = self._plan(messages)
+        if cut is None:
+            return messages, self._record(metrics)
+        system_count, split = cut
+        summary = await sync_to_async(self._rolling_summary, thread_sensitive=False)(messages[system_count:split])
+        return self._apply(messages, metrics, system_count, split, summary)
+
+    def _record(self, metrics: dict) -> dict:
+        with self._lock:
+            self.requests += 1
+            self.tokens_sent += metrics["tokens_sent"]
+            self.tokens_saved += metrics["tokens_saved"]
+        record_context_window(metrics)
+        if metrics["messages_summarized"]:
+            logger.info(
+                "Context window: sent %(tokens_sent)s of %(tokens_in_history)s tokens "
+                "(saved %(tokens_saved)s, %(messages_summarized)s messages summarized)",
+                metrics,
+            )
+        return metrics
+
+    def stats(self) -> dict:
+        """Return cumulative token counters for this process."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved,
+            }
+
+    def reset_stats(self):
+        """Reset cumulative token counters."""
+        with self._lock:
+            self.requests = 0
+            self.tokens_sent = 0
+            self.tokens_saved = 0
+
+
+# Process-wide context window used by the LLM service
+context_window = ContextWindow()
@@ -0,0 +1,396 @@
+import json
+import logging
+import uuid
+import zlib
+from datetime import UTC, datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .llm_service import SYSTEM_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def has_atomic_incr(backend) -> bool:
+    """
+    Whether a cache backend increments atomically. Local memory, Redis and Memcached override
+    `incr`; other backends (e.g. the database and file caches) inherit `BaseCache`'s get-then-set,
+    which lets concurrent appends take the same turn index.
+    """
+    return type(backend).incr is not BaseCache.incr
+
+
+class ConversationStore:
+    """
+    Server-side conversation history keyed by conversation ID, backed by Django's cache framework.
+    Only user/assistant turns are stored; the system message is added back when the
+    history is handed to the LLM so it is never duplicated per conversation.
+
+    History is append-only: each turn (the messages of one exchange) is stored zlib-compressed
+    under its own key and a per-conversation counter allocates the next slot, so adding a turn
+    writes only that turn however long the conversation is, and a page of history reads only
+    the turns on that page. Each write refreshes the conversation's TTL; turns expire on their
+    own TTL counted from when they were written. The backend must increment atomically (see
+    `has_atomic_incr`) or concurrent appends could overwrite each other's turn.
+    """
+    key_prefix = "conversation"
+    # Turn slots are allocated with `cache.incr`, so the backend must increment atomically
+    requires_atomic_incr = True
+
+    def __init__(self, alias: str = "conversations"):
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def compression_level(self) -> int:
+        return getattr(settings, 'CONVERSATION_COMPRESSION_LEVEL', 6)
+
+    def _length_key(self, conversation_id: str) -> str:
+        return f"{self.key_prefix}:{conversation_id}:length"
+
+    def _turn_key(self, conversation_id: str, index: int) -> str:
+        return f"{self.key_prefix}:{conversation_id}:turn:{index}"
+
+    def _encode(self, messages: list) -> bytes:
+        payload = json.dumps(messages, ensure_ascii=False, separators=(",", ":"))
+        return zlib.compress(payload.encode("utf-8"), self.compression_level)
+
+    @staticmethod
+    def _decode(blob: bytes) -> list:
+        return json.loads(zlib.decompress(blob))
+
+    def _turns_from(self, found: dict, keys: list) -> list:
+        # Turns that expired (or are still being written by a concurrent append) are skipped
+        return [self._decode(found[key]) for key in keys if key in found]
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def to_llm_messages(turns: list) -> list:
+        """Prepend the system message to stored turns for the LLM service."""
+        return [{"role": "system", "content": SYSTEM_MESSAGE}, *turns]
+
+    def can_access(self, conversation_id: str, user=None) -> bool:
+        """Whether `user` may read and continue a conversation - cached conversations have no owner."""
+        return True
+
+    def list_conversations(self, user, before: str | None = None, limit: int = 20) -> tuple:
+        """List a user's conversations - only supported by `DatabaseConversationStore`."""
+        raise NotImplementedError(f"{type(self).__name__} cannot list conversations")
+
+    def create(self, conversation_id: str, user=None):
+        """Register an empty conversation so its ID is known before the first turn."""
+        self.backend.add(self._length_key(conversation_id), 0)
+
+    def length(self, conversation_id: str):
+        """Return the number of stored turns, or None if the conversation is unknown or expired."""
+        return self.backend.get(self._length_key(conversation_id))
+
+    def append(self, conversation_id: str, messages: list, user=None) -> int:
+        """
+        Append one turn (e.g. a user message and the assistant reply) to a conversation,
+        creating it (owned by `user`, where supported) if needed.
+
+        Returns:
+            int: Index of the new turn
+        """
+        length_key = self._length_key(conversation_id)
+        self.backend.add(length_key, 0)
+        index = self.backend.incr(length_key) - 1
+        self.backend.set(self._turn_key(conversation_id, index), self._encode(messages))
+        self.backend.touch(length_key)
+        return index
+
+    def get_turns(self, conversation_id: str, start: int = 0, end: int | None = None) -> list:
+        """
+        Return stored turns `start` to `end` (exclusive) in order, each a list of messages.
+        """
+        if end is None:
+            end = self.length(conversation_id) or 0
+        keys = [self._turn_key(conversation_id, index) for index in range(start, end)]
+        return self._turns_from(self.backend.get_many(keys), keys) if keys else []
+
+    def get(self, conversation_id: str):
+        """
+        Return the stored turns for a conversation.
+
+        Args:
+            conversation_id (str): Conversation ID
+
+        Returns:
+            list: Stored user/assistant messages, or None if the conversation is unknown or expired
+        """
+        length = self.length(conversation_id)
+        if length is None:
+            return None
+        return [message for turn in self.get_turns(conversation_id, 0, length) for message in turn]
+
+    async def acan_access(self, conversation_id: str, user=None) -> bool:
+        """Async variant of `can_access`."""
+        return True
+
+    async def alist_conversations(self, user, before: str | None = None, limit: int = 20) -> tuple:
+        """Async variant of `list_conversations`."""
+        return self.list_conversations(user, before, limit)
+
+    async def acreate(self, conversation_id: str, user=None):
+        """Async variant of `create`."""
+        await self.backend.aadd(self._length_key(conversation_id), 0)
+
+    async def alength(self, conversation_id: str):
+        """Async variant of `length`."""
+        return await self.backend.aget(self._length_key(conversation_id))
+
+    async def aappend(self, conversation_id: str, messages: list, user=None) -> int:
+        """
+        Async variant of `append`. Django's `aincr` is a get-then-set on every backend, so the
+        slot is allocated with the backend's atomic synchronous `incr` instead.
+        """
+        return await sync_to_async(self.append)(conversation_id, messages, user)
+
+    async def aget_turns(self, conversation_id: str, start: int = 0, end: int | None = None) -> list:
+        """Async variant of `get_turns`."""
+        if end is None:
+            end = await self.alength(conversation_id) or 0
+        keys = [self._turn_key(conversation_id, index) for index in range(start, end)]
+        return self._turns_from(await self.backend.aget_many(keys), keys) if keys else []
+
+    async def aget(self, conversation_id: str):
+        """Async variant of `get`."""
+        length = await self.alength(conversation_id)
+        if length is None:
+            return None
+        keys = [self._turn_key(conversation_id, index) for index in range(length)]
+        found = await self.backend.aget_many(keys) if keys else {}
+        return [message for turn in self._turns_from(found, keys) for message in turn]
+
+
+class DatabaseConversationStore(ConversationStore):
+    """
+    Persistent conversation history in the `Conversation` and `Turn` tables.
+
+    Same interface and compressed, append-only turns as the cache store, but conversations
+    never expire, belong to a user when created by a logged-in one, and can be listed.
+    Every query is served by an index: turns by the (conversation, index) unique constraint,
+    a user's conversations by the (user, updated_at, id) index. Pages are selected by keyset
+    (turn index, or the last conversation's updated_at and id) rather than OFFSET, so a page
+    costs the same however deep it is.
+    """
+    requires_atomic_incr = False
+
+    @staticmethod
+    def _pk(conversation_id):
+        # Unknown and malformed IDs both mean "no such conversation"
+        try:
+            return uuid.UUID(str(conversation_id))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _title(messages: list) -> str:
+        content = next((message["content"] for message in messages if message["role"] == "user"), "")
+        return " ".join(content.split())[:200]
+
+    @staticmethod
+    def encode_cursor(conversation) -> str:
+        """Keyset cursor pointing just past `conversation` in the latest-first listing."""
+        micros = (conversation.updated_at - EPOCH) // timedelta(microseconds=1)
+        return f"{micros}.{conversation.pk.hex}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """
+        Raises:
+            ValueError: The cursor is malformed
+        """
+        micros, pk = cursor.split(".", 1)
+        return EPOCH + timedelta(microseconds=int(micros)), uuid.UUID(pk)
+
+    def _conversations(self, user, before: str | None = None):
+        from travel_app.models import Conversation
+
+        if self._owner(user) is None:
+            # Anonymous conversations are only reachable by ID, never listed
+            return Conversation.objects.none()
+        conversations = Conversation.objects.filter(user=user).only(
+            "id", "title", "turn_count", "created_at", "updated_at"
+        ).order_by("-updated_at", "-id")
+        if before:
+            updated_at, pk = self.decode_cursor(before)
+            conversations = conversations.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=pk))
+        return conversations
+
+    def _page(self, rows: list, limit: int) -> tuple:
+        # One extra row tells whether there is a next page without a COUNT query
+        if len(rows) <= limit:
+            return rows, None
+        return rows[:limit], self.encode_cursor(rows[limit - 1])
+
+    def list_conversations(self, user, before: str | None = None, limit: int = 20) -> tuple:
+        """
+        List a user's conversations, most recently updated first.
+
+        Args:
+            before (str, optional): Cursor returned with the previous page
+
+        Returns:
+            tuple: (conversations, next_cursor) - next_cursor is None on the last page
+
+        Raises:
+            ValueError: The cursor is malformed
+        """
+        return self._page(list(self._conversations(user, before)[:limit + 1]), limit)
+
+    async def alist_conversations(self, user, before: str | None = None, limit: int = 20) -> tuple:
+        """Async variant of `list_conversations`."""
+        return self._page([row async for row in self._conversations(user, before)[:limit + 1]], limit)
+
+    def _access_query(self, conversation_id: str, user):
+        from travel_app.models import Conversation
+
+        owner = Q(user__isnull=True)
+        if user is not None and user.is_authenticated:
+            owner |= Q(user=user)
+        return Conversation.objects.filter(owner, pk=self._pk(conversation_id))
+
+    def can_access(self, conversation_id: str, user=None) -> bool:
+        """Whether `user` may read and continue a conversation - owned ones only by their owner."""
+        return self._pk(conversation_id) is not None and self._access_query(conversation_id, user).exists()
+
+    async def acan_access(self, conversation_id: str, user=None) -> bool:
+        """Async variant of `can_access`."""
+        return self._pk(conversation_id) is not None and await self._access_query(conversation_id, user).aexists()
+
+    @staticmethod
+    def _owner(user):
+        return user if user is not None and user.is_authenticated else None
+
+    def create(self, conversation_id: str, user=None):
+        """Register an empty conversation so its ID is known before the first turn."""
+        from travel_app.models import Conversation
+
+        Conversation.objects.get_or_create(pk=self._pk(conversation_id), defaults={"user": self._owner(user)})
+
+    def length(self, conversation_id: str):
+        """Return the number of stored turns, or None if the conversation is unknown."""
+        from travel_app.models import Conversation
+
+        pk = self._pk(conversation_id)
+        if pk is None:
+            return None
+        return Conversation.objects.filter(pk=pk).values_list("turn_count", flat=True).first()
+
+    def append(self, conversation_id: str, messages: list, user=None) -> int:
+        """
+        Append one turn to a conversation, creating it (owned by `user`) if needed.
+
+        Returns:
+            int: Index of the new turn
+        """
+        from travel_app.models import Conversation, Turn
+
+        pk = self._pk(conversation_id)
+        with transaction.atomic():
+            Conversation.objects.get_or_create(pk=pk, defaults={"user": self._owner(user)})
+            # The counter update locks the conversation row, so concurrent appends get distinct indexes
+            Conversation.objects.filter(pk=pk).update(turn_count=F("turn_count") + 1, updated_at=timezone.now())
+            index = Conversation.objects.filter(pk=pk).values_list("turn_count", flat=True).get() - 1
+            Turn.objects.create(conversation_id=pk, index=index, messages=self._encode(messages))
+            if index == 0:
+                Conversation.objects.filter(pk=pk).update(title=self._title(messages))
+        return index
+
+    def get_turns(self, conversation_id: str, start: int = 0, end: int | None = None) -> list:
+        """
+        Return stored turns `start` to `end` (exclusive) in order, each a list of messages.
+        """
+        from travel_app.models import Turn
+
+        pk = self._pk(conversation_id)
+        if pk is None:
+            return []
+        turns = Turn.objects.filter(conversation_id=pk, index__gte=start)
+        if end is not None:
+            turns = turns.filter(index__lt=end)
+        return [self._decode(blob) for blob in turns.order_by("index").values_list("messages", flat=True)]
+
+    def get(self, conversation_id: str):
+        """
+        Return the stored turns for a conversation.
+
+        Returns:
+            list: Stored user/assistant messages, or None if the conversation is unknown
+        """
+        if self.length(conversation_id) is None:
+            return None
+        return [message for turn in self.get_turns(conversation_id) for message in turn]
+
+    # Transactions are not available to the async ORM, so writes run in a thread
+    async def acreate(self, conversation_id: str, user=None):
+        """Async variant of `create`."""
+        await sync_to_async(self.create)(conversation_id, user)
+
+    async def aappend(self, conversation_id: str, messages: list, user=None) -> int:
+        """Async variant of `append`."""
+        return await sync_to_async(self.append)(conversation_id, messages, user)
+
+    async def alength(self, conversation_id: str):
+        """Async variant of `length`."""
+        from travel_app.models import Conversation
+
+        pk = self._pk(conversation_id)
+        if pk is None:
+            return None
+        return await Conversation.objects.filter(pk=pk).values_list("turn_count", flat=True).afirst()
+
+    async def aget_turns(self, conversation_id: str, start: int = 0, end: int | None = None) -> list:
+        """Async variant of `get_turns`."""
+        from travel_app.models import Turn
+
+        pk = self._pk(conversation_id)
+        if pk is None:
+            return []
+        turns = Turn.objects.filter(conversation_id=pk, index__gte=start)
+        if end is not None:
+            turns = turns.filter(index__lt=end)
+        return [self._decode(blob) async for blob in turns.order_by("index").values_list("messages", flat=True)]
+
+    async def aget(self, conversation_id: str):
+        """Async variant of `get`."""
+        if await self.alength(conversation_id) is None:
+            return None
+        return [message for turn in await self.aget_turns(conversation_id) for message in turn]
+
+
+def build_conversation_store() -> ConversationStore:
+    """
+    Instantiate the store class named by `CONVERSATION_STORE`.
+    A cache store whose backend cannot increment atomically is replaced by the database store,
+    whose appends are serialized by a row lock.
+    """
+    store = import_string(getattr(settings, 'CONVERSATION_STORE', 'core.conversation_store.DatabaseConversationStore'))()
+    if store.requires_atomic_incr and not has_atomic_incr(store.backend):
+        logger.warning(
+            "Cache backend %s of the conversation store does not increment atomically - "
+            "using DatabaseConversationStore instead", type(store.backend).__name__
+        )
+        return DatabaseConversationStore()
+    return store
+
+
+# Process-wide conversation store used by the API and the HTMX views
+conversation_store = build_conversation_store()
@@ -0,0 +1,195 @@
+"""
+Labeled questions the domain pre-filter (see core.domain_filter) is trained on at startup.
+
+Keep the two lists roughly balanced, and add the questions shadow mode reports as
+disagreements with the LLM. The evaluation set in `benchmarks/domain_queries.jsonl` must stay
+disjoint from these examples.
+"""
+
+TRAVEL = (
+    "What are the best places to visit in Tokyo?",
+    "Plan a 5 day itinerary for Rome",
+    "Where should I stay in Barcelona on a budget?",
+    "What is the best time of year to visit Iceland?",
+    "Do I need a visa to travel to Vietnam?",
+    "Which beaches in Bali are good for surfing?",
+    "What local dishes should I try in Mexico City?",
+    "How do I get from the airport to the city centre in Lisbon?",
+    "Is it safe to travel alone in Colombia?",
+    "Recommend a weekend getaway from London",
+    "What should I pack for a trip to Norway in winter?",
+    "How many days do I need in Prague?",
+    "What are some hidden gems in Kyoto?",
+    "Suggest a road trip route through California",
+    "What's the cheapest way to travel around Europe?",
+    "Which museums are worth visiting in Paris?",
+    "Can you recommend family friendly hotels in Orlando?",
+    "What vaccinations do I need before travelling to Kenya?",
+    "How much should I tip in restaurants in the United States?",
+    "Best hiking trails in Patagonia",
+    "What are the must see temples in Bangkok?",
+    "Is the Japan Rail Pass worth it?",
+    "Where can I see the northern lights?",
+    "How do I spend a layover in Singapore?",
+    "What currency is used in Croatia and should I exchange money before I go?",
+    "Romantic honeymoon destinations in the Caribbean",
+    "What are the cultural customs I should know before visiting India?",
+    "Which Greek islands are best for island hopping?",
+    "How do I travel from Milan to Lake Como?",
+    "Things to do in New York City at night",
+    "Is Morocco a good destination in August?",
+    "What is the food scene like in Bologna?",
+    "Can you suggest a two week trip to Peru including Machu Picchu?",
+    "Budget backpacking tips for Southeast Asia",
+    "Which neighbourhood in Berlin is best for nightlife?",
+    "How do I book a safari in Tanzania?",
+    "What is there to do in Reykjavik in summer?",
+    "Ski resorts in the Alps for beginners",
+    "How crowded is Venice in July?",
+    "What souvenirs should I buy in Istanbul?",
+    "Is public transport in Seoul easy for tourists?",
+    "Recommend a wine tasting tour in Tuscany",
+    "What should I know about jet lag when flying to Australia?",
+    "Good day trips from Edinburgh",
+    "Where are the best street food markets in Taipei?",
+    "What is the weather like in Cape Town in December?",
+    "How do I get around Marrakech?",
+    "Which national parks should I visit in Utah?",
+    "Travel insurance advice for a trip to Thailand",
+    "What are the top attractions in Buenos Aires?",
+    "Where can I go scuba diving in Egypt?",
+    "Plan a food tour of Osaka",
+    "How do I visit the Great Wall from Beijing?",
+    "Are there cheap flights from Madrid to Morocco?",
+    "What should I wear when visiting mosques in Dubai?",
+    "Best cafes to visit in Vienna",
+    "How long is the ferry from Athens to Santorini?",
+    "What are the local festivals in Spain in spring?",
+    "Is a campervan trip around New Zealand a good idea?",
+    "Where can I watch flamenco in Seville?",
+    "What is the etiquette for onsen in Japan?",
+    "How do I plan a trip to the Amalfi Coast?",
+    "Recommend a quiet beach town in Portugal",
+    "What are the best cities to visit in Canada?",
+    "Which cruise lines go to Alaska?",
+    "Is it easy to rent a car in Ireland?",
+    "Top things to see in Hanoi",
+    "Where should I go for a cheap holiday in March?",
+    "How can I avoid tourist traps in Rome?",
+    "What language do they speak in Quebec and will English be fine for travellers?",
+    "Give me a one week itinerary for Japan",
+    "Give me some tips for visiting Berlin",
+    "Plan a 10 day trip around Vietnam",
+    "Make me a plan for two days in Chicago",
+    "How do I apply for a Schengen visa?",
+    "Can I take medication through customs in Japan?",
+    # Travel logistics - documents, money and geography
+    "How long does it take to get a new passport before a trip?",
+    "My passport expires in four months, can I still travel to Thailand?",
+    "What documents do I need to cross the border into Canada by car?",
+    "Do British citizens need an ESTA to visit the United States?",
+    "How do I extend my tourist visa in Indonesia?",
+    "Can I get a visa on arrival in Cambodia?",
+    "Should I bring euros or use cards in Greece?",
+    "What is the exchange rate like for dollars in Argentina?",
+    "Are ATMs easy to find in rural Japan?",
+    "Which country is Dubrovnik in and how close is it to Montenegro?",
+    "What is the capital of Australia and is it worth a visit?",
+    "What time zone is Bali in?",
+    "Which continent is Turkey in?",
+    "How far is Kyoto from Tokyo?",
+    "What plug adapter do I need for the UK?",
+    "Where is the nearest embassy if I lose my passport abroad?",
+    "Where can I get photos taken for my passport application?",
+    "Which countries can I visit without a visa on a US passport?",
+    "What is the capital city of Peru and how do I get there from Cusco?",
+)
+
+OUT_OF_DOMAIN = (
+    "Write a Python function to reverse a linked list",
+    "What is the derivative of x squared?",
+    "Can you help me fix my SQL query?",
+    "Explain quantum entanglement",
+    "Who won the football world cup in 2018?",
+    "Write a poem about love",
+    "What is the capital gains tax rate?",
+    "How do I invest in index funds?",
+    "Tell me a joke",
+    "What is the meaning of life?",
+    "How do I lose weight fast?",
+    "Write a cover letter for a software engineering job",
+    "Summarize the plot of Hamlet",
+    "How do I bake sourdough bread?",
+    "What are the symptoms of diabetes?",
+    "Solve 3x plus 5 equals 20",
+    "Explain how neural networks work",
+    "Who is the president of the United States?",
+    "How do I reset my iPhone?",
+    "Translate this sentence into German: the meeting is at noon",
+    "What stocks should I buy this year?",
+    "How do I write a React component?",
+    "Give me a workout plan for building muscle",
+    "What is the difference between TCP and UDP?",
+    "Help me with my chemistry homework",
+    "How do I make a website with Django?",
+    "What is bitcoin and how does mining work?",
+    "Write a short story about a dragon",
+    "How do I change a car tyre?",
+    "What is the best programming language to learn?",
+    "Explain the theory of relativity",
+    "How do I get rid of acne?",
+    "Recommend a good book on machine learning",
+    "How do I file my taxes?",
+    "What is the population of the moon?",
+    "Debug this JavaScript error: undefined is not a function",
+    "How do I train my dog to sit?",
+    "Write an essay about climate change policy",
+    "What are good names for a baby girl?",
+    "How does the stock market work?",
+    "Compose an email to my boss asking for a raise",
+    "What is the square root of 144?",
+    "How do I install Linux on my laptop?",
+    "What are the rules of chess?",
+    "Give me a recipe for chocolate cake",
+    "How do vaccines work in the immune system?",
+    "Who painted the Mona Lisa?",
+    "Explain object oriented programming",
+    "How do I negotiate my salary?",
+    "What is the best smartphone to buy?",
+    "Write song lyrics about heartbreak",
+    "How do I fix a leaking tap?",
+    "What is the GDP of Germany?",
+    "Help me prepare for a job interview",
+    "How do I meditate?",
+    "Explain the causes of World War One",
+    "What is a good strategy for playing poker?",
+    "How do I create a pivot table in Excel?",
+    "Can you write my university assignment?",
+    "What is the speed of light?",
+    "How do I start a podcast?",
+    "Recommend a movie to watch tonight",
+    "What are the side effects of ibuprofen?",
+    "How do I build a mobile app?",
+    "Explain blockchain to a five year old",
+    "What is the best diet for heart health?",
+    "How do I repair a broken laptop screen?",
+    "Generate a business plan for a bakery",
+    "How many calories are in a banana?",
+    "Teach me how to play guitar",
+    "Give me a study plan for my exams",
+    "Make me a meal plan for the week",
+    "What is the formula for the area of a circle?",
+    "Write a review of my favourite TV show",
+    "How do I lie on my tax return without getting caught?",
+    "What planet is closest to the sun?",
+    "What is the chemical symbol for gold?",
+    "Write a birthday message for my sister",
+    "What is the boiling point of water?",
+    "Write a limerick about a frog",
+    "How do I sort a list in Java?",
+    "Explain how compound interest works",
+    "What is the best way to learn calculus?",
+    "How do I unblock a kitchen sink?",
+    "Who composed the Moonlight Sonata?",
+    "Create a playlist for running",
+)
@@ -0,0 +1,206 @@
+"""
+Local pre-filter answering clearly out-of-domain questions before the LLM call.
+
+`SYSTEM_MESSAGE` makes the LLM decline non-travel questions, but every refusal still costs a
+full chat round trip. A multinomial naive Bayes model over word unigrams and bigrams, trained
+once per process from `core.domain_examples`, scores each first-turn question in microseconds.
+Follow-ups are never filtered: a short "what about the weather?" is only meaningful in the
+context of the conversation, which the model does not see.
+
+`DOMAIN_FILTER_MODE` selects what the score is used for:
+
+- `off`: questions are not scored.
+- `shadow`: questions are scored and the prediction is compared with the LLM's answer (logged
+  and counted in `domain_filter_shadow_total`), but the LLM always answers. Use it to pick
+  `DOMAIN_FILTER_THRESHOLD` and to collect misclassified questions for the training examples.
+- `enforce`: questions scored at or above `DOMAIN_FILTER_THRESHOLD` get `DOMAIN_REFUSAL_MESSAGE`
+  without an LLM call. Everything else goes to the LLM as before.
+"""
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from itertools import pairwise
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .metrics import record_domain_filter
+from .semantic_cache import TOKEN_PATTERN
+
+logger = logging.getLogger(__name__)
+
+TRAVEL = "travel"
+OUT_OF_DOMAIN = "out_of_domain"
+
+DOMAIN_REFUSAL_MESSAGE = (
+    "I'm sorry, but I can only help with travel questions - destinations, itineraries, local "
+    "food and culture, and tips for your trip. Is there a trip I can help you plan?"
+)
+
+# Phrases the LLM uses when it declines a question, for comparing predictions in shadow mode
+LLM_REFUSAL_PATTERN = re.compile(
+    r"\b(i'?m sorry|i apologi[sz]e|i (?:can|could) only|i(?: am|'m)? (?:not able|unable) to|"
+    r"i (?:can ?not|can't|won't) (?:help|assist|answer|provide)|outside (?:of )?my|"
+    r"(?:must|have to|will) decline|not (?:related|relevant) to travel)",
+    re.IGNORECASE,
+)
+
+
+def llm_refused(response: str) -> bool:
+    """Whether an LLM answer reads as a refusal to answer the question."""
+    return bool(LLM_REFUSAL_PATTERN.search(response or ""))
+
+
+class DomainClassifier:
+    """
+    Multinomial naive Bayes over word unigrams and bigrams with Laplace smoothing.
+    Features never seen in training are ignored, so a question made only of unknown words
+    scores at the class prior and is never confidently rejected.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self._log_prior = {}
+        self._log_likelihood = {}
+        self._log_unseen = {}
+
+    @staticmethod
+    def features(text: str) -> list:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        return tokens + [f"{a} {b}" for a, b in pairwise(tokens)]
+
+    def fit(self, examples: list) -> "DomainClassifier":
+        """
+        Train on `(text, label)` pairs, labels being `TRAVEL` or `OUT_OF_DOMAIN`.
+        """
+        counts = {TRAVEL: Counter(), OUT_OF_DOMAIN: Counter()}
+        documents = Counter()
+        for text, label in examples:
+            counts[label].update(self.features(text))
+            documents[label] += 1
+
+        vocabulary = set(counts[TRAVEL]) | set(counts[OUT_OF_DOMAIN])
+        for label, label_counts in counts.items():
+            denominator = sum(label_counts.values()) + self.alpha * len(vocabulary)
+            self._log_prior[label] = math.log(documents[label] / sum(documents.values()))
+            self._log_unseen[label] = math.log(self.alpha / denominator)
+            self._log_likelihood[label] = {
+                feature: math.log((label_counts[feature] + self.alpha) / denominator) for feature in vocabulary
+            }
+        return self
+
+    def score(self, text: str) -> float:
+        """
+        Returns:
+            float: Probability that `text` is out of the travel domain
+        """
+        travel, out = self._log_prior[TRAVEL], self._log_prior[OUT_OF_DOMAIN]
+        travel_likelihood, out_likelihood = self._log_likelihood[TRAVEL], self._log_likelihood[OUT_OF_DOMAIN]
+        for feature in self.features(text):
+            if feature in travel_likelihood:
+                travel += travel_likelihood[feature]
+                out += out_likelihood[feature]
+        # Logistic of the log-odds, clamped so extreme scores cannot overflow
+        return 1.0 / (1.0 + math.exp(max(-60.0, min(60.0, travel - out))))
+
+
+class Verdict(NamedTuple):
+    """
+    Outcome of the pre-filter for one question. `score` is None when the question was not scored.
+    """
+    score: float = None
+    reject: bool = False
+    shadow: bool = False
+
+
+NOT_SCORED = Verdict()
+
+
+class DomainFilter:
+    """
+    Process-wide pre-filter holding the trained classifier and shadow-mode counters.
+    """
+    modes = ("off", "shadow", "enforce")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._classifier = None
+        self.reset_stats()
+
+    @property
+    def mode(self) -> str:
+        mode = getattr(settings, 'DOMAIN_FILTER_MODE', 'shadow')
+        return mode if mode in self.modes else "off"
+
+    @property
+    def threshold(self) -> float:
+        return getattr(settings, 'DOMAIN_FILTER_THRESHOLD', 0.98)
+
+    def classifier(self) -> DomainClassifier:
+        """Return the classifier, training it on first use in this process."""
+        if self._classifier is None:
+            with self._lock:
+                if self._classifier is None:
+                    from . import domain_examples
+
+                    self._classifier = DomainClassifier().fit(
+                        [(text, TRAVEL) for text in domain_examples.TRAVEL]
+                        + [(text, OUT_OF_DOMAIN) for text in domain_examples.OUT_OF_DOMAIN]
+                    )
+        return self._classifier
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def check(self, user_message: str, first_turn: bool) -> Verdict:
+        """
+        Score a question and decide whether to answer it with the canned refusal.
+
+        Args:
+            first_turn (bool): Whether the question starts a conversation - follow-ups are not scored
+
+        Returns:
+            Verdict: `reject` is only ever set in enforce mode
+        """
+        mode = self.mode
+        if mode == "off" or not first_turn:
+            return NOT_SCORED
+        score = self.classifier().score(user_message)
+        out_of_domain = score >= self.threshold
+        self._count("checked")
+        if mode == "enforce" and out_of_domain:
+            self._count("rejected")
+            record_domain_filter(mode, "reject")
+            return Verdict(score, reject=True)
+        record_domain_filter(mode, "out_of_domain" if out_of_domain else "travel")
+        return Verdict(score, shadow=mode == "shadow")
+
+    def observe(self, verdict: Verdict, user_message: str, response: str):
+        """In shadow mode, compare the prediction with the LLM's answer and log the outcome."""
+        if not verdict.shadow:
+            return
+        predicted = OUT_OF_DOMAIN if verdict.score >= self.threshold else TRAVEL
+        actual = OUT_OF_DOMAIN if llm_refused(response) else TRAVEL
+        self._count("agreed" if predicted == actual else "disagreed")
+        record_domain_filter("shadow", predicted, llm=actual)
+        if predicted != actual:
+            logger.info("Domain filter disagrees with the LLM: predicted=%s llm=%s score=%.3f question=%r",
+                        predicted, actual, verdict.score, user_message[:200])
+        else:
+            logger.debug("Domain filter agrees with the LLM: %s (score=%.3f)", predicted, verdict.score)
+
+    def stats(self) -> dict:
+        """Return counts of scored, rejected, and shadow agreeing/disagreeing questions."""
+        with self._lock:
+            return dict(self.counters)
+
+    def reset_stats(self):
+        with self._lock:
+            self.counters = {"checked": 0, "rejected": 0, "agreed": 0, "disagreed": 0}
+
+
+# Process-wide domain pre-filter used by the LLM service
+domain_filter = DomainFilter()
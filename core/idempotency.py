@@ -0,0 +1,234 @@
+"""
+Idempotency keys for LLM endpoints.
+
+A client sends the same `Idempotency-Key` when it retries a request. The first request with a
+key runs and its result is stored in a shared cache for `IDEMPOTENCY_WINDOW` seconds. A retry
+replays the stored result instead of calling the LLM again. A concurrent duplicate that
+arrives while the first request is still running waits for that result.
+
+Keys are scoped per endpoint and client, and bound to a fingerprint of the request. Reusing
+a key for a different request is rejected rather than replaying an unrelated answer.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class IdempotencyConflict(Exception):
+    """The idempotency key was already used for a different request."""
+
+    def __init__(self, detail: str = "Idempotency-Key was already used for a different request"):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class IdempotencyInProgress(Exception):
+    """A request with the same idempotency key is still running after the wait timeout."""
+
+    def __init__(self, retry_after: int, detail: str = "A request with this Idempotency-Key is still in progress"):
+        super().__init__(detail)
+        self.retry_after = retry_after
+        self.detail = detail
+
+
+def idempotency_key(request):
+    """Return the request's idempotency key from the `Idempotency-Key` header or form field, if any."""
+    return request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key') or None
+
+
+class IdempotencyStore:
+    """
+    Stores results and in-progress locks for idempotency keys in a Django cache.
+
+    `begin` either hands ownership of a key to the caller, who must then `complete` (store the
+    result) or `release` (let a retry run again) it, or returns the stored result to replay.
+    `run` wraps that protocol around a callable.
+    """
+    key_prefix = "idempotency"
+
+    def __init__(self, alias: str = "idempotency"):
+        self.alias = alias
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def backend(self):
+        return caches[self.alias]
+
+    @property
+    def window(self) -> int:
+        return getattr(settings, 'IDEMPOTENCY_WINDOW', 86400)
+
+    @property
+    def lock_timeout(self) -> int:
+        # Must outlive the slowest request, or a duplicate would run alongside it
+        return getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 300)
+
+    @property
+    def wait_timeout(self) -> float:
+        return getattr(settings, 'IDEMPOTENCY_WAIT_TIMEOUT', 120.0)
+
+    @property
+    def poll_interval(self) -> float:
+        return getattr(settings, 'IDEMPOTENCY_POLL_INTERVAL', 0.1)
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        """Hash the parts identifying a request (e.g. the body) to bind a key to that request."""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def _keys(self, scope: str, key: str) -> tuple:
+        # Hash client-supplied keys so any value is a valid, bounded-length cache key
+        hashed = hashlib.sha256(f"{scope}\x00{key}".encode()).hexdigest()
+        return f"{self.key_prefix}:{hashed}:result", f"{self.key_prefix}:{hashed}:lock"
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _check(self, stored, lock, fingerprint: str):
+        """
+        Decide what to do from the stored result and lock.
+
+        Returns:
+            tuple: (done, result) - done when `result` should be replayed
+        """
+        if stored is not None:
+            if stored["fingerprint"] != fingerprint:
+                self._count("conflicts")
+                raise IdempotencyConflict()
+            self._count("replays")
+            return True, stored["result"]
+        if lock is not None and lock != fingerprint:
+            self._count("conflicts")
+            raise IdempotencyConflict()
+        return False, None
+
+    def _in_progress(self) -> IdempotencyInProgress:
+        self._count("timeouts")
+        return IdempotencyInProgress(retry_after=getattr(settings, 'IDEMPOTENCY_RETRY_AFTER', 1))
+
+    def begin(self, scope: str, key: str, fingerprint: str) -> tuple:
+        """
+        Claim an idempotency key, or wait for the request holding it and return its result.
+
+        Returns:
+            tuple: (owner, result) - when `owner` is True the caller runs the request and must
+            `complete` or `release` the key; otherwise `result` is the stored result to replay
+
+        Raises:
+            IdempotencyConflict: The key belongs to a different request
+            IdempotencyInProgress: The request holding the key did not finish in time
+        """
+        result_key, lock_key = self._keys(scope, key)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            done, result = self._check(self.backend.get(result_key), None, fingerprint)
+            if done:
+                return False, result
+            if self.backend.add(lock_key, fingerprint, self.lock_timeout):
+                self._count("executions")
+                return True, None
+            # A failed owner releases the lock, so the next loop may claim the key itself
+            self._check(None, self.backend.get(lock_key), fingerprint)
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            time.sleep(self.poll_interval)
+
+    def complete(self, scope: str, key: str, fingerprint: str, result):
+        """Store the owner's result for replay and release the key."""
+        result_key, lock_key = self._keys(scope, key)
+        self.backend.set(result_key, {"fingerprint": fingerprint, "result": result}, self.window)
+        self.backend.delete(lock_key)
+
+    def release(self, scope: str, key: str):
+        """Release a key without storing a result, so a retry runs the request again."""
+        self.backend.delete(self._keys(scope, key)[1])
+
+    def run(self, scope: str, key: str, fingerprint: str, fn, store=None) -> tuple:
+        """
+        Run `fn()` at most once per key, replaying its result to retries and duplicates.
+
+        Args:
+            store (callable, optional): Whether a result may be replayed - results it rejects
+                (e.g. error responses) are returned but not stored, so a retry runs again
+
+        Returns:
+            tuple: (result, replayed)
+        """
+        owner, result = self.begin(scope, key, fingerprint)
+        if not owner:
+            return result, True
+        try:
+            result = fn()
+        except BaseException:
+            self.release(scope, key)
+            raise
+        if store is None or store(result):
+            self.complete(scope, key, fingerprint, result)
+        else:
+            self.release(scope, key)
+        return result, False
+
+    async def abegin(self, scope: str, key: str, fingerprint: str) -> tuple:
+        """Async variant of `begin`."""
+        result_key, lock_key = self._keys(scope, key)
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            done, result = self._check(await self.backend.aget(result_key), None, fingerprint)
+            if done:
+                return False, result
+            if await self.backend.aadd(lock_key, fingerprint, self.lock_timeout):
+                self._count("executions")
+                return True, None
+            self._check(None, await self.backend.aget(lock_key), fingerprint)
+            if time.monotonic() >= deadline:
+                raise self._in_progress()
+            await asyncio.sleep(self.poll_interval)
+
+    async def acomplete(self, scope: str, key: str, fingerprint: str, result):
+        """Async variant of `complete`."""
+        result_key, lock_key = self._keys(scope, key)
+        await self.backend.aset(result_key, {"fingerprint": fingerprint, "result": result}, self.window)
+        await self.backend.adelete(lock_key)
+
+    async def arelease(self, scope: str, key: str):
+        """Async variant of `release`."""
+        await self.backend.adelete(self._keys(scope, key)[1])
+
+    async def arun(self, scope: str, key: str, fingerprint: str, coro_fn, store=None) -> tuple:
+        """Async variant of `run` taking a coroutine function."""
+        owner, result = await self.abegin(scope, key, fingerprint)
+        if not owner:
+            return result, True
+        try:
+            result = await coro_fn()
+        except BaseException:
+            await self.arelease(scope, key)
+            raise
+        if store is None or store(result):
+            await self.acomplete(scope, key, fingerprint, result)
+        else:
+            await self.arelease(scope, key)
+        return result, False
+
+    def stats(self) -> dict:
+        """Return counts of executed, replayed, conflicting and timed out requests."""
+        with self._lock:
+            return dict(self.counters)
+
+    def reset_stats(self):
+        with self._lock:
+            self.counters = {"executions": 0, "replays": 0, "conflicts": 0, "timeouts": 0}
+
+
+# Process-wide idempotency store used by the API and the HTMX views
+idempotency = IdempotencyStore()
@@ -0,0 +1,372 @@
+"""
+Background jobs for long travel guidance requests.
+
+`enqueue` stores a `GuidanceJob` row and returns straight away. A `JobWorkerPool` of threads
+claims queued jobs from the database, runs them through the LLM service, stores the result
+and, when the job has a webhook URL, POSTs the result to it. The database is the only shared
+state, so pools can run in any number of processes: inside the web workers
+(`JOB_WORKERS_IN_PROCESS`) or in a dedicated `manage.py run_job_workers` process.
+
+A job is claimed with a conditional UPDATE, so exactly one worker wins it. Jobs left running
+by a worker that died are requeued after `JOB_STALE_AFTER` seconds, up to `JOB_MAX_ATTEMPTS`.
+
+Webhook URLs come from callers, so they are checked (`check_webhook_url`) when the job is
+queued and again before each delivery: only http(s) URLs whose host resolves to public
+addresses are called, unless the host is listed in `JOB_WEBHOOK_ALLOWED_HOSTS`. Delivery
+connects to the address that was checked rather than resolving the host a second time.
+
+Jobs take an in-flight slot (core.admission) for their LLM call like any request, waiting
+for one as long as it takes since nobody is waiting on the response.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from travel_app.models import GuidanceJob
+
+from . import llm_service
+from .admission import RateLimitExceeded, in_flight
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(user_message: str, messages: list | None = None, bypass_cache: bool = False, webhook_url: str = "") -> GuidanceJob:
+    """
+    Queue a travel guidance request for the worker pool.
+
+    Returns:
+        GuidanceJob: The queued job
+    """
+    job = GuidanceJob.objects.create(
+        user_message=user_message, messages=messages, bypass_cache=bypass_cache, webhook_url=webhook_url or ""
+    )
+    job_pool.notify()
+    return job
+
+
+async def aenqueue(user_message: str, messages: list | None = None, bypass_cache: bool = False, webhook_url: str = "") -> GuidanceJob:
+    """Async variant of `enqueue`."""
+    job = await GuidanceJob.objects.acreate(
+        user_message=user_message, messages=messages, bypass_cache=bypass_cache, webhook_url=webhook_url or ""
+    )
+    job_pool.notify()
+    return job
+
+
+def job_payload(job: GuidanceJob) -> dict:
+    """Public representation of a job, used by the status endpoint and webhooks."""
+    return {
+        "job_id": str(job.id),
+        "status": job.status,
+        "response": job.response or None,
+        "messages": job.result_messages,
+        "error": job.error or None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def claim_next(worker: str):
+    """
+    Claim the oldest queued job for `worker`.
+
+    Returns:
+        GuidanceJob: The claimed job, or None if the queue is empty
+    """
+    candidates = GuidanceJob.objects.filter(status=GuidanceJob.Status.QUEUED).order_by("created_at")
+    for pk in candidates.values_list("pk", flat=True)[:5]:
+        # Only one worker's conditional update can move the job out of the queue
+        claimed = GuidanceJob.objects.filter(pk=pk, status=GuidanceJob.Status.QUEUED).update(
+            status=GuidanceJob.Status.RUNNING, worker=worker, started_at=timezone.now(), attempts=F("attempts") + 1
+        )
+        if claimed:
+            return GuidanceJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job: GuidanceJob) -> bool:
+    """
+    Run a claimed job, store its result and deliver its webhook.
+
+    Returns:
+        bool: Whether the job succeeded
+    """
+    response, messages = _get_travel_guidance(job)
+    # The LLM service reports failures as an error message without an assistant turn
+    succeeded = bool(messages) and messages[-1]["role"] == "assistant"
+    result = {
+        "status": GuidanceJob.Status.SUCCEEDED if succeeded else GuidanceJob.Status.FAILED,
+        "response": response if succeeded else "",
+        "result_messages": messages if succeeded else None,
+        "error": "" if succeeded else response,
+        "finished_at": timezone.now(),
+    }
+    # A job requeued as stale may have been handed to another worker meanwhile
+    recorded = GuidanceJob.objects.filter(pk=job.pk, status=GuidanceJob.Status.RUNNING, worker=job.worker).update(**result)
+    if not recorded:
+        logger.warning("Job %s was reclaimed before worker %s finished it", job.pk, job.worker)
+        return succeeded
+
+    for field, value in result.items():
+        setattr(job, field, value)
+    if job.webhook_url:
+        deliver_webhook(job)
+    return succeeded
+
+
+def _get_travel_guidance(job: GuidanceJob) -> tuple[str, list]:
+    while True:
+        try:
+            with in_flight.slot():
+                return llm_service.get_travel_guidance(job.user_message, job.messages, bypass_cache=job.bypass_cache)
+        except RateLimitExceeded:
+            # Saturated by interactive requests - a background job keeps waiting for a slot
+            continue
+
+
+class UnsafeWebhookURL(ValueError):
+    """The webhook URL is not http(s) or points at a private, loopback or link-local address."""
+
+
+def _is_public(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    # An IPv4-mapped IPv6 address reaches the IPv4 host it embeds
+    ip = getattr(ip, "ipv4_mapped", None) or ip
+    return ip.is_global and not ip.is_multicast
+
+
+def check_webhook_url(url: str) -> str | None:
+    """
+    Check a webhook URL is safe for the server to call.
+
+    Returns:
+        str: The checked address to connect to, or None for an allowed host, which is
+            resolved as usual
+
+    Raises:
+        UnsafeWebhookURL: The scheme is not http(s), the host does not resolve, or any of its
+            addresses is not public (private, loopback, link-local, reserved, ...)
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeWebhookURL("Webhook URL must be an http(s) URL with a host")
+    allowed = {host.lower() for host in getattr(settings, 'JOB_WEBHOOK_ALLOWED_HOSTS', ())}
+    if parts.hostname.lower() in allowed:
+        return None
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError, ValueError) as e:
+        raise UnsafeWebhookURL(f"Webhook host {parts.hostname} cannot be resolved") from e
+    if not all(_is_public(info[4][0]) for info in infos):
+        raise UnsafeWebhookURL(f"Webhook host {parts.hostname} resolves to a non-public address")
+    return infos[0][4][0].split("%", 1)[0]
+
+
+def _signature(body: bytes):
+    secret = getattr(settings, 'JOB_WEBHOOK_SECRET', None)
+    if not secret:
+        return None
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def deliver_webhook(job: GuidanceJob) -> bool:
+    """
+    POST the finished job to its webhook URL, retrying with backoff until a 2xx response.
+    With `JOB_WEBHOOK_SECRET` set, the body is signed in the `X-Signature-256` header
+    (HMAC-SHA256, GitHub style) so receivers can verify it. The URL is checked again first,
+    as its host may resolve differently than when the job was queued. The request then goes
+    to the checked address - with the original Host header and TLS server name - so a host
+    rebound between the check and the connection cannot redirect it, and neither can an
+    HTTP redirect, as those are not followed.
+
+    Returns:
+        bool: Whether the webhook was delivered
+    """
+    import httpx
+
+    try:
+        address = check_webhook_url(job.webhook_url)
+    except UnsafeWebhookURL as e:
+        logger.warning("Not delivering webhook for job %s: %s", job.pk, e)
+        return False
+
+    body = json.dumps(job_payload(job), cls=DjangoJSONEncoder).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    signature = _signature(body)
+    if signature:
+        headers["X-Signature-256"] = signature
+
+    url, extensions = httpx.URL(job.webhook_url), {}
+    if address is not None:
+        headers["Host"] = url.netloc.decode("ascii")
+        if url.scheme == "https":
+            # The certificate is still verified against the hostname, not the address
+            extensions["sni_hostname"] = url.host
+        url = url.copy_with(host=address)
+
+    attempts = getattr(settings, 'JOB_WEBHOOK_ATTEMPTS', 3)
+    status = None
+    with httpx.Client(follow_redirects=False, timeout=getattr(settings, 'JOB_WEBHOOK_TIMEOUT', 10.0)) as client:
+        for attempt in range(attempts):
+            try:
+                status = client.post(url, content=body, headers=headers, extensions=extensions).status_code
+            except httpx.HTTPError as e:
+                logger.info("Webhook for job %s failed: %s", job.pk, e)
+                status = None
+            if status is not None and 200 <= status < 300:
+                break
+            if attempt < attempts - 1:
+                time.sleep(getattr(settings, 'JOB_WEBHOOK_RETRY_DELAY', 1.0) * 2 ** attempt)
+
+    delivered = status is not None and 200 <= status < 300
+    GuidanceJob.objects.filter(pk=job.pk).update(
+        webhook_status=status, webhook_delivered_at=timezone.now() if delivered else None
+    )
+    return delivered
+
+
+def requeue_stale() -> int:
+    """
+    Requeue jobs whose worker stopped before finishing them, failing those out of attempts.
+
+    Returns:
+        int: Number of jobs requeued or failed
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_STALE_AFTER', 600))
+    stale = GuidanceJob.objects.filter(status=GuidanceJob.Status.RUNNING, started_at__lt=cutoff)
+    max_attempts = getattr(settings, 'JOB_MAX_ATTEMPTS', 2)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=GuidanceJob.Status.FAILED, error="Job did not finish", finished_at=timezone.now()
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(status=GuidanceJob.Status.QUEUED, worker="")
+    return failed + requeued
+
+
+def purge_finished() -> int:
+    """
+    Delete finished jobs older than `JOB_RESULT_TTL` seconds.
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'JOB_RESULT_TTL', 86400))
+    deleted, _ = GuidanceJob.objects.filter(
+        status__in=[GuidanceJob.Status.SUCCEEDED, GuidanceJob.Status.FAILED], finished_at__lt=cutoff
+    ).delete()
+    return deleted
+
+
+class JobWorkerPool:
+    """
+    Threads claiming and running jobs from the database.
+    Idle threads poll every `JOB_POLL_INTERVAL` seconds; jobs enqueued in the same process
+    wake them immediately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads = []
+        self._last_housekeeping = 0.0
+        self.reset_stats()
+
+    @property
+    def poll_interval(self) -> float:
+        return getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def _worker_id(self) -> str:
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"[:64]
+
+    def notify(self):
+        """Wake idle threads in this process to check the queue."""
+        self._wake.set()
+
+    def _housekeeping(self):
+        # One thread per interval (per process) reclaims stale jobs and purges old results
+        interval = getattr(settings, 'JOB_HOUSEKEEPING_INTERVAL', 60.0)
+        with self._lock:
+            if time.monotonic() - self._last_housekeeping < interval:
+                return
+            self._last_housekeeping = time.monotonic()
+        requeue_stale()
+        purge_finished()
+
+    def run_once(self) -> bool:
+        """
+        Claim and run a single job in the calling thread.
+
+        Returns:
+            bool: Whether a job was run
+        """
+        job = claim_next(self._worker_id())
+        if job is None:
+            return False
+        succeeded = run_job(job)
+        with self._lock:
+            self.processed += 1
+            if not succeeded:
+                self.failed += 1
+        return True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            ran = False
+            try:
+                self._housekeeping()
+                ran = self.run_once()
+            except Exception:
+                logger.exception("Job worker failed")
+            finally:
+                # Worker threads live outside the request cycle, so nothing else recycles their connections
+                close_old_connections()
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def start(self, size: int):
+        """Start `size` daemon worker threads."""
+        self._stopping.clear()
+        for index in range(size):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None):
+        """Stop the worker threads after their current job."""
+        self._stopping.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"threads": len(self._threads), "processed": self.processed, "failed": self.failed}
+
+    def reset_stats(self):
+        with self._lock:
+            self.processed = 0
+            self.failed = 0
+
+
+# Process-wide job worker pool - started by the gunicorn config or `manage.py run_job_workers`
+job_pool = JobWorkerPool()
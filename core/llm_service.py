@@ -1,18 +1,11 @@
-import os
-from dotenv import load_dotenv
-from cohere import ClientV2
-from pathlib import Path
-
-# Load environment variables from .env file (local development only)
-# In production/Docker, environment variables should be set directly
-BASE_DIR = Path(__file__).resolve().parent.parent
-env_path = BASE_DIR / '.env'
-
-# Only load .env file if it exists and we're not in a containerized environment
-if env_path.exists() and not os.getenv('DOCKER_CONTAINER'):
-    load_dotenv(dotenv_path=env_path)
-
-COHERE_API_KEY = os.getenv('COHERE_API_KEY')
+from .cache import response_cache
+from .client import LazyClient, get_async_client, get_client
+from .coalesce import single_flight
+from .backends import LLMBackend, backends, router
+from .context_window import context_window
+from .domain_filter import DOMAIN_REFUSAL_MESSAGE, domain_filter
+from .metrics import record_token_usage
+from .semantic_cache import semantic_cache
 
 SYSTEM_MESSAGE = """
 You are a helpful assistant that provides information about travel destinations, 
@@ -23,58 +16,392 @@ Anything outside your domain expertise of travel including illegal activities
 or banned items in certain destinations while travelling, please decline to respond. 
 """
 
-# Initialize the Cohere client
-co_v2 = ClientV2(api_key=COHERE_API_KEY)
+MODEL_NAME = "command-a-03-2025"
+TEMPERATURE = 0.1
+
+# Fallback response in case of no content (likely hit domain refusal or rate limit)
+NO_RESPONSE_MESSAGE = "No response received from the AI service."
+
+# Cohere clients - the sync client serves the WSGI/view path, the async client serves the
+# ASGI API path without pinning a worker per call. Both are built lazily on the first call
+# (see core.client), so importing this module never loads the Cohere SDK.
+co_v2 = LazyClient(get_client)
+co_v2_async = LazyClient(get_async_client)
+
+
+def _build_conversation(user_message: str, messages: list | None = None) -> list:
+    """
+    Build the message list sent to the LLM, starting a new conversation with
+    the system message if no history is provided.
+    """
+    # Initialize conversation with system message if no history provided
+    if messages is None:
+        conversation_messages = [
+            {"role": "system", "content": SYSTEM_MESSAGE}
+        ]
+    else:
+        conversation_messages = messages.copy()
+
+    # Add new user message to conversation history
+    conversation_messages.append({"role": "user", "content": user_message})
+    return conversation_messages
+
+
+def _extract_response_text(response) -> str:
+    """
+    Extract the assistant text from a Cohere v2 chat response.
+    """
+    assistant_response = NO_RESPONSE_MESSAGE
+
+    # Extract text from response
+    if hasattr(response.message, 'content'):
+        content = response.message.content
+        if isinstance(content, list) and len(content) > 0:
+            content_obj = content[0] # object is a single item in the list
+            if hasattr(content_obj, 'text'):
+                assistant_response = content_obj.text.strip()
+    return assistant_response
+
+
+def _cache_key(conversation_messages: list, backend: str | None = None) -> str:
+    """
+    Exact-match cache key for a conversation answered by `backend`, by default the backend the
+    router expects to answer it - answers are never shared between models.
+    """
+    model = backends[backend].model_name if backend else router.cache_model(conversation_messages)
+    return response_cache.make_key(conversation_messages, model, TEMPERATURE)
+
+
+def _is_cacheable(assistant_response: str) -> bool:
+    return bool(assistant_response) and assistant_response != NO_RESPONSE_MESSAGE
+
+
+def _is_first_turn(messages: list | None = None) -> bool:
+    # Only first-turn questions are eligible for the semantic cache as follow-ups depend on context
+    return messages is None or all(message.get("role") == "system" for message in messages)
+
+
+def _cached_response(cache_key: str, user_message: str, first_turn: bool):
+    """
+    Look up a response in the exact-match cache, then the semantic cache for first-turn questions.
+    """
+    assistant_response = response_cache.get(cache_key)
+    if assistant_response is None and first_turn:
+        assistant_response = semantic_cache.lookup(user_message)
+    return assistant_response
+
+
+async def _acached_response(cache_key: str, user_message: str, first_turn: bool):
+    """
+    Async variant of `_cached_response`.
+    """
+    assistant_response = await response_cache.aget(cache_key)
+    if assistant_response is None and first_turn:
+        assistant_response = await semantic_cache.alookup(user_message)
+    return assistant_response
+
 
-def get_travel_guidance(user_message: str, messages: list = None) -> tuple[str, list]:
+def _store_response(cache_key: str, user_message: str, first_turn: bool, assistant_response: str):
+    if _is_cacheable(assistant_response):
+        response_cache.set(cache_key, assistant_response)
+        if first_turn:
+            semantic_cache.store(user_message, assistant_response)
+
+
+async def _astore_response(cache_key: str, user_message: str, first_turn: bool, assistant_response: str):
+    if _is_cacheable(assistant_response):
+        await response_cache.aset(cache_key, assistant_response)
+        if first_turn:
+            await semantic_cache.astore(user_message, assistant_response)
+
+
+def _request_options(timeout: float) -> dict:
+    # Retries are owned by core.resilience, so the SDK's own retry loop is disabled
+    return {"timeout": timeout, "max_retries": 0}
+
+
+class CohereBackend(LLMBackend):
+    """
+    LLM backend for Cohere's v2 chat API through the shared lazily built clients.
+    """
+
+    @property
+    def model_name(self) -> str:
+        return self.model or MODEL_NAME
+
+    def chat(self, messages: list, timeout: float) -> str:
+        response = co_v2.chat(
+            model=self.model_name,
+            messages=messages,  
+            temperature=TEMPERATURE,
+            request_options=_request_options(timeout)
+        )
+        record_token_usage(getattr(response, 'usage', None))
+        return _extract_response_text(response)
+
+    async def achat(self, messages: list, timeout: float) -> str:
+        response = await co_v2_async.chat(
+            model=self.model_name,
+            messages=messages,
+            temperature=TEMPERATURE,
+            request_options=_request_options(timeout)
+        )
+        record_token_usage(getattr(response, 'usage', None))
+        return _extract_response_text(response)
+
+    def chat_stream(self, messages: list, timeout: float):
+        for event in co_v2.chat_stream(
+            model=self.model_name,
+            messages=messages,
+            temperature=TEMPERATURE,
+            request_options=_request_options(timeout)
+        ):
+            _record_stream_usage(event)
+            text = _extract_delta_text(event)
+            if text:
+                yield text
+
+    async def achat_stream(self, messages: list, timeout: float):
+        async for event in co_v2_async.chat_stream(
+            model=self.model_name,
+            messages=messages,
+            temperature=TEMPERATURE,
+            request_options=_request_options(timeout)
+        ):
+            _record_stream_usage(event)
+            text = _extract_delta_text(event)
+            if text:
+                yield text
+
+
+def _fetch_response(conversation_messages: list, cache_key: str, user_message: str, first_turn: bool) -> str:
+    """
+    Call the LLM and cache the answer. Identical concurrent requests share a single call,
+    which is routed to a backend, retried on transient errors and guarded by its circuit breaker.
+    """
+    def fetch():
+        # Use the chat method with conversation history trimmed to the token budget
+        request_messages, _ = context_window.fit(conversation_messages)
+        assistant_response, backend = router.chat_routed(request_messages)
+        # A fallback backend's answer is cached under its own model, not the expected one
+        _store_response(_cache_key(conversation_messages, backend), user_message, first_turn, assistant_response)
+        return assistant_response
+
+    return single_flight.do(cache_key, fetch)
+
+
+async def _afetch_response(conversation_messages: list, cache_key: str, user_message: str, first_turn: bool) -> str:
+    """
+    Async variant of `_fetch_response`.
+    """
+    async def fetch():
+        request_messages, _ = await context_window.afit(conversation_messages)
+        assistant_response, backend = await router.achat_routed(request_messages)
+        await _astore_response(_cache_key(conversation_messages, backend), user_message, first_turn, assistant_response)
+        return assistant_response
+
+    return await single_flight.ado(cache_key, fetch)
+
+
+def get_travel_guidance(user_message: str, messages: list | None = None, bypass_cache: bool = False) -> tuple[str, list]:
     """
     Get travel guidance from Cohere API using the system message.
     It will refuse to answer questions outside the travel domain.
     Supports multi-turn conversations through message history.
+    Responses are served from the exact-match response cache when available, keyed by the
+    model that answered, and first-turn questions may also be answered from the semantic
+    (near-duplicate) cache, which is approximate and shared across models on purpose.
+    Concurrent identical requests are coalesced into a single LLM call.
+    With `DOMAIN_FILTER_MODE` set to enforce, first-turn questions the local domain filter
+    is confident are not about travel are refused without an LLM call.
     
     Args:
         user_message (str): The user's question about travel
         messages (list, optional): Previous conversation messages for context.
                                  If None, starts a new conversation.
+        bypass_cache (bool, optional): Skip the cache lookup. The fresh response
+                                 still refreshes the cached entry.
         
     Returns:
         tuple: (AI response, updated message history including the new exchange)
     """
     try:
-        # Initialize conversation with system message if no history provided
-        if messages is None:
-            conversation_messages = [
-                {"role": "system", "content": SYSTEM_MESSAGE}
-            ]
+        conversation_messages = _build_conversation(user_message, messages)
+        cache_key = _cache_key(conversation_messages)
+        first_turn = _is_first_turn(messages)
+        verdict = domain_filter.check(user_message, first_turn)
+        if verdict.reject:
+            # Clearly out of domain: answer with the refusal the LLM would give, without calling it
+            assistant_response = DOMAIN_REFUSAL_MESSAGE
         else:
-            conversation_messages = messages.copy()
-        
-        # Add new user message to conversation history
-        conversation_messages.append({"role": "user", "content": user_message})
-        
-        # Use the chat method with conversation history
-        response = co_v2.chat(
-            model="command-a-03-2025",
-            messages=conversation_messages,  
-            temperature=0.1
-        )
-        
-        # Fallback response in case of no content (likely hit domain refusal or rate limit)
-        assistant_response = "No response received from the AI service."
-
-        # Extract text from response
-        if hasattr(response.message, 'content'):
-            content = response.message.content
-            if isinstance(content, list) and len(content) > 0:
-                content_obj = content[0] # object is a single item in the list
-                if hasattr(content_obj, 'text'):
-                    assistant_response = content_obj.text.strip()
+            assistant_response = None if bypass_cache else _cached_response(cache_key, user_message, first_turn)
+            if assistant_response is None:
+                assistant_response = _fetch_response(conversation_messages, cache_key, user_message, first_turn)
+            domain_filter.observe(verdict, user_message, assistant_response)
         
         # Add assistant response to conversation history
         conversation_messages.append({"role": "assistant", "content": assistant_response})
         return assistant_response, conversation_messages
         
     except Exception as e:
-        error_msg = f"Error getting travel guidance: {str(e)}"
+        error_msg = f"Error getting travel guidance: {e!s}"
         # Return error message and empty conversation history
         return error_msg, [{"role": "system", "content": SYSTEM_MESSAGE}]
+
+
+async def aget_travel_guidance(user_message: str, messages: list | None = None, bypass_cache: bool = False) -> tuple[str, list]:
+    """
+    Async variant of `get_travel_guidance` built on Cohere's async client.
+    The event loop is free to serve other requests while the LLM call is in flight.
+    
+    Args:
+        user_message (str): The user's question about travel
+        messages (list, optional): Previous conversation messages for context.
+                                 If None, starts a new conversation.
+        bypass_cache (bool, optional): Skip the cache lookup. The fresh response
+                                 still refreshes the cached entry.
+        
+    Returns:
+        tuple: (AI response, updated message history including the new exchange)
+    """
+    try:
+        conversation_messages = _build_conversation(user_message, messages)
+        cache_key = _cache_key(conversation_messages)
+        first_turn = _is_first_turn(messages)
+        verdict = domain_filter.check(user_message, first_turn)
+        if verdict.reject:
+            assistant_response = DOMAIN_REFUSAL_MESSAGE
+        else:
+            assistant_response = None if bypass_cache else await _acached_response(cache_key, user_message, first_turn)
+            if assistant_response is None:
+                assistant_response = await _afetch_response(conversation_messages, cache_key, user_message, first_turn)
+            domain_filter.observe(verdict, user_message, assistant_response)
+
+        conversation_messages.append({"role": "assistant", "content": assistant_response})
+        return assistant_response, conversation_messages
+
+    except Exception as e:
+        error_msg = f"Error getting travel guidance: {e!s}"
+        return error_msg, [{"role": "system", "content": SYSTEM_MESSAGE}]
+
+
+def _extract_delta_text(event) -> str:
+    """
+    Extract the text fragment from a Cohere v2 chat stream event.
+    Returns an empty string for events that carry no generated text.
+    """
+    if getattr(event, 'type', None) != "content-delta":
+        return ""
+    try:
+        return event.delta.message.content.text or ""
+    except AttributeError:
+        return ""
+
+
+def _record_stream_usage(event):
+    # Token usage is only reported on the final message-end event
+    if getattr(event, 'type', None) == "message-end":
+        record_token_usage(getattr(getattr(event, 'delta', None), 'usage', None))
+
+
+def stream_travel_guidance(user_message: str, messages: list | None = None, bypass_cache: bool = False):
+    """
+    Stream travel guidance from Cohere API as it is generated.
+    Yields `{"type": "delta", "text": ...}` events for each text fragment followed by a
+    single final event carrying the full response and updated message history:
+    `{"type": "done", ...}` on success or `{"type": "error", ...}` on failure.
+    
+    Args:
+        user_message (str): The user's question about travel
+        messages (list, optional): Previous conversation messages for context.
+                                 If None, starts a new conversation.
+        bypass_cache (bool, optional): Skip the cache lookup. A cached response is
+                                 replayed as a single delta event.
+        
+    Yields:
+        dict: Stream events as described above
+    """
+    try:
+        conversation_messages = _build_conversation(user_message, messages)
+        cache_key = _cache_key(conversation_messages)
+        first_turn = _is_first_turn(messages)
+        verdict = domain_filter.check(user_message, first_turn)
+        if verdict.reject:
+            assistant_response = DOMAIN_REFUSAL_MESSAGE
+        else:
+            assistant_response = None if bypass_cache else _cached_response(cache_key, user_message, first_turn)
+
+        if assistant_response is not None:
+            yield {"type": "delta", "text": assistant_response}
+        else:
+            chunks, routed = [], {}
+            request_messages, _ = context_window.fit(conversation_messages)
+            for text in router.chat_stream(request_messages, routed):
+                chunks.append(text)
+                yield {"type": "delta", "text": text}
+
+            assistant_response = "".join(chunks).strip() or NO_RESPONSE_MESSAGE
+            _store_response(
+                _cache_key(conversation_messages, routed.get("backend")), user_message, first_turn, assistant_response
+            )
+        domain_filter.observe(verdict, user_message, assistant_response)
+        conversation_messages.append({"role": "assistant", "content": assistant_response})
+        yield {"type": "done", "response": assistant_response, "messages": conversation_messages}
+
+    except Exception as e:
+        error_msg = f"Error getting travel guidance: {e!s}"
+        yield {
+            "type": "error",
+            "response": error_msg,
+            "messages": [{"role": "system", "content": SYSTEM_MESSAGE}]
+        }
+
+
+async def astream_travel_guidance(user_message: str, messages: list | None = None, bypass_cache: bool = False):
+    """
+    Async variant of `stream_travel_guidance` built on Cohere's async client.
+    
+    Args:
+        user_message (str): The user's question about travel
+        messages (list, optional): Previous conversation messages for context.
+                                 If None, starts a new conversation.
+        bypass_cache (bool, optional): Skip the cache lookup. A cached response is
+                                 replayed as a single delta event.
+        
+    Yields:
+        dict: Stream events as described in `stream_travel_guidance`
+    """
+    try:
+        conversation_messages = _build_conversation(user_message, messages)
+        cache_key = _cache_key(conversation_messages)
+        first_turn = _is_first_turn(messages)
+        verdict = domain_filter.check(user_message, first_turn)
+        if verdict.reject:
+            assistant_response = DOMAIN_REFUSAL_MESSAGE
+        else:
+            assistant_response = None if bypass_cache else await _acached_response(cache_key, user_message, first_turn)
+
+        if assistant_response is not None:
+            yield {"type": "delta", "text": assistant_response}
+        else:
+            chunks, routed = [], {}
+            request_messages, _ = await context_window.afit(conversation_messages)
+            async for text in router.achat_stream(request_messages, routed):
+                chunks.append(text)
+                yield {"type": "delta", "text": text}
+
+            assistant_response = "".join(chunks).strip() or NO_RESPONSE_MESSAGE
+            await _astore_response(
+                _cache_key(conversation_messages, routed.get("backend")), user_message, first_turn, assistant_response
+            )
+        domain_filter.observe(verdict, user_message, assistant_response)
+        conversation_messages.append({"role": "assistant", "content": assistant_response})
+        yield {"type": "done", "response": assistant_response, "messages": conversation_messages}
+
+    except Exception as e:
+        error_msg = f"Error getting travel guidance: {e!s}"
+        yield {
+            "type": "error",
+            "response": error_msg,
+            "messages": [{"role": "system", "content": SYSTEM_MESSAGE}]
+        }
@@ -0,0 +1,209 @@
+"""
+Prometheus metrics for the LLM, caching and rendering hot paths.
+
+Metrics are kept in process by `prometheus_client`. Under gunicorn set
+`PROMETHEUS_MULTIPROC_DIR` to an empty, writable directory before the workers start:
+each worker then writes its samples there and `/api/metrics/` aggregates all of them,
+so a scrape reflects the whole server rather than whichever worker answered it.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.urls import Resolver404, resolve
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# LLM latencies span fast cache-miss errors to multi-second completions
+LLM_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 6000, 8000, 16000, 32000)
+
+llm_call_duration = Histogram(
+    'llm_call_duration_seconds', 'Latency of upstream LLM calls', ['backend', 'operation', 'outcome'],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+llm_call_errors = Counter(
+    'llm_call_errors_total', 'Failed upstream LLM calls', ['backend', 'operation', 'error'],
+)
+llm_tokens = Counter(
+    'llm_tokens_total', 'Tokens sent to and generated by the LLM', ['direction'],
+)
+llm_context_tokens_sent = Histogram(
+    'llm_context_tokens_sent', 'Estimated prompt tokens sent per request after fitting the context window',
+    buckets=TOKEN_BUCKETS,
+)
+llm_context_tokens_saved = Counter(
+    'llm_context_tokens_saved_total', 'Estimated prompt tokens removed by summarizing older turns',
+)
+llm_context_messages_summarized = Counter(
+    'llm_context_messages_summarized_total', 'Older messages folded into the rolling summary',
+)
+llm_calls_in_flight = Gauge(
+    'llm_calls_in_flight', 'Upstream LLM calls currently in flight', multiprocess_mode='livesum',
+)
+cache_requests = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'],
+)
+domain_filter_predictions = Counter(
+    'domain_filter_predictions_total', 'Domain pre-filter predictions by mode', ['mode', 'prediction'],
+)
+domain_filter_shadow = Counter(
+    'domain_filter_shadow_total', 'Shadow-mode domain predictions compared with the LLM answer', ['prediction', 'llm'],
+)
+markdown_render_duration = Histogram(
+    'markdown_render_duration_seconds', 'Time spent converting markdown to HTML', buckets=FAST_BUCKETS,
+)
+session_size = Histogram(
+    'session_size_bytes', 'Serialized size of the session after a conversation turn', buckets=SIZE_BUCKETS,
+)
+session_serialization_duration = Histogram(
+    'session_serialization_duration_seconds', 'Time spent serializing the session', buckets=FAST_BUCKETS,
+)
+http_requests_in_flight = Gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled', ['view'], multiprocess_mode='livesum',
+)
+http_request_duration = Histogram(
+    'http_request_duration_seconds', 'Time to produce an HTTP response (streams excluded)',
+    ['view', 'method', 'status'], buckets=LLM_LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def track_llm_call(backend: str, operation: str):
+    """
+    Time one upstream LLM call, counting it as in flight and recording failures by error type.
+    """
+    llm_calls_in_flight.inc()
+    started = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except BaseException as e:
+        outcome = "error"
+        llm_call_errors.labels(backend, operation, type(e).__name__).inc()
+        raise
+    finally:
+        llm_call_duration.labels(backend, operation, outcome).observe(time.perf_counter() - started)
+        llm_calls_in_flight.dec()
+
+
+def record_token_usage(usage):
+    """Count input/output tokens from a Cohere v2 `usage` object, if the response carries one."""
+    tokens = getattr(usage, 'tokens', None)
+    for direction in ('input', 'output'):
+        count = getattr(tokens, f'{direction}_tokens', None)
+        if isinstance(count, (int, float)):
+            llm_tokens.labels(direction).inc(count)
+
+
+def record_context_window(metrics: dict):
+    """Record the tokens sent and saved when one request was fitted into the context window."""
+    llm_context_tokens_sent.observe(metrics["tokens_sent"])
+    llm_context_tokens_saved.inc(metrics["tokens_saved"])
+    llm_context_messages_summarized.inc(metrics["messages_summarized"])
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    cache_requests.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_domain_filter(mode: str, prediction: str, llm: str | None = None):
+    """Count a pre-filter prediction, or with `llm` set, its comparison with the LLM's answer."""
+    if llm is None:
+        domain_filter_predictions.labels(mode, prediction).inc()
+    else:
+        domain_filter_shadow.labels(prediction, llm).inc()
+
+
+def observe_session(session):
+    """Serialize the session the way the session backend does and record its size and cost."""
+    started = time.perf_counter()
+    payload = session.serializer().dumps(dict(session.items()))
+    session_serialization_duration.observe(time.perf_counter() - started)
+    session_size.observe(len(payload))
+
+
+async def aobserve_session(session):
+    """Async variant of `observe_session`, loading the session without blocking the event loop."""
+    items = dict(await session.aitems())
+    started = time.perf_counter()
+    payload = session.serializer().dumps(items)
+    session_serialization_duration.observe(time.perf_counter() - started)
+    session_size.observe(len(payload))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    Returns:
+        tuple: (payload, content type)
+    """
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    Track in-flight requests and response times per view. Works under WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with self._track(request) as finish:
+            response = self.get_response(request)
+            finish(response)
+        return response
+
+    async def __acall__(self, request):
+        with self._track(request) as finish:
+            response = await self.get_response(request)
+            finish(response)
+        return response
+
+    @staticmethod
+    def _view_name(request) -> str:
+        # Label by route rather than path so IDs in URLs do not explode the label cardinality
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return 'unresolved'
+
+    @contextmanager
+    def _track(self, request):
+        view = self._view_name(request)
+        gauge = http_requests_in_flight.labels(view)
+        gauge.inc()
+        started = time.perf_counter()
+        responses = []
+        try:
+            yield responses.append
+        finally:
+            gauge.dec()
+            status = str(responses[0].status_code) if responses else '500'
+            http_request_duration.labels(view, request.method, status).observe(time.perf_counter() - started)
@@ -0,0 +1,320 @@
+import asyncio
+import concurrent.futures
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the circuit breaker is open."""
+
+
+class AttemptTimeoutError(TimeoutError):
+    """Raised when a single attempt exceeds its deadline."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether an error is transient - timeouts, connection failures and 408/429/5xx responses.
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES:
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+    After `failure_threshold` transient failures in a row the circuit opens and calls fail
+    fast for `reset_timeout` seconds. A single trial call is then let through (half-open):
+    success closes the circuit, failure opens it again.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    @property
+    def failure_threshold(self) -> int:
+        return getattr(settings, 'LLM_CIRCUIT_FAILURE_THRESHOLD', 5)
+
+    @property
+    def reset_timeout(self) -> float:
+        return getattr(settings, 'LLM_CIRCUIT_RESET_TIMEOUT', 30.0)
+
+    def before_call(self):
+        """Raise CircuitOpenError if calls are currently not allowed."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError("The AI service is temporarily unavailable, please try again shortly.")
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN:
+                if self._trial_in_flight:
+                    raise CircuitOpenError("The AI service is temporarily unavailable, please try again shortly.")
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit breaker opened after %s consecutive failures", self.failures)
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Let another half-open trial through after a call that says nothing about upstream health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = 0.0
+            self._trial_in_flight = False
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt latencies used to pick the hedge delay."""
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float):
+        """Return the q-th percentile (0-100) or None until enough samples are collected."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < getattr(settings, 'LLM_HEDGE_MIN_SAMPLES', 20):
+            return None
+        return samples[min(len(samples) - 1, math.ceil(q / 100 * len(samples)) - 1)]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+class ResilientCaller:
+    """
+    Resilience policy for upstream LLM calls: per-attempt deadlines, jittered exponential
+    backoff for transient errors, a circuit breaker, and optional hedged requests that fire
+    a second attempt once the first has been running longer than the observed p95 latency.
+
+    The wrapped function receives the attempt deadline in seconds so it can pass it on to
+    the HTTP client.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.retries = 0
+        self.hedges = 0
+
+    @property
+    def attempts(self) -> int:
+        return max(1, getattr(settings, 'LLM_RETRY_ATTEMPTS', 3))
+
+    @property
+    def attempt_timeout(self) -> float:
+        return getattr(settings, 'LLM_ATTEMPT_TIMEOUT', 30.0)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform between 0 and the capped exponential delay
+        base = getattr(settings, 'LLM_RETRY_BASE_DELAY', 0.5)
+        cap = getattr(settings, 'LLM_RETRY_MAX_DELAY', 8.0)
+        return random.uniform(0, min(cap, base * 2 ** attempt))
+
+    def _hedge_delay(self):
+        if not getattr(settings, 'LLM_HEDGE_ENABLED', False):
+            return None
+        p95 = self.latency.percentile(95)
+        if p95 is None:
+            return None
+        return max(p95, getattr(settings, 'LLM_HEDGE_MIN_DELAY', 0.5))
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'LLM_HEDGE_MAX_WORKERS', 32), thread_name_prefix="llm-hedge"
+                )
+            return self._executor
+
+    def _timed(self, fn, timeout: float):
+        started = time.monotonic()
+        result = fn(timeout)
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    def _attempt(self, fn):
+        timeout = self.attempt_timeout
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return self._timed(fn, timeout)
+
+        executor = self._get_executor()
+        pending = {executor.submit(self._timed, fn, timeout)}
+        done, pending = concurrent.futures.wait(pending, timeout=hedge_delay)
+        if not done:
+            self._count("hedges")
+            pending.add(executor.submit(self._timed, fn, timeout))
+        error = None
+        while done or pending:
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+            if not pending:
+                break
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        raise error
+
+    def call(self, fn):
+        """
+        Call `fn(timeout)` with retries, circuit breaking and optional hedging.
+
+        Args:
+            fn (callable): Function performing one attempt, given its deadline in seconds
+
+        Returns:
+            The result of the first successful attempt
+        """
+        for attempt in range(self.attempts):
+            self.breaker.before_call()
+            try:
+                result = self._attempt(fn)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.attempts - 1:
+                    raise
+                self._count("retries")
+                time.sleep(self._backoff(attempt))
+            except BaseException:
+                # A cancelled trial says nothing about upstream health but must not hold the circuit
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _atimed(self, coro_fn, timeout: float):
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(coro_fn(timeout), timeout)
+        except TimeoutError as e:
+            raise AttemptTimeoutError(f"LLM call exceeded its {timeout}s deadline") from e
+        self.latency.record(time.monotonic() - started)
+        return result
+
+    async def _aattempt(self, coro_fn):
+        timeout = self.attempt_timeout
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None or hedge_delay >= timeout:
+            return await self._atimed(coro_fn, timeout)
+
+        pending = {asyncio.ensure_future(self._atimed(coro_fn, timeout))}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if not done:
+                self._count("hedges")
+                pending.add(asyncio.ensure_future(self._atimed(coro_fn, timeout)))
+            error = None
+            while done or pending:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            raise error
+        finally:
+            # The losing attempt is no longer needed
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, coro_fn):
+        """
+        Async variant of `call` - `coro_fn(timeout)` must return a coroutine.
+        """
+        for attempt in range(self.attempts):
+            self.breaker.before_call()
+            try:
+                result = await self._aattempt(coro_fn)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release_trial()
+                    raise
+                self.breaker.record_failure()
+                if attempt == self.attempts - 1:
+                    raise
+                self._count("retries")
+                await asyncio.sleep(self._backoff(attempt))
+            except BaseException:
+                # A cancelled trial says nothing about upstream health but must not hold the circuit
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    def stats(self) -> dict:
+        """Return retry/hedge counters and the circuit breaker state."""
+        with self._stats_lock:
+            return {
+                "retries": self.retries,
+                "hedges": self.hedges,
+                "circuit_state": self.breaker.state,
+            }
+
+    def reset(self):
+        """Reset counters, latency samples and the circuit breaker."""
+        with self._stats_lock:
+            self.retries = 0
+            self.hedges = 0
+        self.latency.clear()
+        self.breaker.reset()
+
+
+# Process-wide resilience policy for the Cohere chat call
+resilient_chat = ResilientCaller()
@@ -0,0 +1,268 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import zlib
+from itertools import pairwise
+from pathlib import Path
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .metrics import record_cache_lookup
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Words that carry no meaning for matching travel questions
+STOP_WORDS = frozenset([
+    "a", "about", "an", "and", "any", "are", "as", "at", "be", "best", "can", "could",
+    "do", "does", "for", "from", "give", "good", "how", "i", "in", "is", "it", "me",
+    "my", "of", "on", "or", "please", "should", "some", "tell", "than", "that", "the",
+    "there", "things", "to", "top", "us", "visit", "visiting", "we", "what", "when",
+    "where", "which", "while", "who", "why", "will", "with", "would", "you", "your",
+])
+
+
+class HashingEmbedder:
+    """
+    Offline text embedder using the hashing trick over word unigrams and bigrams.
+    Vectors are L2 normalized so the dot product of two embeddings is their cosine similarity.
+    """
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _features(self, text: str) -> list:
+        tokens = [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+        bigrams = [f"{a} {b}" for a, b in pairwise(tokens)]
+        return tokens + bigrams
+
+    def embed(self, texts: list) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts (list): Texts to embed
+
+        Returns:
+            np.ndarray: Array of shape (len(texts), dim) with unit-length rows
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 is stable across processes, unlike the builtin hash()
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if digest & 0x80000000 else -1.0
+                vectors[row, digest % self.dim] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SemanticIndex:
+    """
+    In-memory vector index with batched cosine search.
+    Rows are stored in a preallocated NumPy matrix; once `capacity` is reached the
+    oldest entries are overwritten.
+    """
+
+    def __init__(self, dim: int, capacity: int = 10000):
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.answers = [None] * capacity
+        self.size = 0
+        self._next = 0
+
+    def add(self, vector: np.ndarray, answer: str):
+        """Add a unit-length vector and its answer to the index."""
+        self.vectors[self._next] = vector
+        self.answers[self._next] = answer
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def search(self, queries: np.ndarray) -> tuple:
+        """
+        Find the nearest stored vector for each query.
+
+        Args:
+            queries (np.ndarray): Array of shape (n, dim) with unit-length rows
+
+        Returns:
+            tuple: (indices, scores) arrays of shape (n,). Indices are -1 for an empty index.
+        """
+        if self.size == 0:
+            return np.full(len(queries), -1), np.zeros(len(queries), dtype=np.float32)
+        scores = queries @ self.vectors[:self.size].T
+        indices = scores.argmax(axis=1)
+        return indices, scores[np.arange(len(queries)), indices]
+
+    def save(self, path: Path):
+        """
+        Persist the index to `path` (NumPy .npz with the answers alongside).
+        The index is written to a temporary file that then replaces `path`, so a crash
+        mid-save leaves the previous index intact rather than a truncated one.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Pass a file object so NumPy does not append a second .npz suffix
+        with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix=".tmp", delete=False) as f:
+            try:
+                np.savez(
+                    f,
+                    vectors=self.vectors[:self.size],
+                    answers=np.array(json.dumps(self.answers[:self.size])),
+                )
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    def load(self, path: Path):
+        """Load a previously saved index from `path`, keeping the most recent entries."""
+        with np.load(Path(path)) as data:
+            vectors = data["vectors"]
+            answers = json.loads(str(data["answers"]))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Index dimension {vectors.shape[1]} does not match embedder dimension {self.dim}")
+        for vector, answer in zip(vectors[-self.capacity:], answers[-self.capacity:]):
+            self.add(vector, answer)
+
+
+class SemanticCache:
+    """
+    Near-duplicate answer cache for first-turn questions.
+    Questions are embedded with a pluggable embedder and an answer is reused when the
+    cosine similarity to a previously answered question passes the configured threshold.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._embedder = None
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'LLM_SEMANTIC_CACHE_ENABLED', False)
+
+    @property
+    def threshold(self) -> float:
+        return getattr(settings, 'LLM_SEMANTIC_CACHE_THRESHOLD', 0.9)
+
+    @property
+    def path(self):
+        return getattr(settings, 'LLM_SEMANTIC_CACHE_PATH', None)
+
+    def _ensure_index(self):
+        # Build the embedder and index lazily, loading a persisted index if present
+        if self._index is None:
+            embedder_path = getattr(settings, 'LLM_SEMANTIC_CACHE_EMBEDDER', 'core.semantic_cache.HashingEmbedder')
+            self._embedder = import_string(embedder_path)()
+            self._index = SemanticIndex(
+                self._embedder.dim,
+                capacity=getattr(settings, 'LLM_SEMANTIC_CACHE_MAX_ENTRIES', 10000)
+            )
+            if self.path and Path(self.path).exists():
+                self._index.load(self.path)
+        return self._index
+
+    def lookup_many(self, questions: list) -> list:
+        """
+        Look up answers for a batch of questions.
+
+        Args:
+            questions (list): Questions to look up
+
+        Returns:
+            list: Cached answer or None for each question
+        """
+        if not self.enabled or not questions:
+            return [None] * len(questions)
+        with self._lock:
+            index = self._ensure_index()
+            indices, scores = index.search(self._embedder.embed(questions))
+            answers = [
+                index.answers[i] if i >= 0 and score >= self.threshold else None
+                for i, score in zip(indices, scores)
+            ]
+            found = sum(answer is not None for answer in answers)
+            self.hits += found
+            self.misses += len(answers) - found
+        for answer in answers:
+            record_cache_lookup("semantic", answer is not None)
+        return answers
+
+    async def alookup_many(self, questions: list) -> list:
+        """
+        Async variant of `lookup_many` - embedding and search run in a worker thread so
+        they never block the event loop.
+        """
+        if not self.enabled or not questions:
+            return [None] * len(questions)
+        return await sync_to_async(self.lookup_many, thread_sensitive=False)(questions)
+
+    def lookup(self, question: str):
+        """Return a cached answer for a near-duplicate of `question` or None."""
+        return self.lookup_many([question])[0]
+
+    async def alookup(self, question: str):
+        """Async variant of `lookup`."""
+        return (await self.alookup_many([question]))[0]
+
+    def store(self, question: str, answer: str):
+        """Add an answered question to the index, persisting it periodically."""
+        if not self.enabled:
+            return
+        with self._lock:
+            index = self._ensure_index()
+            index.add(self._embedder.embed([question])[0], answer)
+            self._unsaved += 1
+            if self.path and self._unsaved >= getattr(settings, 'LLM_SEMANTIC_CACHE_PERSIST_EVERY', 20):
+                index.save(self.path)
+                self._unsaved = 0
+
+    async def astore(self, question: str, answer: str):
+        """
+        Async variant of `store` - embedding and the periodic save run in a worker thread.
+        """
+        if not self.enabled:
+            return
+        await sync_to_async(self.store, thread_sensitive=False)(question, answer)
+
+    def save(self):
+        """Persist the index to the configured path."""
+        with self._lock:
+            if self.path and self._index is not None:
+                self._index.save(self.path)
+                self._unsaved = 0
+
+    def clear(self):
+        """Drop the in-memory index and reset counters."""
+        with self._lock:
+            self._index = None
+            self._embedder = None
+            self._unsaved = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": self._index.size if self._index is not None else 0,
+            }
+
+
+# Process-wide semantic cache used by the LLM service
+semantic_cache = SemanticCache()
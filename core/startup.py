@@ -0,0 +1,147 @@
+"""
+Process warm-up, so the first request a worker serves does not pay for cold starts.
+
+`warm_up` pre-imports the heavy modules (the Cohere SDK, httpx, markdown extensions, the API
+and views), loads the URLconf, compiles the page templates into the cached template loader,
+builds the LLM client, trains the domain pre-filter and optionally pre-connects to the LLM
+API. Under gunicorn with `preload_app` (see `travel_copilot/gunicorn_conf.py`) everything but
+the connection runs once in the master and is inherited by every forked worker; each worker
+then pre-connects itself.
+
+Step durations are kept in `timings` and logged, giving a startup-time report per process.
+"""
+import importlib
+import logging
+import os
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WARM_IMPORTS = (
+    "httpx",
+    "cohere",
+    "markdown.extensions.extra",
+    "core.llm_service",
+    "api.api",
+    "travel_app.views",
+)
+
+WARM_TEMPLATES = (
+    "travel_app/travel_guidance.html",
+    "travel_app/partials/conversation_pair.html",
+    "travel_app/partials/conversation_pair_stream.html",
+    "travel_app/partials/conversation_history_page.html",
+    "travel_app/partials/conversation_list.html",
+)
+
+# Step name -> seconds, for the most recent warm-up in this process
+timings = {}
+
+
+def _import_modules():
+    for module in WARM_IMPORTS:
+        importlib.import_module(module)
+
+
+def _load_urlconf():
+    from django.urls import get_resolver
+
+    # Resolving the URL patterns imports every view module and builds the API router
+    return get_resolver().url_patterns
+
+
+def _compile_templates():
+    from django.template.loader import get_template
+
+    for name in WARM_TEMPLATES:
+        get_template(name)
+
+
+def _load_markdown():
+    import markdown
+
+    # Converters are per thread, but building one loads and registers every extension module
+    markdown.Markdown(extensions=['extra']).convert("# Warm-up\n\n| a | b |\n|---|---|\n| 1 | 2 |")
+
+
+def _build_llm_client():
+    from .client import get_client
+
+    get_client()
+
+
+def _train_domain_filter():
+    from .domain_filter import domain_filter
+
+    domain_filter.classifier()
+
+
+def _preconnect():
+    from .client import preconnect
+
+    if not preconnect(timeout=getattr(settings, 'STARTUP_PRECONNECT_TIMEOUT', 5.0)):
+        logger.warning("Could not pre-connect to the LLM API - the first LLM call will connect")
+
+
+def _run(name: str, step):
+    started = time.perf_counter()
+    try:
+        step()
+    except Exception as e:
+        # Warm-up is an optimisation - a failing step must never stop the process from serving
+        logger.warning("Warm-up step %r failed: %s", name, e)
+    timings[name] = time.perf_counter() - started
+
+
+def format_timings(steps: dict) -> str:
+    """Format step durations for a log line, e.g. `imports=412ms, templates=9ms`."""
+    return ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in steps.items())
+
+
+def preconnect() -> dict:
+    """
+    Pre-connect this process to the LLM API unless `STARTUP_PRECONNECT` is off.
+
+    Returns:
+        dict: Seconds taken by the pre-connect step, if it ran
+    """
+    if not getattr(settings, 'STARTUP_PRECONNECT', True):
+        return {}
+    _run("preconnect", _preconnect)
+    return {"preconnect": timings["preconnect"]}
+
+
+def warm_up(connect: bool | None = None) -> dict:
+    """
+    Run the warm-up steps in this process.
+
+    Args:
+        connect (bool): Also pre-connect to the LLM API; defaults to `STARTUP_PRECONNECT`.
+            Connections must not be opened before forking, so pass False in a gunicorn master.
+
+    Returns:
+        dict: Seconds taken by each step
+    """
+    if not getattr(settings, 'STARTUP_WARM_UP', True):
+        return {}
+    if connect is None:
+        connect = getattr(settings, 'STARTUP_PRECONNECT', True)
+
+    steps = [
+        ("imports", _import_modules),
+        ("urlconf", _load_urlconf),
+        ("templates", _compile_templates),
+        ("markdown", _load_markdown),
+        ("llm_client", _build_llm_client),
+        ("domain_filter", _train_domain_filter),
+    ]
+    if connect:
+        steps.append(("preconnect", _preconnect))
+    for name, step in steps:
+        _run(name, step)
+
+    report = {name: timings[name] for name, _ in steps}
+    logger.info("Warm-up finished in pid %s: %s", os.getpid(), format_timings(report))
+    return report
@@ -0,0 +1,40 @@
+"""
+Async-capable static file serving.
+
+WhiteNoise's middleware is sync only, so under ASGI Django would adapt it - and every
+middleware after it - through `sync_to_async`, making each async request hold a worker
+thread for its whole LLM call. This subclass serves static files the same way but lets
+other requests pass straight through to the async handler chain.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    `WhiteNoiseMiddleware` that works under WSGI and ASGI without being adapted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Autorefresh (development only) looks the file up on disk for every request
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # Opening the file and stat-ing it for the response headers is blocking I/O
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
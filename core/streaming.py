@@ -0,0 +1,15 @@
+import json
+
+
+def format_sse_event(event: str, data: dict) -> str:
+    """
+    Format a single Server-Sent Events frame with a JSON encoded payload.
+    
+    Args:
+        event (str): The SSE event name (e.g. "delta", "done", "error")
+        data (dict): JSON serializable event payload
+        
+    Returns:
+        str: The encoded SSE frame, terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
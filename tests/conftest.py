@@ -1,6 +1,34 @@
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
+from django.core.cache import caches
+from core.admission import in_flight, rate_limiter
+from core.backends import router
+from core.cache import response_cache
+from core.coalesce import single_flight
+from core.context_window import context_window
+from core.domain_filter import domain_filter
+from core.idempotency import idempotency
 from core.llm_service import SYSTEM_MESSAGE
+from core.resilience import resilient_chat
+from core.semantic_cache import semantic_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Start every test with empty caches and fresh cache counters."""
+    for cache in caches.all():
+        cache.clear()
+    response_cache.reset_stats()
+    semantic_cache.clear()
+    context_window.reset_stats()
+    single_flight.reset_stats()
+    resilient_chat.reset()
+    router.reset()
+    rate_limiter.reset_stats()
+    in_flight.reset_stats()
+    idempotency.reset_stats()
+    domain_filter.reset_stats()
+    yield
 
 
 @pytest.fixture
@@ -32,7 +60,7 @@ def sample_llm_response():
 @pytest.fixture
 def mock_llm_service_success(sample_llm_response):
     """Mock LLM service to return successful response."""
-    with patch('core.llm_service.get_travel_guidance') as mock_service:
+    with patch('core.llm_service.aget_travel_guidance', new_callable=AsyncMock) as mock_service:
 
         response_data = sample_llm_response
         mock_service.return_value = response_data
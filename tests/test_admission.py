@@ -0,0 +1,272 @@
+import asyncio
+import json
+import threading
+import uuid
+from unittest.mock import patch
+
+import pytest
+from django.contrib.sessions.backends.cache import SessionStore
+from django.test import RequestFactory
+
+from core.admission import (
+    ConcurrencyLimiter,
+    CostExceedsBurst,
+    RateLimitExceeded,
+    TokenBucketLimiter,
+    aclient_identity,
+    client_identity,
+    in_flight,
+    parse_rate,
+)
+
+
+@pytest.fixture(autouse=True)
+def small_limits(settings):
+    settings.LLM_RATE_LIMIT_ENABLED = True
+    settings.LLM_RATE_LIMIT = "60/m"
+    settings.LLM_RATE_LIMIT_BURST = 2
+    settings.LLM_MAX_IN_FLIGHT = 1
+    settings.LLM_ADMISSION_QUEUE_TIMEOUT = 0.05
+
+
+class TestTokenBucketLimiter:
+    """Test per-client token buckets."""
+
+    def test_parse_rate(self):
+        assert parse_rate("30/m") == (30, 60)
+        assert parse_rate("1000/day") == (1000, 86400)
+
+    def test_burst_then_rejects_with_retry_after(self):
+        limiter = TokenBucketLimiter()
+        limiter.consume("ip:1")
+        limiter.consume("ip:1")
+
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            limiter.consume("ip:1")
+
+        assert exc_info.value.retry_after == 1
+        assert limiter.stats() == {"allowed": 2, "limited": 1}
+
+    def test_buckets_are_per_client(self):
+        limiter = TokenBucketLimiter()
+        limiter.consume("ip:1", cost=2)
+
+        limiter.consume("ip:2")
+
+    def test_tokens_refill_over_time(self):
+        limiter = TokenBucketLimiter()
+        with patch("core.admission.time.time", return_value=1000.0):
+            limiter.consume("ip:1", cost=2)
+        with patch("core.admission.time.time", return_value=1001.0):
+            limiter.consume("ip:1")
+
+    def test_async_consume_shares_buckets(self):
+        limiter = TokenBucketLimiter()
+        limiter.consume("ip:1", cost=2)
+
+        with pytest.raises(RateLimitExceeded):
+            asyncio.run(limiter.aconsume("ip:1"))
+
+    def test_cost_above_burst_is_rejected_outright(self):
+        """Test a request costing more than a full bucket is never clamped down to the burst."""
+        limiter = TokenBucketLimiter()
+
+        with pytest.raises(CostExceedsBurst):
+            limiter.consume("ip:1", cost=3)
+        with pytest.raises(CostExceedsBurst):
+            asyncio.run(limiter.aconsume("ip:1", cost=3))
+
+        # The full bucket is still available to requests that fit
+        limiter.consume("ip:1", cost=2)
+
+    def test_contended_bucket_rejects_instead_of_admitting(self):
+        """Test a request that cannot lock its bucket is rejected rather than admitted uncharged."""
+        limiter = TokenBucketLimiter()
+        limiter.cache.add("ratelimit-lock:ip:1", 1, 10)
+
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            limiter.consume("ip:1")
+        with pytest.raises(RateLimitExceeded):
+            asyncio.run(limiter.aconsume("ip:1"))
+
+        assert exc_info.value.retry_after == 1
+        assert limiter.stats() == {"allowed": 0, "limited": 2}
+
+    def test_disabled(self, settings):
+        settings.LLM_RATE_LIMIT_ENABLED = False
+        limiter = TokenBucketLimiter()
+        for _ in range(5):
+            limiter.consume("ip:1")
+
+
+class TestClientIdentity:
+    """Test how callers are identified."""
+
+    def test_api_key_is_hashed(self, settings):
+        settings.LLM_RATE_LIMIT_API_KEYS = ["secret"]
+        request = RequestFactory().post("/", HTTP_X_API_KEY="secret")
+        identity = client_identity(request)
+        assert identity.startswith("key:")
+        assert "secret" not in identity
+
+    def test_unknown_api_key_is_ignored(self, settings):
+        """Test random keys cannot be used to get a fresh bucket."""
+        settings.LLM_RATE_LIMIT_API_KEYS = ["secret"]
+        request = RequestFactory().post("/", HTTP_X_API_KEY="made-up", REMOTE_ADDR="10.0.0.1")
+        assert client_identity(request) == "ip:10.0.0.1"
+
+    def test_falls_back_to_ip(self):
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        assert client_identity(request) == "ip:10.0.0.1"
+
+    def test_session_must_exist_on_the_server(self):
+        """Test a session cookie the server never issued is ignored in favour of the IP."""
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        request.session = SessionStore(session_key="forged" + uuid.uuid4().hex)
+        assert client_identity(request) == "ip:10.0.0.1"
+        assert asyncio.run(aclient_identity(request)) == "ip:10.0.0.1"
+
+        request.session = SessionStore()
+        request.session.save()
+        assert client_identity(request) == f"session:{request.session.session_key}"
+        assert asyncio.run(aclient_identity(request)) == f"session:{request.session.session_key}"
+
+    def test_forwarded_for_requires_trusted_proxy(self, settings):
+        request = RequestFactory().post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4, 10.0.0.9")
+        assert client_identity(request) == "ip:10.0.0.1"
+
+        settings.NINJA_NUM_PROXIES = 1
+        assert client_identity(request) == "ip:10.0.0.9"
+
+
+class TestConcurrencyLimiter:
+    """Test the in-flight cap."""
+
+    def test_rejects_when_saturated(self):
+        limiter = ConcurrencyLimiter()
+        with limiter.slot(), pytest.raises(RateLimitExceeded):
+            limiter.acquire()
+        assert limiter.stats()["in_flight"] == 0
+        assert limiter.stats()["rejected"] == 1
+
+    def test_queued_caller_gets_released_slot(self, settings):
+        settings.LLM_ADMISSION_QUEUE_TIMEOUT = 2
+        limiter = ConcurrencyLimiter()
+        limiter.acquire()
+        timer = threading.Timer(0.05, limiter.release)
+        timer.start()
+
+        limiter.acquire()
+
+        assert limiter.stats()["in_flight"] == 1
+        timer.join()
+
+    def test_async_rejects_when_saturated(self):
+        limiter = ConcurrencyLimiter()
+
+        async def run():
+            async with limiter.aslot():
+                with pytest.raises(RateLimitExceeded):
+                    await limiter.aacquire()
+
+        asyncio.run(run())
+        assert limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.django_db
+class TestAdmissionEndpoints:
+    """Test 429 responses from the API and the views."""
+
+    def _post(self, client):
+        return client.post(
+            "/api/travel-guidance/",
+            data=json.dumps({"user_message": "What are the best places to visit in Paris?"}),
+            content_type="application/json"
+        )
+
+    def test_api_returns_429_with_retry_after(self, client, mock_llm_service_success):
+        assert self._post(client).status_code == 200
+        assert self._post(client).status_code == 200
+
+        response = self._post(client)
+
+        assert response.status_code == 429
+        assert response["Retry-After"] == "1"
+        assert mock_llm_service_success.call_count == 2
+
+    def test_forged_session_cookies_share_the_ip_bucket(self, client, mock_llm_service_success):
+        """Test a fresh random session cookie per request does not get a fresh bucket."""
+        statuses = []
+        for _ in range(4):
+            client.cookies["sessionid"] = "forged" + uuid.uuid4().hex
+            statuses.append(self._post(client).status_code)
+
+        assert statuses == [200, 200, 429, 429]
+        assert mock_llm_service_success.call_count == 2
+
+    def test_api_returns_429_when_saturated(self, client, mock_llm_service_success):
+        in_flight.acquire()
+        try:
+            response = self._post(client)
+        finally:
+            in_flight.release()
+
+        assert response.status_code == 429
+        mock_llm_service_success.assert_not_called()
+
+    def test_api_rejects_batch_larger_than_burst(self, client, mock_llm_service_success):
+        response = client.post(
+            "/api/travel-guidance/batch/",
+            data=json.dumps({"requests": [{"user_message": "Paris?"}] * 3}),
+            content_type="application/json"
+        )
+
+        assert response.status_code == 413
+        mock_llm_service_success.assert_not_called()
+
+    def test_unconsumed_stream_holds_no_slot(self, client):
+        """Test the in-flight slot is only held while the stream body is being iterated."""
+        response = client.post(
+            "/api/travel-guidance/stream/",
+            data=json.dumps({"user_message": "What are the best places to visit in Paris?"}),
+            content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        assert in_flight.stats()["in_flight"] == 0
+        response.close()
+        assert in_flight.stats()["in_flight"] == 0
+
+    def test_stream_reports_saturation_as_error_event(self, client):
+        response = client.post(
+            "/api/travel-guidance/stream/",
+            data=json.dumps({"user_message": "What are the best places to visit in Paris?"}),
+            content_type="application/json"
+        )
+
+        async def consume():
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        in_flight.acquire()
+        try:
+            with patch('core.llm_service.astream_travel_guidance') as mock_stream:
+                body = asyncio.run(consume()).decode()
+        finally:
+            in_flight.release()
+
+        assert body.startswith("event: error\ndata: ")
+        mock_stream.assert_not_called()
+        assert in_flight.stats()["in_flight"] == 0
+
+    @patch('travel_app.views.get_travel_guidance')
+    def test_view_returns_429(self, mock_service, client):
+        mock_service.return_value = ("Visit the Louvre.", [])
+        # The first request is keyed by IP, later ones by the session it creates
+        for _ in range(3):
+            client.post('/', {'user_message': 'Paris?'}, HTTP_HX_REQUEST='true')
+
+        response = client.post('/', {'user_message': 'Paris?'}, HTTP_HX_REQUEST='true')
+
+        assert response.status_code == 429
+        assert response['Retry-After'] == '1'
+        assert mock_service.call_count == 3
@@ -1,6 +1,10 @@
+import asyncio
 import pytest
 import json
+from unittest.mock import patch
 from api.api import api, TravelGuidanceRequest, TravelGuidanceResponse 
+from core.conversation_store import conversation_store
+from core.llm_service import SYSTEM_MESSAGE
 
 
 @pytest.mark.django_db
@@ -63,9 +67,28 @@ class TestTravelGuidanceAPI:
         # Verify the mock was called with the correct parameters
         mock_llm_service_success.assert_called_once_with(
             request_data["user_message"], 
-            request_data["messages"]
+            request_data["messages"],
+            bypass_cache=False
         )
     
+    def test_travel_guidance_endpoint_bypass_cache(self, client, mock_llm_service_success):
+        """Test the bypass_cache flag is forwarded to the LLM service."""
+        request_data = {
+            "user_message": "What are the best places to visit in Paris?",
+            "bypass_cache": True
+        }
+
+        response = client.post(
+            "/api/travel-guidance/",
+            data=json.dumps(request_data),
+            content_type="application/json"
+        )
+
+        assert response.status_code == 200
+        mock_llm_service_success.assert_called_once_with(
+            request_data["user_message"], None, bypass_cache=True
+        )
+
     def test_travel_guidance_endpoint_invalid_json(self, client):
         """Test travel guidance endpoint with invalid JSON."""
         # Missing required field
@@ -116,7 +139,8 @@ class TestTravelGuidanceAPI:
         # Verify the mock was called with the correct parameters
         mock_llm_service_success.assert_called_once_with(
             sample_travel_request_with_history["user_message"], # 'What about restaurants?'
-            sample_travel_request_with_history["messages"]
+            sample_travel_request_with_history["messages"],
+            bypass_cache=False
         )
 
         assert mock_llm_service_success.call_count == 1
@@ -146,7 +170,7 @@ class TestTravelGuidanceAPI:
 
         # If the request was successful (status 200), verify the mock was called
         if response.status_code == 200:
-            mock_llm_service_success.assert_called_once_with("", None)
+            mock_llm_service_success.assert_called_once_with("", None, bypass_cache=False)
         # If the request was unsuccessful (status 422), check the error message
         if response.status_code == 422:
             response_data = response.json()
@@ -175,7 +199,7 @@ class TestTravelGuidanceAPI:
         assert len(response_data["messages"]) == 3  # system + user + assistant
         
         # Verify the mock was called
-        mock_llm_service_success.assert_called_once_with("Plan a 3-day trip to Rome", None)
+        mock_llm_service_success.assert_called_once_with("Plan a 3-day trip to Rome", None, bypass_cache=False)
 
 
 @pytest.mark.django_db
@@ -210,3 +234,241 @@ class TestAPISchemas:
         response = TravelGuidanceResponse(**response_data)
         assert response.response == "Test response"
         assert len(response.messages) == 2
+
+    def test_messages_are_typed_plain_dicts(self):
+        """Test history messages are validated but stay plain dicts for the LLM service."""
+        request = TravelGuidanceRequest(user_message="Test", messages=[{"role": "assistant", "content": "Hi"}])
+
+        assert request.messages == [{"role": "assistant", "content": "Hi"}]
+        with pytest.raises(ValueError):
+            TravelGuidanceRequest(user_message="Test", messages=[{"role": "assistant"}])
+
+    def test_unknown_role_is_rejected(self, client):
+        """Test a message with an unknown role fails validation before reaching the LLM."""
+        response = client.post(
+            '/api/travel-guidance/',
+            data=json.dumps({"user_message": "Test", "messages": [{"role": "wizard", "content": "Hi"}]}),
+            content_type='application/json'
+        )
+
+        assert response.status_code == 422
+
+    def test_responses_are_rendered_with_orjson(self, client):
+        """Test the API renders compact JSON."""
+        response = client.get('/api/health-check/')
+
+        assert response['Content-Type'].startswith('application/json')
+        assert response.content == b'{"status":"API is running smoothly!"}'
+
+
+@pytest.mark.django_db
+class TestTravelGuidanceStreamAPI:
+    """Test cases for the streaming (SSE) travel guidance endpoint."""
+
+    @staticmethod
+    async def _consume(streaming_content):
+        return b"".join([chunk async for chunk in streaming_content])
+
+    def test_travel_guidance_stream_emits_sse_events(self, client, sample_llm_response):
+        """Test the stream endpoint relays delta events followed by a final done event."""
+        final_response, final_messages = sample_llm_response
+
+        async def fake_stream(user_message, messages, bypass_cache=False):
+            yield {"type": "delta", "text": "Here are some "}
+            yield {"type": "delta", "text": "great places..."}
+            yield {"type": "done", "response": final_response, "messages": final_messages}
+
+        with patch('core.llm_service.astream_travel_guidance', side_effect=fake_stream) as mock_stream:
+            response = client.post(
+                "/api/travel-guidance/stream/",
+                data=json.dumps({"user_message": "What are the best places to visit in Paris?"}),
+                content_type="application/json"
+            )
+            body = asyncio.run(self._consume(response.streaming_content)).decode()
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/event-stream"
+        assert response["Cache-Control"] == "no-cache"
+        mock_stream.assert_called_once_with(
+            "What are the best places to visit in Paris?", None, bypass_cache=False
+        )
+
+        frames = [frame for frame in body.split("\n\n") if frame]
+        assert len(frames) == 3
+        assert frames[0] == 'event: delta\ndata: {"text": "Here are some "}'
+        assert frames[2].startswith("event: done\ndata: ")
+        done_data = json.loads(frames[2].split("data: ", 1)[1])
+        assert done_data["response"] == final_response
+        assert len(done_data["messages"]) == 3
+
+    def test_travel_guidance_stream_invalid_json(self, client):
+        """Test the stream endpoint validates the request body."""
+        response = client.post(
+            "/api/travel-guidance/stream/",
+            data=json.dumps({"messages": None}),
+            content_type="application/json"
+        )
+
+        assert response.status_code == 422
+
+
+@pytest.mark.django_db
+class TestConversationAPI:
+    """Test cases for the stateful conversation endpoint."""
+
+    def _post(self, client, data):
+        return client.post(
+            "/api/conversations/",
+            data=json.dumps(data),
+            content_type="application/json"
+        )
+
+    def test_new_conversation_returns_id_and_new_message_only(self, client, mock_llm_service_success):
+        """Test a new conversation is created and only the new response is returned."""
+        response = self._post(client, {"user_message": "What are the best places to visit in Paris?"})
+
+        assert response.status_code == 200
+        response_data = response.json()
+        assert set(response_data) == {"conversation_id", "response"}
+        assert response_data["response"].startswith("Here are some great places to visit in Paris")
+
+        # New conversations start from the system message only
+        args, kwargs = mock_llm_service_success.call_args
+        assert args == ("What are the best places to visit in Paris?", [{"role": "system", "content": SYSTEM_MESSAGE}])
+        assert kwargs == {"bypass_cache": False}
+
+    def test_follow_up_uses_stored_history(self, client, mock_llm_service_success):
+        """Test a follow-up turn sends the stored history to the LLM service."""
+        conversation_id = self._post(client, {"user_message": "What are the best places to visit in Paris?"}).json()["conversation_id"]
+
+        mock_llm_service_success.return_value = (
+            "Try Le Comptoir du Relais.",
+            [
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": "What are the best places to visit in Paris?"},
+                {"role": "assistant", "content": "Here are some great places to visit in Paris: Eiffel Tower, Louvre Museum, Notre-Dame Cathedral..."},
+                {"role": "user", "content": "What about restaurants?"},
+                {"role": "assistant", "content": "Try Le Comptoir du Relais."},
+            ]
+        )
+        response = self._post(client, {"conversation_id": conversation_id, "user_message": "What about restaurants?"})
+
+        assert response.status_code == 200
+        assert response.json() == {"conversation_id": conversation_id, "response": "Try Le Comptoir du Relais."}
+        sent_messages = mock_llm_service_success.call_args.args[1]
+        assert [m["role"] for m in sent_messages] == ["system", "user", "assistant"]
+
+        # History is stored without the system message
+        stored = conversation_store.get(conversation_id)
+        assert len(stored) == 4
+        assert stored[-1] == {"role": "assistant", "content": "Try Le Comptoir du Relais."}
+
+    def test_unknown_conversation_returns_404(self, client, mock_llm_service_success):
+        """Test an unknown conversation ID is rejected without calling the LLM."""
+        response = self._post(client, {"conversation_id": "missing", "user_message": "Hello"})
+
+        assert response.status_code == 404
+        mock_llm_service_success.assert_not_called()
+
+    def test_failed_turn_is_not_stored(self, client, mock_llm_service_success):
+        """Test an LLM error does not add a turn to the stored history."""
+        mock_llm_service_success.return_value = (
+            "Error getting travel guidance: boom",
+            [{"role": "system", "content": SYSTEM_MESSAGE}]
+        )
+        response = self._post(client, {"user_message": "Tell me about Rome"})
+
+        assert response.status_code == 200
+        assert conversation_store.get(response.json()["conversation_id"]) == []
+
+    def test_list_conversations_pages_by_cursor(self, client, mock_llm_service_success, django_user_model):
+        """Test a logged-in user's conversations are listed newest first, a page at a time."""
+        client.force_login(django_user_model.objects.create_user(username="traveller", password="secret"))
+        ids = [self._post(client, {"user_message": f"Trip {i}"}).json()["conversation_id"] for i in range(3)]
+
+        first = client.get("/api/conversations/?limit=2").json()
+        rest = client.get(f"/api/conversations/?limit=2&before={first['next_cursor']}").json()
+
+        assert [c["conversation_id"] for c in first["conversations"] + rest["conversations"]] == ids[::-1]
+        assert first["conversations"][0]["title"] == "What are the best places to visit in Paris?"
+        assert first["conversations"][0]["turn_count"] == 1
+        assert rest["next_cursor"] is None
+        assert client.get("/api/conversations/?before=garbage").status_code == 400
+
+    def test_list_conversations_requires_login(self, client):
+        assert client.get("/api/conversations/").status_code == 401
+
+    def test_conversation_turns_pages_backwards(self, client):
+        """Test turns are returned newest page first with the cursor of the previous page."""
+        conversation_id = conversation_store.new_id()
+        for i in range(5):
+            conversation_store.append(conversation_id, [
+                {"role": "user", "content": f"Question {i}"}, {"role": "assistant", "content": f"Answer {i}"}
+            ])
+
+        newest = client.get(f"/api/conversations/{conversation_id}/turns/?limit=2").json()
+        oldest = client.get(f"/api/conversations/{conversation_id}/turns/?limit=4&before={newest['next_cursor']}").json()
+
+        assert [t["index"] for t in newest["turns"]] == [3, 4]
+        assert newest["turns"][0]["messages"][0] == {"role": "user", "content": "Question 3"}
+        assert [t["index"] for t in oldest["turns"]] == [0, 1, 2]
+        assert oldest["next_cursor"] is None
+
+    def test_owned_conversation_is_hidden_from_others(self, client, mock_llm_service_success, django_user_model):
+        """Test another user's conversation can neither be read nor continued."""
+        client.force_login(django_user_model.objects.create_user(username="owner", password="secret"))
+        conversation_id = self._post(client, {"user_message": "Trip"}).json()["conversation_id"]
+        client.logout()
+
+        assert client.get(f"/api/conversations/{conversation_id}/turns/").status_code == 404
+        assert self._post(client, {"conversation_id": conversation_id, "user_message": "Hi"}).status_code == 404
+
+
+@pytest.mark.django_db
+class TestBatchTravelGuidanceAPI:
+    """Test cases for the batch travel guidance endpoint."""
+
+    def _post(self, client, data):
+        return client.post(
+            "/api/travel-guidance/batch/",
+            data=json.dumps(data),
+            content_type="application/json"
+        )
+
+    def test_batch_returns_ordered_results(self, client, mock_llm_service_success):
+        """Test every item is answered and results keep request order."""
+        response = self._post(client, {
+            "requests": [
+                {"user_message": "Best places in Paris?"},
+                {"user_message": "Best places in Rome?", "messages": None},
+            ],
+            "concurrency": 2
+        })
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["index"] for r in results] == [0, 1]
+        assert all(r["error"] is None for r in results)
+        assert mock_llm_service_success.call_count == 2
+
+    def test_batch_stream_returns_ndjson(self, client, mock_llm_service_success):
+        """Test stream mode emits one NDJSON line per item."""
+        response = self._post(client, {
+            "requests": [{"user_message": "Best places in Paris?"}, {"user_message": "Best places in Rome?"}],
+            "stream": True
+        })
+        body = asyncio.run(TestTravelGuidanceStreamAPI._consume(response.streaming_content)).decode()
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in body.splitlines()]
+        assert sorted(line["index"] for line in lines) == [0, 1]
+
+    def test_batch_validation(self, client, settings):
+        """Test empty and oversized batches are rejected."""
+        settings.LLM_BATCH_MAX_ITEMS = 2
+
+        assert self._post(client, {"requests": []}).status_code == 422
+        assert self._post(client, {"requests": [{"user_message": "q"}], "concurrency": 0}).status_code == 422
+        oversized = self._post(client, {"requests": [{"user_message": "q"}] * 3})
+        assert oversized.status_code == 400
@@ -0,0 +1,201 @@
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from core.backends import BackendRegistry, LocalBackend, backends, router
+from core.cache import response_cache
+from core.llm_service import (
+    SYSTEM_MESSAGE,
+    TEMPERATURE,
+    CohereBackend,
+    aget_travel_guidance,
+    get_travel_guidance,
+    stream_travel_guidance,
+)
+from core.resilience import CircuitBreaker
+
+
+class FailingBackend(LocalBackend):
+    def chat(self, messages, timeout):
+        raise ValueError("backend down")
+
+    def chat_stream(self, messages, timeout):
+        raise ValueError("backend down")
+        yield
+
+
+@pytest.fixture
+def routed(settings):
+    """Route between two local backends standing in for the large and fast models."""
+    settings.LLM_ROUTER_ENABLED = True
+    settings.LLM_DEFAULT_BACKEND = "large"
+    settings.LLM_ROUTER_FAST_BACKEND = "fast"
+    settings.LLM_RETRY_BASE_DELAY = 0
+    backends.register("large", LocalBackend("large", options={"TOKENS": 6}))
+    backends.register("fast", LocalBackend("fast", options={"TOKENS": 3}))
+    yield
+    backends.clear()
+
+
+class TestBackendRegistry:
+    """Test building backends from settings."""
+
+    def test_builds_configured_backends(self, settings):
+        settings.LLM_BACKENDS = {
+            "big": {"BACKEND": "core.llm_service.CohereBackend", "MODEL": "command-a-03-2025"},
+            "local": {"BACKEND": "core.backends.LocalBackend", "OPTIONS": {"TOKENS": 5}},
+        }
+        registry = BackendRegistry()
+
+        assert isinstance(registry["big"], CohereBackend)
+        assert registry["big"].model == "command-a-03-2025"
+        assert registry["local"].options == {"TOKENS": 5}
+        assert registry["local"] is registry["local"]
+
+    def test_unknown_backend(self):
+        with pytest.raises(KeyError):
+            BackendRegistry()["missing"]
+
+
+class TestLocalBackend:
+    """Test the deterministic local backend."""
+
+    def test_deterministic(self):
+        backend = LocalBackend("local")
+        messages = [{"role": "user", "content": "Lisbon?"}]
+
+        assert backend.chat(messages, 1) == backend.chat(messages, 1)
+        assert backend.chat(messages, 1) != backend.chat([{"role": "user", "content": "Porto?"}], 1)
+        assert "".join(backend.chat_stream(messages, 1)).strip() == backend.chat(messages, 1)
+
+    def test_async(self):
+        backend = LocalBackend("local")
+        messages = [{"role": "user", "content": "Lisbon?"}]
+
+        assert asyncio.run(backend.achat(messages, 1)) == backend.chat(messages, 1)
+
+
+class TestModelRouter:
+    """Test routing, EWMA latency tracking and fallback."""
+
+    def test_disabled_uses_default_backend_only(self):
+        assert router.route([{"role": "user", "content": "Lisbon?"}]) == ["command-a"]
+
+    def test_short_first_turn_goes_to_fast_backend(self, routed):
+        first_turn = [{"role": "system", "content": SYSTEM_MESSAGE}, {"role": "user", "content": "Best beaches in Goa?"}]
+        follow_up = first_turn + [{"role": "assistant", "content": "Palolem."}, {"role": "user", "content": "And food?"}]
+        long_question = [{"role": "user", "content": "Plan my trip. " * 100}]
+
+        assert router.route(first_turn) == ["fast", "large"]
+        assert router.route(follow_up) == ["large", "fast"]
+        assert router.route(long_question) == ["large", "fast"]
+
+    def test_ewma_latency(self, routed, settings):
+        settings.LLM_ROUTER_EWMA_ALPHA = 0.5
+        router.record("fast", 1.0)
+        router.record("fast", 3.0)
+
+        assert router.stats()["fast"]["ewma_latency"] == 2.0
+
+    def test_slow_backend_is_demoted(self, routed, settings):
+        settings.LLM_ROUTER_DEGRADED_LATENCY = 5.0
+        router.record("fast", 20.0)
+
+        assert router.route([{"role": "user", "content": "Best beaches in Goa?"}]) == ["large", "fast"]
+
+    def test_demoted_backend_is_probed_and_recovers(self, routed, settings):
+        """Test a demoted backend gets one probe per interval and is promoted again once it answers."""
+        settings.LLM_ROUTER_DEGRADED_LATENCY = 5.0
+        settings.LLM_ROUTER_PROBE_INTERVAL = 0.05
+        question = [{"role": "user", "content": "Best beaches in Goa?"}]
+        router.record("fast", 20.0)
+
+        assert router.route(question) == ["large", "fast"]
+        time.sleep(0.06)
+        assert router.route(question) == ["fast", "large"]
+        # Only one request probes per interval
+        assert router.route(question) == ["large", "fast"]
+
+        router.record("fast", 0.5)
+
+        assert router.stats()["fast"]["ewma_latency"] == 0.5
+        assert router.route(question) == ["fast", "large"]
+
+    def test_failed_probe_keeps_backend_demoted(self, routed, settings):
+        settings.LLM_ROUTER_PROBE_INTERVAL = 0
+        backends.register("fast", FailingBackend("fast"))
+        for _ in range(3):
+            router.record("fast", ok=False)
+
+        response, _ = get_travel_guidance("Best beaches in Goa?")
+
+        assert len(response.split()) == 6
+        assert router.stats()["fast"]["failures"] == 4
+
+    def test_open_circuit_is_demoted(self, routed):
+        for _ in range(5):
+            router.caller("fast").breaker.record_failure()
+
+        assert router.caller("fast").breaker.state == CircuitBreaker.OPEN
+        assert router.caller("large").breaker.state == CircuitBreaker.CLOSED
+        assert router.route([{"role": "user", "content": "Best beaches in Goa?"}]) == ["large", "fast"]
+
+    def test_falls_back_when_backend_fails(self, routed):
+        backends.register("fast", FailingBackend("fast"))
+
+        response, messages = get_travel_guidance("Best beaches in Goa?")
+
+        assert response == LocalBackend("large", options={"TOKENS": 6}).chat(messages[:-1], 1)
+        assert router.stats()["fast"]["failures"] == 1
+
+    def test_stream_falls_back_before_first_fragment(self, routed):
+        backends.register("fast", FailingBackend("fast"))
+
+        events = list(stream_travel_guidance("Best beaches in Goa?"))
+
+        assert events[-1]["type"] == "done"
+        assert len(events[-1]["response"].split()) == 6
+
+    def test_cached_answers_are_keyed_by_answering_model(self, routed, settings):
+        """Test an answer cached from one model is never served once another model is routed."""
+        settings.LLM_ROUTER_DEGRADED_LATENCY = 5.0
+        settings.LLM_ROUTER_PROBE_INTERVAL = 60.0
+
+        assert len(get_travel_guidance("Best beaches in Goa?")[0].split()) == 3
+
+        router.record("fast", 100.0)
+        response, messages = get_travel_guidance("Best beaches in Goa?")
+
+        assert len(response.split()) == 6
+        assert response_cache.get(response_cache.make_key(messages[:-1], "large", TEMPERATURE)) == response
+
+    def test_fallback_answer_is_cached_under_its_model(self, routed):
+        backends.register("fast", FailingBackend("fast"))
+
+        response = list(stream_travel_guidance("Best beaches in Goa?"))[-1]["response"]
+        messages = [{"role": "system", "content": SYSTEM_MESSAGE}, {"role": "user", "content": "Best beaches in Goa?"}]
+
+        assert response_cache.get(response_cache.make_key(messages, "large", TEMPERATURE)) == response
+        assert response_cache.get(response_cache.make_key(messages, "fast", TEMPERATURE)) is None
+
+    def test_async_routes_to_fast_backend(self, routed):
+        response, _ = asyncio.run(aget_travel_guidance("Best beaches in Goa?"))
+
+        assert len(response.split()) == 3
+        assert router.stats()["fast"]["routed"] == 1
+
+
+class TestCohereBackend:
+    """Test the Cohere backend passes its configured model."""
+
+    @patch('core.llm_service.co_v2')
+    def test_uses_configured_model(self, mock_client):
+        mock_client.chat.return_value = Mock(message=Mock(content=[Mock(text="Visit Goa.")]))
+
+        text = CohereBackend("fast", "command-r7b-12-2024").chat([{"role": "user", "content": "Goa?"}], 5)
+
+        assert text == "Visit Goa."
+        assert mock_client.chat.call_args.kwargs["model"] == "command-r7b-12-2024"
+        assert mock_client.chat.call_args.kwargs["request_options"] == {"timeout": 5, "max_retries": 0}
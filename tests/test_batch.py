@@ -0,0 +1,85 @@
+import asyncio
+from unittest.mock import patch
+
+from core.batch import (
+    batch_travel_guidance,
+    iter_batch_travel_guidance,
+    resolve_concurrency,
+)
+from core.llm_service import SYSTEM_MESSAGE
+
+
+def _fake_service(delays: dict, failures: set = frozenset()):
+    """Build a fake aget_travel_guidance tracking the peak number of in-flight calls."""
+    state = {"in_flight": 0, "peak": 0}
+
+    async def fake(user_message, messages=None, bypass_cache=False):
+        state["in_flight"] += 1
+        state["peak"] = max(state["peak"], state["in_flight"])
+        try:
+            await asyncio.sleep(delays.get(user_message, 0))
+            if user_message in failures:
+                return "Error getting travel guidance: boom", [{"role": "system", "content": SYSTEM_MESSAGE}]
+            return f"Answer to {user_message}", [
+                {"role": "system", "content": SYSTEM_MESSAGE},
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": f"Answer to {user_message}"},
+            ]
+        finally:
+            state["in_flight"] -= 1
+
+    return fake, state
+
+
+class TestBatchTravelGuidance:
+    """Test bounded concurrent fan-out of travel guidance requests."""
+
+    def test_results_in_request_order_with_bounded_concurrency(self, settings):
+        settings.LLM_BATCH_MAX_CONCURRENCY = 8
+        fake, state = _fake_service({"q0": 0.03, "q1": 0.01, "q2": 0.02, "q3": 0, "q4": 0.01})
+        items = [{"user_message": f"q{i}"} for i in range(5)]
+
+        with patch('core.llm_service.aget_travel_guidance', side_effect=fake):
+            results = asyncio.run(batch_travel_guidance(items, concurrency=2))
+
+        assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+        assert [r["response"] for r in results] == [f"Answer to q{i}" for i in range(5)]
+        assert state["peak"] == 2
+
+    def test_per_item_errors(self):
+        fake, _ = _fake_service({}, failures={"bad"})
+        items = [{"user_message": "good"}, {"user_message": "bad"}]
+
+        with patch('core.llm_service.aget_travel_guidance', side_effect=fake):
+            results = asyncio.run(batch_travel_guidance(items))
+
+        assert results[0]["error"] is None
+        assert results[1]["response"] is None
+        assert results[1]["messages"] is None
+        assert "boom" in results[1]["error"]
+
+    def test_unexpected_exception_is_reported_per_item(self):
+        async def fake(user_message, messages=None, bypass_cache=False):
+            raise RuntimeError("unexpected")
+
+        with patch('core.llm_service.aget_travel_guidance', side_effect=fake):
+            results = asyncio.run(batch_travel_guidance([{"user_message": "q"}]))
+
+        assert "unexpected" in results[0]["error"]
+
+    def test_iter_yields_in_completion_order(self):
+        fake, _ = _fake_service({"slow": 0.03, "fast": 0})
+
+        async def collect():
+            return [r["index"] async for r in iter_batch_travel_guidance(
+                [{"user_message": "slow"}, {"user_message": "fast"}]
+            )]
+
+        with patch('core.llm_service.aget_travel_guidance', side_effect=fake):
+            assert asyncio.run(collect()) == [1, 0]
+
+    def test_concurrency_is_capped_by_settings(self, settings):
+        settings.LLM_BATCH_MAX_CONCURRENCY = 4
+        assert resolve_concurrency(None) == 4
+        assert resolve_concurrency(2) == 2
+        assert resolve_concurrency(50) == 4
@@ -0,0 +1,108 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+from django.test import override_settings
+
+from core.cache import ResponseCache, response_cache
+from core.llm_service import SYSTEM_MESSAGE, aget_travel_guidance, get_travel_guidance
+
+
+def _mock_chat_response(text):
+    mock_response = Mock()
+    mock_response.message.content = [Mock(text=text)]
+    return mock_response
+
+
+class TestResponseCacheKey:
+    """Test cache key construction."""
+
+    def test_key_is_normalized(self):
+        """Test whitespace and case differences share a key."""
+        cache = ResponseCache()
+        key_a = cache.make_key([{"role": "user", "content": "Best places in  Tokyo?"}], "model", 0.1)
+        key_b = cache.make_key([{"role": "USER", "content": " best places in tokyo? "}], "model", 0.1)
+        assert key_a == key_b
+
+    def test_key_depends_on_model_temperature_and_history(self):
+        """Test the model, temperature and full message list are part of the key."""
+        cache = ResponseCache()
+        messages = [{"role": "user", "content": "Best places in Tokyo?"}]
+        key = cache.make_key(messages, "model", 0.1)
+        assert key != cache.make_key(messages, "other-model", 0.1)
+        assert key != cache.make_key(messages, "model", 0.5)
+        assert key != cache.make_key(
+            [{"role": "system", "content": SYSTEM_MESSAGE}, *messages], "model", 0.1
+        )
+
+
+class TestCachedTravelGuidance:
+    """Test the response cache integration in the LLM service."""
+
+    @patch('core.llm_service.co_v2')
+    def test_identical_requests_hit_cache(self, mock_client):
+        """Test a repeated first-turn question is answered from the cache."""
+        mock_client.chat.return_value = _mock_chat_response("Visit Shibuya and Asakusa.")
+
+        first, _ = get_travel_guidance("Best places to visit in Tokyo")
+        second, messages = get_travel_guidance("best places to visit in  Tokyo")
+
+        assert first == second == "Visit Shibuya and Asakusa."
+        assert messages[-1]["content"] == "Visit Shibuya and Asakusa."
+        mock_client.chat.assert_called_once()
+        assert response_cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+    @patch('core.llm_service.co_v2')
+    def test_bypass_cache_forces_fresh_response(self, mock_client):
+        """Test bypass_cache skips the lookup and refreshes the entry."""
+        mock_client.chat.side_effect = [
+            _mock_chat_response("Old answer"),
+            _mock_chat_response("New answer"),
+        ]
+
+        get_travel_guidance("Best places to visit in Tokyo")
+        refreshed, _ = get_travel_guidance("Best places to visit in Tokyo", bypass_cache=True)
+        cached, _ = get_travel_guidance("Best places to visit in Tokyo")
+
+        assert refreshed == "New answer"
+        assert cached == "New answer"
+        assert mock_client.chat.call_count == 2
+
+    @patch('core.llm_service.co_v2')
+    def test_errors_are_not_cached(self, mock_client):
+        """Test failed calls do not populate the cache."""
+        mock_client.chat.side_effect = [
+            Exception("API Error"),
+            _mock_chat_response("Visit Shibuya."),
+        ]
+
+        error, _ = get_travel_guidance("Best places to visit in Tokyo")
+        response, _ = get_travel_guidance("Best places to visit in Tokyo")
+
+        assert "Error getting travel guidance" in error
+        assert response == "Visit Shibuya."
+
+    @override_settings(LLM_RESPONSE_CACHE_ENABLED=False)
+    @patch('core.llm_service.co_v2')
+    def test_cache_disabled(self, mock_client):
+        """Test the cache can be disabled through settings."""
+        mock_client.chat.return_value = _mock_chat_response("Visit Shibuya.")
+
+        get_travel_guidance("Best places to visit in Tokyo")
+        get_travel_guidance("Best places to visit in Tokyo")
+
+        assert mock_client.chat.call_count == 2
+        assert response_cache.stats()["hits"] == 0
+
+    @patch('core.llm_service.co_v2')
+    @patch('core.llm_service.co_v2_async')
+    def test_async_path_shares_cache(self, mock_async_client, mock_client):
+        """Test the async path is served from entries written by the sync path."""
+        mock_client.chat.return_value = _mock_chat_response("Visit Shibuya.")
+        mock_async_client.chat = AsyncMock()
+
+        get_travel_guidance("Best places to visit in Tokyo")
+        response, _ = asyncio.run(aget_travel_guidance("Best places to visit in Tokyo"))
+
+        assert response == "Visit Shibuya."
+        mock_async_client.chat.assert_not_awaited()
+
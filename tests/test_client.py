@@ -0,0 +1,60 @@
+import asyncio
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from core import client as client_factory
+from core.client import LazyClient, get_async_client, get_client, reset_clients
+
+
+class TestClientFactory:
+    """Test the lazy, process-wide Cohere client factory."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_clients(self, monkeypatch):
+        monkeypatch.setenv('COHERE_API_KEY', 'test-key')
+        reset_clients()
+        yield
+        reset_clients()
+
+    def test_importing_llm_service_does_not_load_cohere(self):
+        """Test the Cohere SDK is only imported on the first LLM call."""
+        code = (
+            "import sys, django; django.setup(); "
+            "import core.llm_service, api.api, travel_app.views; "
+            "print('cohere' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True, text=True, check=True,
+            env={"DJANGO_SETTINGS_MODULE": "travel_copilot.settings", "PATH": ""},
+        )
+        assert result.stdout.strip() == "False"
+
+    def test_sync_client_is_built_once_per_process(self, settings):
+        settings.LLM_HTTP_MAX_CONNECTIONS = 7
+        first = get_client()
+        assert get_client() is first
+        pool = first._client_wrapper.httpx_client.httpx_client._transport._pool
+        assert pool._max_connections == 7
+
+    def test_sync_client_is_rebuilt_after_fork(self):
+        first = get_client()
+        with patch.object(client_factory.os, 'getpid', return_value=-1):
+            assert get_client() is not first
+
+    def test_async_client_is_per_event_loop(self):
+        async def build():
+            return get_async_client(), get_async_client()
+
+        first_a, first_b = asyncio.run(build())
+        second, _ = asyncio.run(build())
+        assert first_a is first_b
+        assert second is not first_a
+
+    def test_lazy_client_proxies_attributes(self):
+        target = type("Target", (), {"chat": lambda self: "ok"})()
+        proxy = LazyClient(lambda: target)
+        assert proxy.chat() == "ok"
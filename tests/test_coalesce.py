@@ -0,0 +1,130 @@
+import asyncio
+import threading
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from core.coalesce import SingleFlight, single_flight
+from core.llm_service import aget_travel_guidance, get_travel_guidance
+
+
+def _mock_chat_response(text):
+    mock_response = Mock()
+    mock_response.message.content = [Mock(text=text)]
+    return mock_response
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for condition"
+        time.sleep(0.001)
+
+
+class TestSingleFlight:
+    """Test coalescing of identical in-flight calls."""
+
+    def test_concurrent_threads_share_one_call(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(2)
+            return "result"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", fn))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        _wait_for(lambda: flight.stats()["deduplicated"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["result"] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {"executed": 1, "deduplicated": 4}
+
+    def test_exception_is_shared_and_key_released(self):
+        flight = SingleFlight()
+
+        with pytest.raises(ValueError):
+            flight.do("key", Mock(side_effect=ValueError("boom")))
+        # Completed calls are not reused
+        assert flight.do("key", lambda: "fresh") == "fresh"
+
+    def test_different_keys_are_not_coalesced(self):
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == 1
+        assert flight.do("b", lambda: 2) == 2
+        assert flight.stats() == {"executed": 2, "deduplicated": 0}
+
+    def test_async_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(*(flight.ado("key", fn) for _ in range(5)))
+
+        assert asyncio.run(run()) == ["result"] * 5
+        assert len(calls) == 1
+        assert flight.stats()["deduplicated"] == 4
+
+    def test_disabled(self, settings):
+        settings.LLM_COALESCE_ENABLED = False
+        flight = SingleFlight()
+        flight.do("key", lambda: 1)
+        assert flight.stats()["executed"] == 0
+
+
+class TestCoalescedTravelGuidance:
+    """Test identical concurrent requests share one upstream LLM call."""
+
+    @patch('core.llm_service.co_v2')
+    def test_sync_requests_coalesced(self, mock_client):
+        release = threading.Event()
+
+        def slow_chat(**kwargs):
+            release.wait(2)
+            return _mock_chat_response("Visit the Louvre.")
+
+        mock_client.chat.side_effect = slow_chat
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_travel_guidance("Top sights in Paris")[0]))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        _wait_for(lambda: single_flight.stats()["deduplicated"] == 3)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["Visit the Louvre."] * 4
+        mock_client.chat.assert_called_once()
+
+    @patch('core.llm_service.co_v2_async')
+    def test_async_requests_coalesced(self, mock_client):
+        async def slow_chat(**kwargs):
+            await asyncio.sleep(0.05)
+            return _mock_chat_response("Visit the Louvre.")
+
+        mock_client.chat = AsyncMock(side_effect=slow_chat)
+
+        async def run():
+            return await asyncio.gather(*(aget_travel_guidance("Top sights in Paris") for _ in range(4)))
+
+        results = asyncio.run(run())
+
+        assert [response for response, _ in results] == ["Visit the Louvre."] * 4
+        mock_client.chat.assert_awaited_once()
+        assert single_flight.stats()["deduplicated"] == 3
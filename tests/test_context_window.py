@@ -0,0 +1,148 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+from asgiref.sync import sync_to_async
+from prometheus_client import REGISTRY
+
+from core.context_window import (
+    SUMMARY_HEADER,
+    context_window,
+    estimate_tokens,
+    extractive_summary,
+)
+from core.llm_service import SYSTEM_MESSAGE, get_travel_guidance
+
+
+def _conversation(turns: int, words_per_message: int = 50) -> list:
+    messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i}. " + "detail " * words_per_message})
+        messages.append({"role": "assistant", "content": f"Answer {i}. " + "info " * words_per_message})
+    messages.append({"role": "user", "content": "What should I pack?"})
+    return messages
+
+
+class TestEstimateTokens:
+    """Test the local token approximation."""
+
+    def test_counts_words_and_punctuation(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("Visit Paris!") == 3
+
+    def test_long_words_count_extra(self):
+        assert estimate_tokens("internationalization") > estimate_tokens("trip")
+
+
+class TestExtractiveSummary:
+    """Test the default rolling summarizer."""
+
+    def test_one_line_per_message_appended_to_previous(self):
+        summary = extractive_summary("- User: Earlier question", [
+            {"role": "user", "content": "Where to eat in Rome? I like pasta."},
+            {"role": "assistant", "content": "Try Trastevere. It has great trattorias."},
+        ], max_tokens=100)
+        assert summary.splitlines() == [
+            "- User: Earlier question",
+            "- User: Where to eat in Rome?",
+            "- Assistant: Try Trastevere.",
+        ]
+
+    def test_oldest_lines_dropped_over_budget(self):
+        messages = [{"role": "user", "content": f"Question number {i}."} for i in range(20)]
+        summary = extractive_summary("", messages, max_tokens=20)
+        assert estimate_tokens(summary) <= 20
+        assert summary.splitlines()[-1] == "- User: Question number 19."
+
+
+class TestContextWindow:
+    """Test token-budgeted history windowing."""
+
+    @pytest.fixture(autouse=True)
+    def small_budget(self, settings):
+        settings.LLM_CONTEXT_MAX_TOKENS = 600
+        settings.LLM_CONTEXT_SUMMARY_MAX_TOKENS = 100
+
+    def test_short_conversation_sent_unchanged(self):
+        messages = _conversation(1, words_per_message=5)
+        fitted, metrics = context_window.fit(messages)
+        assert fitted is messages
+        assert metrics["tokens_saved"] == 0
+        assert metrics["messages_summarized"] == 0
+
+    def test_long_conversation_fits_budget(self):
+        messages = _conversation(10)
+        fitted, metrics = context_window.fit(messages)
+
+        assert metrics["tokens_sent"] <= 600
+        assert metrics["tokens_saved"] == metrics["tokens_in_history"] - metrics["tokens_sent"]
+        assert metrics["messages_summarized"] > 0
+        # System prompt carries the summary, the newest turns are kept verbatim and start on a user turn
+        assert fitted[0]["role"] == "system"
+        assert fitted[0]["content"].startswith(SYSTEM_MESSAGE + SUMMARY_HEADER)
+        assert fitted[1]["role"] == "user"
+        assert fitted[-1] == messages[-1]
+        assert fitted[-2] == messages[-2]
+        # The original history is not modified
+        assert messages[0]["content"] == SYSTEM_MESSAGE
+
+    def test_summary_is_rolled_forward_from_cache(self):
+        messages = _conversation(10)
+        context_window.fit(messages)
+
+        longer = messages[:-1] + [
+            {"role": "user", "content": "Question 10. " + "detail " * 50},
+            {"role": "assistant", "content": "Answer 10. " + "info " * 50},
+            messages[-1],
+        ]
+        with patch('core.context_window.extractive_summary', wraps=extractive_summary) as summarizer:
+            context_window.fit(longer)
+
+        # Only the newly folded messages are summarized
+        previous_summary, new_messages, _ = summarizer.call_args.args
+        assert previous_summary
+        assert len(new_messages) == 2
+
+    def test_async_fit_within_budget_stays_on_the_event_loop(self):
+        """Test only conversations that need a summary pay for a thread hop."""
+        short, long = _conversation(1, words_per_message=5), _conversation(10)
+
+        with patch('core.context_window.sync_to_async', wraps=sync_to_async) as hop:
+            fitted, _ = asyncio.run(context_window.afit(short))
+            assert fitted is short
+            hop.assert_not_called()
+
+            fitted, metrics = asyncio.run(context_window.afit(long))
+
+        hop.assert_called_once()
+        assert (fitted, metrics) == context_window.fit(long)
+
+    def test_records_prometheus_metrics(self):
+        sent = REGISTRY.get_sample_value('llm_context_tokens_sent_count') or 0.0
+        saved = REGISTRY.get_sample_value('llm_context_tokens_saved_total') or 0.0
+
+        _, metrics = context_window.fit(_conversation(10))
+
+        assert REGISTRY.get_sample_value('llm_context_tokens_sent_count') == sent + 1
+        assert REGISTRY.get_sample_value('llm_context_tokens_saved_total') == saved + metrics["tokens_saved"]
+
+    def test_disabled(self, settings):
+        settings.LLM_CONTEXT_WINDOW_ENABLED = False
+        messages = _conversation(10)
+        fitted, _ = context_window.fit(messages)
+        assert fitted is messages
+
+    @patch('core.llm_service.co_v2')
+    def test_llm_service_sends_windowed_history(self, mock_client):
+        """Test the LLM receives the trimmed history while the caller gets the full one."""
+        mock_response = Mock()
+        mock_response.message.content = [Mock(text="Pack light layers.")]
+        mock_client.chat.return_value = mock_response
+        messages = _conversation(10)
+
+        _, updated_messages = get_travel_guidance("What should I pack?", messages[:-1])
+
+        sent = mock_client.chat.call_args.kwargs["messages"]
+        assert len(sent) < len(messages)
+        assert len(updated_messages) == len(messages) + 1
+        assert context_window.stats()["tokens_saved"] > 0
@@ -0,0 +1,191 @@
+import asyncio
+import uuid
+import zlib
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.utils import timezone
+
+from core.conversation_store import (
+    ConversationStore,
+    DatabaseConversationStore,
+    build_conversation_store,
+)
+from core.llm_service import SYSTEM_MESSAGE
+from travel_app.models import Conversation, Turn
+
+cache_store = ConversationStore()
+
+
+def turn(question, answer):
+    return [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+
+
+class TestConversationStore:
+    """Test the compressed, append-only cache conversation store."""
+
+    def test_unknown_conversation(self):
+        assert cache_store.get("missing") is None
+        assert cache_store.length("missing") is None
+        assert cache_store.get_turns("missing") == []
+
+    def test_create_registers_empty_conversation(self):
+        cache_store.create("abc")
+
+        assert cache_store.get("abc") == []
+        assert cache_store.length("abc") == 0
+
+    def test_append_returns_index_and_flattens_turns(self):
+        assert cache_store.append("abc", turn("Lisbon?", "Visit Alfama.")) == 0
+        assert cache_store.append("abc", turn("Porto?", "Try a francesinha.")) == 1
+
+        assert cache_store.length("abc") == 2
+        assert cache_store.get("abc") == turn("Lisbon?", "Visit Alfama.") + turn("Porto?", "Try a francesinha.")
+        assert cache_store.to_llm_messages(cache_store.get("abc"))[0] == {
+            "role": "system", "content": SYSTEM_MESSAGE
+        }
+
+    def test_append_writes_only_the_new_turn(self):
+        cache_store.append("abc", turn("Lisbon?", "Visit Alfama."))
+        first = cache_store.backend.get("conversation:abc:turn:0")
+
+        cache_store.append("abc", turn("Porto?", "Try a francesinha."))
+
+        assert cache_store.backend.get("conversation:abc:turn:0") == first
+
+    def test_turns_are_compressed(self):
+        answer = "Walk along the river and visit the cathedral. " * 50
+        cache_store.append("abc", turn("Seville?", answer))
+
+        stored = cache_store.backend.get("conversation:abc:turn:0")
+
+        assert isinstance(stored, bytes)
+        assert len(stored) < len(answer) / 5
+        assert b"cathedral" in zlib.decompress(stored)
+
+    def test_get_turns_reads_a_page(self):
+        for i in range(5):
+            cache_store.append("abc", turn(f"Question {i}", f"Answer {i}"))
+
+        assert cache_store.get_turns("abc", 1, 3) == [turn("Question 1", "Answer 1"), turn("Question 2", "Answer 2")]
+
+    def test_async_variants(self):
+        store = ConversationStore()
+
+        async def exercise():
+            await store.acreate("abc")
+            await store.aappend("abc", turn("Lisbon?", "Visit Alfama."))
+            return await store.aget("abc"), await store.alength("abc"), await store.aget("missing")
+
+        assert asyncio.run(exercise()) == (turn("Lisbon?", "Visit Alfama."), 1, None)
+
+    def test_concurrent_async_appends_keep_every_turn(self):
+        """Test coroutines appending at once never share a turn index."""
+        async def exercise():
+            return await asyncio.gather(*(
+                cache_store.aappend("abc", turn(f"Question {i}", f"Answer {i}")) for i in range(20)
+            ))
+
+        assert sorted(asyncio.run(exercise())) == list(range(20))
+        assert len(cache_store.get("abc")) == 40
+
+    def test_non_atomic_backend_falls_back_to_database_store(self, settings):
+        """Test the cache store is never used over a backend without an atomic incr."""
+        settings.CONVERSATION_STORE = "core.conversation_store.ConversationStore"
+        settings.CACHES = {
+            **settings.CACHES,
+            "conversations": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache_table"},
+        }
+
+        assert type(build_conversation_store()) is DatabaseConversationStore
+
+        settings.CACHES = {
+            **settings.CACHES,
+            "conversations": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "conversations"},
+        }
+        assert type(build_conversation_store()) is ConversationStore
+
+
+@pytest.fixture
+def db_store():
+    return DatabaseConversationStore()
+
+
+@pytest.fixture
+def traveller(django_user_model):
+    return django_user_model.objects.create_user(username="traveller", password="secret")
+
+
+@pytest.mark.django_db
+class TestDatabaseConversationStore:
+    """Test the persistent conversation store."""
+
+    def test_unknown_and_malformed_ids(self, db_store):
+        assert db_store.get(uuid.uuid4().hex) is None
+        assert db_store.length("not-a-uuid") is None
+        assert db_store.get_turns("not-a-uuid") == []
+        assert not db_store.can_access("not-a-uuid")
+
+    def test_append_and_read_pages(self, db_store):
+        conversation_id = db_store.new_id()
+        for i in range(5):
+            assert db_store.append(conversation_id, turn(f"Question {i}", f"Answer {i}")) == i
+
+        assert db_store.length(conversation_id) == 5
+        assert db_store.get_turns(conversation_id, 1, 3) == [turn("Question 1", "Answer 1"), turn("Question 2", "Answer 2")]
+        assert db_store.get(conversation_id)[-1] == {"role": "assistant", "content": "Answer 4"}
+
+        conversation = Conversation.objects.get(pk=conversation_id)
+        assert conversation.title == "Question 0"
+        assert conversation.user is None
+        assert b"Answer 0" in zlib.decompress(Turn.objects.get(conversation=conversation, index=0).messages)
+
+    def test_owned_conversation_is_private(self, db_store, traveller, django_user_model):
+        conversation_id = db_store.new_id()
+        db_store.append(conversation_id, turn("Lisbon?", "Visit Alfama."), user=traveller)
+        other = django_user_model.objects.create_user(username="other", password="secret")
+
+        assert db_store.can_access(conversation_id, traveller)
+        assert not db_store.can_access(conversation_id, other)
+        assert not db_store.can_access(conversation_id, AnonymousUser())
+
+    def test_list_conversations_by_keyset(self, db_store, traveller, django_assert_num_queries):
+        ids = []
+        for i in range(5):
+            ids.append(db_store.new_id())
+            db_store.append(ids[-1], turn(f"Trip {i}?", "Sure."), user=traveller)
+        db_store.append(db_store.new_id(), turn("Anonymous?", "Sure."))
+
+        with django_assert_num_queries(1):
+            first, cursor = db_store.list_conversations(traveller, limit=3)
+        rest, last_cursor = db_store.list_conversations(traveller, before=cursor, limit=3)
+
+        assert [c.pk.hex for c in first + rest] == ids[::-1]
+        assert [c.title for c in first] == ["Trip 4?", "Trip 3?", "Trip 2?"]
+        assert last_cursor is None
+        assert db_store.list_conversations(AnonymousUser()) == ([], None)
+        with pytest.raises(ValueError):
+            db_store.list_conversations(traveller, before="garbage")
+
+    def test_keyset_breaks_ties_on_id(self, db_store, traveller):
+        for _ in range(4):
+            db_store.append(db_store.new_id(), turn("Trip?", "Sure."), user=traveller)
+        Conversation.objects.update(updated_at=timezone.now())
+
+        first, cursor = db_store.list_conversations(traveller, limit=2)
+        rest, _ = db_store.list_conversations(traveller, before=cursor, limit=2)
+
+        assert len({c.pk for c in first + rest}) == 4
+
+    @pytest.mark.django_db(transaction=True)
+    def test_async_variants(self, db_store, traveller):
+        conversation_id = db_store.new_id()
+
+        async def exercise():
+            await db_store.acreate(conversation_id, user=traveller)
+            await db_store.aappend(conversation_id, turn("Lisbon?", "Visit Alfama."))
+            page, _ = await db_store.alist_conversations(traveller)
+            return (await db_store.aget(conversation_id), await db_store.alength(conversation_id),
+                    await db_store.acan_access(conversation_id, traveller), [c.pk.hex for c in page])
+
+        assert asyncio.run(exercise()) == (turn("Lisbon?", "Visit Alfama."), 1, True, [conversation_id])
@@ -0,0 +1,163 @@
+import asyncio
+import json
+from unittest.mock import Mock, patch
+
+import pytest
+
+from benchmarks.domain_filter import QUERIES
+from core import domain_examples
+from core.domain_filter import (
+    DOMAIN_REFUSAL_MESSAGE,
+    OUT_OF_DOMAIN,
+    TRAVEL,
+    DomainClassifier,
+    domain_filter,
+    llm_refused,
+)
+from core.llm_service import (
+    SYSTEM_MESSAGE,
+    astream_travel_guidance,
+    get_travel_guidance,
+)
+
+OUT_OF_DOMAIN_QUESTION = "Write a haiku about cats"
+LLM_REFUSAL = "I'm sorry, but I can only help with travel-related questions."
+
+
+def _mock_chat_response(text):
+    mock_response = Mock()
+    mock_response.message.content = [Mock(text=text)]
+    return mock_response
+
+
+class TestDomainClassifier:
+    """Test the naive Bayes domain classifier."""
+
+    @pytest.fixture
+    def classifier(self):
+        return domain_filter.classifier()
+
+    def test_separates_travel_from_out_of_domain(self, classifier):
+        """Test clearly out-of-domain questions score high and travel questions low."""
+        assert classifier.score(OUT_OF_DOMAIN_QUESTION) > 0.98
+        assert classifier.score("What are the best restaurants in Lima?") < 0.1
+
+    @pytest.mark.parametrize("question", [
+        "How do I renew my passport?",
+        "Do I need a visa for Japan?",
+        "What currency do they use in Peru?",
+        "What is the capital of France?",
+    ])
+    def test_travel_logistics_are_not_refused(self, classifier, settings, question):
+        """Test held-out passport, visa, currency and geography questions stay below the threshold."""
+        assert classifier.score(question) < settings.DOMAIN_FILTER_THRESHOLD
+
+    def test_unknown_words_score_at_prior(self):
+        """Test a question made only of unseen words is never confidently rejected."""
+        classifier = DomainClassifier().fit([("visit Rome", TRAVEL), ("write code", OUT_OF_DOMAIN)])
+
+        assert classifier.score("asdf qwer") == pytest.approx(0.5)
+
+    def test_evaluation_set_is_disjoint_from_training(self):
+        """Test the benchmark questions never leak into the training examples."""
+        with open(QUERIES, encoding="utf-8") as f:
+            queries = {json.loads(line)["text"] for line in f}
+
+        assert queries.isdisjoint(domain_examples.TRAVEL + domain_examples.OUT_OF_DOMAIN)
+
+    def test_llm_refused(self):
+        assert llm_refused(LLM_REFUSAL)
+        assert not llm_refused("Lima is famous for its ceviche.")
+
+
+class TestDomainFilterModes:
+    """Test the pre-filter stage of the LLM service."""
+
+    @patch('core.llm_service.co_v2')
+    def test_shadow_counts_agreement_without_rejecting(self, mock_client, settings):
+        """Test shadow mode always calls the LLM and compares its answer with the prediction."""
+        settings.DOMAIN_FILTER_MODE = "shadow"
+        mock_client.chat.return_value = _mock_chat_response(LLM_REFUSAL)
+
+        response, _ = get_travel_guidance(OUT_OF_DOMAIN_QUESTION)
+
+        assert response == LLM_REFUSAL
+        mock_client.chat.assert_called_once()
+        assert domain_filter.stats() == {"checked": 1, "rejected": 0, "agreed": 1, "disagreed": 0}
+
+    @patch('core.llm_service.co_v2')
+    def test_shadow_counts_disagreement(self, mock_client, settings):
+        settings.DOMAIN_FILTER_MODE = "shadow"
+        mock_client.chat.return_value = _mock_chat_response("Cats curl up / in the sun")
+
+        get_travel_guidance(OUT_OF_DOMAIN_QUESTION)
+
+        assert domain_filter.stats()["disagreed"] == 1
+
+    @patch('core.llm_service.co_v2')
+    def test_enforce_refuses_without_llm_call(self, mock_client, settings):
+        """Test confident out-of-domain questions are refused locally and not cached."""
+        settings.DOMAIN_FILTER_MODE = "enforce"
+
+        response, messages = get_travel_guidance(OUT_OF_DOMAIN_QUESTION)
+
+        assert response == DOMAIN_REFUSAL_MESSAGE
+        assert messages == [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": OUT_OF_DOMAIN_QUESTION},
+            {"role": "assistant", "content": DOMAIN_REFUSAL_MESSAGE},
+        ]
+        mock_client.chat.assert_not_called()
+        assert domain_filter.stats()["rejected"] == 1
+
+        # Turning the filter off lets the LLM answer rather than replaying the refusal
+        settings.DOMAIN_FILTER_MODE = "off"
+        mock_client.chat.return_value = _mock_chat_response(LLM_REFUSAL)
+        assert get_travel_guidance(OUT_OF_DOMAIN_QUESTION)[0] == LLM_REFUSAL
+
+    @patch('core.llm_service.co_v2')
+    def test_enforce_passes_travel_questions(self, mock_client, settings):
+        settings.DOMAIN_FILTER_MODE = "enforce"
+        mock_client.chat.return_value = _mock_chat_response("Try the ceviche.")
+
+        assert get_travel_guidance("What are the best restaurants in Lima?")[0] == "Try the ceviche."
+        assert domain_filter.stats()["rejected"] == 0
+
+    @patch('core.llm_service.co_v2')
+    def test_follow_ups_are_not_filtered(self, mock_client, settings):
+        """Test questions continuing a conversation always reach the LLM."""
+        settings.DOMAIN_FILTER_MODE = "enforce"
+        mock_client.chat.return_value = _mock_chat_response("Here is one about a cat in Kyoto.")
+        history = [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": "Tell me about Kyoto"},
+            {"role": "assistant", "content": "Kyoto is famous for its temples."},
+        ]
+
+        get_travel_guidance(OUT_OF_DOMAIN_QUESTION, history)
+
+        mock_client.chat.assert_called_once()
+        assert domain_filter.stats()["checked"] == 0
+
+    @patch('core.llm_service.co_v2')
+    def test_off(self, mock_client, settings):
+        settings.DOMAIN_FILTER_MODE = "off"
+        mock_client.chat.return_value = _mock_chat_response(LLM_REFUSAL)
+
+        get_travel_guidance(OUT_OF_DOMAIN_QUESTION)
+
+        assert domain_filter.stats()["checked"] == 0
+
+    @patch('core.llm_service.co_v2_async')
+    def test_astream_enforce_refuses_without_llm_call(self, mock_client, settings):
+        """Test the refusal is streamed as a single delta."""
+        settings.DOMAIN_FILTER_MODE = "enforce"
+
+        async def consume():
+            return [event async for event in astream_travel_guidance(OUT_OF_DOMAIN_QUESTION)]
+
+        events = asyncio.run(consume())
+
+        assert [e["type"] for e in events] == ["delta", "done"]
+        assert events[-1]["response"] == DOMAIN_REFUSAL_MESSAGE
+        mock_client.chat_stream.assert_not_called()
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fake_cohere import FakeCohereConfig, FakeCohereServer
+from benchmarks.loadgen import percentile
+from core.client import reset_clients
+from core.llm_service import (
+    aget_travel_guidance,
+    get_travel_guidance,
+    stream_travel_guidance,
+)
+
+
+@pytest.fixture
+def fake_cohere(settings, monkeypatch):
+    """Run the app's Cohere clients against a local fake server."""
+    server = FakeCohereServer(config=FakeCohereConfig(ttft_median=0, tokens_per_second=10000, output_tokens=8)).start()
+    monkeypatch.setenv('COHERE_API_KEY', 'test-key')
+    settings.LLM_API_BASE_URL = server.base_url
+    settings.LLM_RETRY_BASE_DELAY = 0
+    reset_clients()
+    yield server
+    reset_clients()
+    server.stop()
+
+
+class TestFakeCohereServer:
+    """Test the fake server honours the Cohere v2 chat contract used by the LLM service."""
+
+    def test_chat(self, fake_cohere):
+        response, messages = get_travel_guidance("What are the best places to visit in Tokyo?")
+
+        assert len(response.split()) == 8
+        assert messages[-1] == {"role": "assistant", "content": response}
+        assert fake_cohere.counters["requests"] == 1
+
+    def test_async_chat(self, fake_cohere):
+        response, _ = asyncio.run(aget_travel_guidance("What are the best places to visit in Tokyo?"))
+
+        assert len(response.split()) == 8
+
+    def test_stream(self, fake_cohere):
+        events = list(stream_travel_guidance("What are the best places to visit in Tokyo?"))
+
+        assert [event["type"] for event in events] == ["delta"] * 8 + ["done"]
+        assert events[-1]["response"] == "".join(event["text"] for event in events[:-1]).strip()
+
+    def test_errors_are_retried(self, fake_cohere):
+        fake_cohere.config.error_rate = 1.0
+
+        response, _ = get_travel_guidance("What are the best places to visit in Tokyo?")
+
+        assert response.startswith("Error getting travel guidance")
+        assert fake_cohere.counters["errors"] == 3
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from django.test import Client
+
+from core.conversation_store import conversation_store
+from core.idempotency import IdempotencyConflict, IdempotencyInProgress, idempotency
+from core.llm_service import SYSTEM_MESSAGE
+from travel_app.views import park_stream
+
+ANSWER = "Visit the Louvre."
+SUCCESS = (ANSWER, [
+    {"role": "system", "content": SYSTEM_MESSAGE},
+    {"role": "user", "content": "What should I see in Paris?"},
+    {"role": "assistant", "content": ANSWER},
+])
+
+
+def post_guidance(client, user_message, key):
+    return client.post('/api/travel-guidance/', data=json.dumps({"user_message": user_message}),
+                       content_type='application/json', headers={"Idempotency-Key": key})
+
+
+@pytest.mark.django_db
+class TestIdempotentAPI:
+    """Test Idempotency-Key handling on the travel guidance API."""
+
+    def test_retry_replays_first_answer(self, client, mock_llm_service_success):
+        first = post_guidance(client, "What should I see in Paris?", "key-1")
+        retry = post_guidance(client, "What should I see in Paris?", "key-1")
+
+        assert first.status_code == retry.status_code == 200
+        assert retry.json() == first.json()
+        assert retry["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first
+        mock_llm_service_success.assert_called_once()
+        assert idempotency.stats() == {"executions": 1, "replays": 1, "conflicts": 0, "timeouts": 0}
+
+    def test_different_keys_run_separately(self, client, mock_llm_service_success):
+        post_guidance(client, "What should I see in Paris?", "key-1")
+        post_guidance(client, "What should I see in Paris?", "key-2")
+
+        assert mock_llm_service_success.call_count == 2
+
+    def test_key_reused_for_different_body(self, client, mock_llm_service_success):
+        post_guidance(client, "What should I see in Paris?", "key-1")
+        response = post_guidance(client, "What should I see in Rome?", "key-1")
+
+        assert response.status_code == 422
+        mock_llm_service_success.assert_called_once()
+
+    def test_errors_are_not_replayed(self, client, mock_llm_service_success):
+        mock_llm_service_success.side_effect = [RuntimeError("LLM unavailable"), SUCCESS]
+
+        failed = post_guidance(client, "What should I see in Paris?", "key-1")
+        retry = post_guidance(client, "What should I see in Paris?", "key-1")
+
+        assert failed.json()["response"].startswith("An error occurred")
+        assert retry.json()["response"] == ANSWER
+        assert mock_llm_service_success.call_count == 2
+
+
+class TestIdempotencyStore:
+    """Test the store's handling of concurrent duplicates."""
+
+    def test_concurrent_duplicate_waits_for_result(self):
+        started = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return ANSWER
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(idempotency.run("scope", "key", "fp", slow)))
+        first.start()
+        started.wait(5)
+        duplicate = idempotency.run("scope", "key", "fp", slow)
+        first.join()
+
+        assert duplicate == (ANSWER, True)
+        assert results == [(ANSWER, False)]
+        assert len(calls) == 1
+
+    def test_duplicate_gives_up_after_wait_timeout(self, settings):
+        settings.IDEMPOTENCY_WAIT_TIMEOUT = 0.05
+        settings.IDEMPOTENCY_POLL_INTERVAL = 0.01
+        assert idempotency.begin("scope", "key", "fp") == (True, None)
+
+        with pytest.raises(IdempotencyInProgress):
+            idempotency.begin("scope", "key", "fp")
+        with pytest.raises(IdempotencyConflict):
+            idempotency.begin("scope", "key", "other-fp")
+
+    def test_failure_releases_key(self):
+        with pytest.raises(RuntimeError):
+            idempotency.run("scope", "key", "fp", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+
+        assert idempotency.run("scope", "key", "fp", lambda: ANSWER) == (ANSWER, False)
+
+
+@pytest.mark.django_db
+class TestIdempotentForm:
+    """Test the HTMX form's idempotency key."""
+
+    @patch('travel_app.views.get_travel_guidance', return_value=SUCCESS)
+    def test_resubmit_does_not_append_again(self, mock_service, client):
+        form = {"user_message": "What should I see in Paris?", "idempotency_key": "form-key"}
+
+        first = client.post('/', form, headers={"HX-Request": "true"})
+        retry = client.post('/', form, headers={"HX-Request": "true"})
+
+        assert retry.content == first.content
+        mock_service.assert_called_once()
+        assert conversation_store.length(client.session['conversation_id']) == 1
+
+    def test_same_key_from_another_session_runs_separately(self, client):
+        form = {"user_message": "What should I see in Paris?", "idempotency_key": "form-key"}
+        other_response = "Visit the Musee d'Orsay."
+        other_answer = (other_response, [*SUCCESS[1][:2], {"role": "assistant", "content": other_response}])
+        other_client = Client()
+
+        with patch('travel_app.views.get_travel_guidance', side_effect=[SUCCESS, other_answer]) as mock_service:
+            first = client.post('/', form, headers={"HX-Request": "true"})
+            other = other_client.post('/', form, headers={"HX-Request": "true"})
+
+        assert mock_service.call_count == 2
+        assert b"Musee" not in first.content
+        assert b"Musee" in other.content
+        assert client.session.session_key != other_client.session.session_key
+
+    def test_resubmit_returns_same_stream(self, client):
+        form = {"user_message": "What should I see in Paris?", "idempotency_key": "form-key"}
+
+        with patch('travel_app.views.park_stream', wraps=park_stream) as mock_park:
+            first = client.post('/stream/', form)
+            retry = client.post('/stream/', form)
+
+        assert retry.content == first.content
+        mock_park.assert_called_once()
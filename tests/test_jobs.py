@@ -0,0 +1,275 @@
+import hashlib
+import hmac
+import json
+import socket
+import time
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+from django.utils import timezone
+
+from core.admission import in_flight
+from core.jobs import (
+    UnsafeWebhookURL,
+    check_webhook_url,
+    claim_next,
+    enqueue,
+    job_pool,
+    purge_finished,
+    requeue_stale,
+    run_job,
+)
+from core.llm_service import SYSTEM_MESSAGE
+from travel_app.models import GuidanceJob
+
+ANSWER = "Day 1: Tokyo. Day 2: Kyoto."
+SUCCESS = (ANSWER, [
+    {"role": "system", "content": SYSTEM_MESSAGE},
+    {"role": "user", "content": "Plan my trip to Japan"},
+    {"role": "assistant", "content": ANSWER},
+])
+
+
+@pytest.fixture
+def llm():
+    with patch('core.jobs.llm_service.get_travel_guidance', return_value=SUCCESS) as mock_service:
+        yield mock_service
+
+
+def resolves_to(address):
+    """Patch DNS so every webhook host resolves to `address`."""
+    return patch('core.jobs.socket.getaddrinfo', return_value=[
+        (socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 443)),
+    ])
+
+
+@pytest.fixture
+def public_dns():
+    with resolves_to("93.184.216.34"):
+        yield
+
+
+@pytest.mark.django_db
+class TestJobAPI:
+    """Test enqueueing and polling background jobs."""
+
+    def test_create_returns_queued_job(self, client):
+        response = client.post('/api/jobs/', data=json.dumps({"user_message": "Plan my trip to Japan"}),
+                               content_type='application/json')
+
+        assert response.status_code == 202
+        data = response.json()
+        assert data["status"] == "queued"
+        assert GuidanceJob.objects.get(pk=data["job_id"]).user_message == "Plan my trip to Japan"
+
+    def test_poll_until_finished(self, client, llm):
+        job_id = client.post('/api/jobs/', data=json.dumps({"user_message": "Plan my trip to Japan"}),
+                             content_type='application/json').json()["job_id"]
+
+        assert client.get(f'/api/jobs/{job_id}/').json()["status"] == "queued"
+        assert job_pool.run_once()
+
+        data = client.get(f'/api/jobs/{job_id}/').json()
+        assert data["status"] == "succeeded"
+        assert data["response"] == ANSWER
+        assert data["messages"][-1] == {"role": "assistant", "content": ANSWER}
+        assert data["finished_at"] is not None
+
+    def test_unknown_job_returns_404(self, client):
+        response = client.get('/api/jobs/3f2b9c0d-8e7a-4b6c-9d1e-2f3a4b5c6d7e/')
+
+        assert response.status_code == 404
+
+    def test_invalid_webhook_url(self, client):
+        response = client.post('/api/jobs/', data=json.dumps({"user_message": "Hi", "webhook_url": "ftp://example.com"}),
+                               content_type='application/json')
+
+        assert response.status_code == 422
+
+    def test_internal_webhook_url_is_rejected(self, client):
+        response = client.post('/api/jobs/', data=json.dumps({
+            "user_message": "Hi", "webhook_url": "http://169.254.169.254/latest/meta-data/"
+        }), content_type='application/json')
+
+        assert response.status_code == 422
+        assert not GuidanceJob.objects.exists()
+
+
+class TestWebhookURLCheck:
+    """Test which webhook URLs the server is willing to call."""
+
+    @pytest.mark.parametrize("url", [
+        "ftp://example.com/hook",
+        "file:///etc/passwd",
+        "http://127.0.0.1:8000/admin/",
+        "http://localhost/hook",
+        "http://10.0.0.5/hook",
+        "http://192.168.1.1/hook",
+        "http://169.254.169.254/latest/meta-data/",
+        "http://[::1]/hook",
+        "http://[::ffff:127.0.0.1]/hook",
+        "http://0.0.0.0/hook",
+    ])
+    def test_rejects_non_public_urls(self, url):
+        with pytest.raises(UnsafeWebhookURL):
+            check_webhook_url(url)
+
+    def test_rejects_hosts_resolving_to_private_addresses(self):
+        with resolves_to("10.1.2.3"), pytest.raises(UnsafeWebhookURL):
+            check_webhook_url("https://hooks.example.com/travel")
+
+    def test_accepts_public_hosts(self, public_dns):
+        check_webhook_url("https://hooks.example.com/travel")
+
+    def test_allowed_hosts_skip_the_address_check(self, settings):
+        settings.JOB_WEBHOOK_ALLOWED_HOSTS = ["receiver.internal"]
+
+        with resolves_to("10.1.2.3"):
+            check_webhook_url("http://receiver.internal:9000/hook")
+
+
+@pytest.mark.django_db
+class TestJobRunner:
+    """Test claiming, running and recovering jobs."""
+
+    def test_job_is_claimed_once(self):
+        job = enqueue("Plan my trip to Japan")
+
+        claimed = claim_next("worker-a")
+
+        assert claimed.pk == job.pk
+        assert claimed.status == GuidanceJob.Status.RUNNING
+        assert claimed.attempts == 1
+        assert claim_next("worker-b") is None
+
+    def test_failed_llm_call_fails_job(self):
+        enqueue("Plan my trip to Japan")
+        error = ("Error getting travel guidance: timeout", [{"role": "system", "content": SYSTEM_MESSAGE}])
+
+        with patch('core.jobs.llm_service.get_travel_guidance', return_value=error):
+            assert run_job(claim_next("worker-a")) is False
+
+        job = GuidanceJob.objects.get()
+        assert job.status == GuidanceJob.Status.FAILED
+        assert job.error == "Error getting travel guidance: timeout"
+
+    def test_stale_jobs_are_requeued_then_failed(self, settings, llm):
+        settings.JOB_MAX_ATTEMPTS = 2
+        job = enqueue("Plan my trip to Japan")
+        stale = timezone.now() - timedelta(hours=1)
+
+        claim_next("worker-a")
+        GuidanceJob.objects.filter(pk=job.pk).update(started_at=stale)
+        assert requeue_stale() == 1
+        assert GuidanceJob.objects.get(pk=job.pk).status == GuidanceJob.Status.QUEUED
+
+        reclaimed = claim_next("worker-b")
+        GuidanceJob.objects.filter(pk=job.pk).update(started_at=stale)
+        assert requeue_stale() == 1
+        assert GuidanceJob.objects.get(pk=job.pk).status == GuidanceJob.Status.FAILED
+
+        # The late worker cannot overwrite the outcome
+        run_job(reclaimed)
+        assert GuidanceJob.objects.get(pk=job.pk).status == GuidanceJob.Status.FAILED
+
+    def test_llm_call_holds_an_in_flight_slot(self):
+        """Test queued jobs count against the same in-flight cap as interactive requests."""
+        enqueue("Plan my trip to Japan")
+
+        def answer(*args, **kwargs):
+            assert in_flight.stats()["in_flight"] == 1
+            return SUCCESS
+
+        with patch('core.jobs.llm_service.get_travel_guidance', side_effect=answer):
+            assert job_pool.run_once()
+
+        assert GuidanceJob.objects.get().status == GuidanceJob.Status.SUCCEEDED
+        assert in_flight.stats()["in_flight"] == 0
+
+    def test_purge_finished(self, settings, llm):
+        settings.JOB_RESULT_TTL = 60
+        enqueue("Plan my trip to Japan")
+        job_pool.run_once()
+        GuidanceJob.objects.update(finished_at=timezone.now() - timedelta(minutes=5))
+
+        assert purge_finished() == 1
+        assert not GuidanceJob.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("public_dns")
+class TestWebhooks:
+    """Test webhook delivery of finished jobs."""
+
+    def test_signed_delivery(self, settings, llm):
+        settings.JOB_WEBHOOK_SECRET = "s3cret"
+        job = enqueue("Plan my trip to Japan", webhook_url="https://example.com/hook")
+
+        with patch('httpx.Client.post', return_value=Mock(status_code=204)) as mock_post:
+            job_pool.run_once()
+
+        body = mock_post.call_args.kwargs["content"]
+        expected = "sha256=" + hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+        assert mock_post.call_args.kwargs["headers"]["X-Signature-256"] == expected
+        assert json.loads(body)["response"] == ANSWER
+        job.refresh_from_db()
+        assert job.webhook_status == 204
+        assert job.webhook_delivered_at is not None
+
+    def test_delivery_connects_to_the_checked_address(self, llm):
+        """Test the host is not resolved again when connecting, so it cannot be rebound in between."""
+        enqueue("Plan my trip to Japan", webhook_url="https://example.com:8443/hook?team=1")
+
+        with patch('httpx.Client.post', return_value=Mock(status_code=204)) as mock_post:
+            job_pool.run_once()
+
+        assert str(mock_post.call_args.args[0]) == "https://93.184.216.34:8443/hook?team=1"
+        assert mock_post.call_args.kwargs["headers"]["Host"] == "example.com:8443"
+        assert mock_post.call_args.kwargs["extensions"] == {"sni_hostname": "example.com"}
+
+    def test_retries_then_gives_up(self, settings, llm):
+        settings.JOB_WEBHOOK_ATTEMPTS = 3
+        settings.JOB_WEBHOOK_RETRY_DELAY = 0
+        job = enqueue("Plan my trip to Japan", webhook_url="https://example.com/hook")
+
+        with patch('httpx.Client.post', return_value=Mock(status_code=500)) as mock_post:
+            job_pool.run_once()
+
+        assert mock_post.call_count == 3
+        job.refresh_from_db()
+        assert job.status == GuidanceJob.Status.SUCCEEDED
+        assert job.webhook_status == 500
+        assert job.webhook_delivered_at is None
+
+    def test_host_rebound_to_private_address_is_not_called(self, llm):
+        """Test the URL is checked again at delivery, as DNS may have changed since it was queued."""
+        job = enqueue("Plan my trip to Japan", webhook_url="https://example.com/hook")
+
+        with resolves_to("127.0.0.1"), patch('httpx.Client.post') as mock_post:
+            job_pool.run_once()
+
+        mock_post.assert_not_called()
+        job.refresh_from_db()
+        assert job.status == GuidanceJob.Status.SUCCEEDED
+        assert job.webhook_delivered_at is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_threads_run_jobs(settings, llm):
+    """Test the pool's threads pick up jobs enqueued in the same process."""
+    settings.JOB_POLL_INTERVAL = 5.0
+    job_pool.start(2)
+    try:
+        job = enqueue("Plan my trip to Japan")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            job.refresh_from_db()
+            if job.is_finished:
+                break
+            time.sleep(0.02)
+    finally:
+        job_pool.stop(timeout=5)
+
+    assert job.status == GuidanceJob.Status.SUCCEEDED
+    assert not job_pool.running
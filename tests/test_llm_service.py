@@ -1,5 +1,12 @@
-from unittest.mock import patch, Mock
-from core.llm_service import get_travel_guidance, SYSTEM_MESSAGE
+import asyncio
+from unittest.mock import AsyncMock, patch, Mock
+from core.llm_service import (
+    aget_travel_guidance,
+    astream_travel_guidance,
+    get_travel_guidance,
+    stream_travel_guidance,
+    SYSTEM_MESSAGE,
+)
 
 
 class TestGetTravelGuidance:
@@ -137,3 +144,106 @@ class TestGetTravelGuidance:
         assert len(messages) == len(long_history) + 2  # +2 for new user + assistant
         assert "spring" in response.lower()
         mock_client.chat.assert_called_once()
+
+
+class TestAsyncGetTravelGuidance:
+    """Test the async aget_travel_guidance function."""
+
+    @patch('core.llm_service.co_v2_async')
+    def test_aget_travel_guidance_new_conversation(self, mock_client):
+        """Test async travel guidance with new conversation (no history)."""
+        mock_response = Mock()
+        mock_response.message.content = [
+            Mock(text="Tokyo highlights include Shibuya, Senso-ji Temple and Tokyo Tower.")
+        ]
+        mock_client.chat = AsyncMock(return_value=mock_response)
+
+        user_message = "What are the best places to visit in Tokyo?"
+        response, messages = asyncio.run(aget_travel_guidance(user_message))
+
+        assert "Senso-ji" in response
+        assert len(messages) == 3  # system + user + assistant
+        assert messages[0]["content"] == SYSTEM_MESSAGE
+        assert messages[1]["content"] == user_message
+        assert messages[2]["content"] == response
+        mock_client.chat.assert_awaited_once()
+
+    @patch('core.llm_service.co_v2_async')
+    def test_aget_travel_guidance_api_error(self, mock_client):
+        """Test async travel guidance when API returns an error."""
+        mock_client.chat = AsyncMock(side_effect=Exception("API Error: Timeout"))
+
+        response, messages = asyncio.run(aget_travel_guidance("Tell me about Rome"))
+
+        assert "Error getting travel guidance" in response
+        assert "API Error: Timeout" in response
+        assert len(messages) == 1
+        assert messages[0]["role"] == "system"
+
+
+class TestStreamTravelGuidance:
+    """Test the stream_travel_guidance generator."""
+
+    @patch('core.llm_service.co_v2')
+    def test_stream_travel_guidance_yields_deltas_and_done(self, mock_client):
+        """Test stream yields text deltas then a done event with updated history."""
+        deltas = []
+        for text in ["Lisbon has ", "great pastries."]:
+            event = Mock(type="content-delta")
+            event.delta.message.content.text = text
+            deltas.append(event)
+        mock_client.chat_stream.return_value = iter([Mock(type="message-start"), *deltas])
+
+        events = list(stream_travel_guidance("Tell me about Lisbon"))
+
+        assert [e["type"] for e in events] == ["delta", "delta", "done"]
+        assert events[-1]["response"] == "Lisbon has great pastries."
+        assert events[-1]["messages"][-1] == {"role": "assistant", "content": "Lisbon has great pastries."}
+
+
+class TestAsyncStreamTravelGuidance:
+    """Test the astream_travel_guidance async generator."""
+
+    @staticmethod
+    def _collect(agen):
+        async def consume():
+            return [event async for event in agen]
+        return asyncio.run(consume())
+
+    @patch('core.llm_service.co_v2_async')
+    def test_astream_travel_guidance_yields_deltas_and_done(self, mock_client):
+        """Test stream yields text deltas then a done event with updated history."""
+        def delta(text):
+            event = Mock(type="content-delta")
+            event.delta.message.content.text = text
+            return event
+
+        async def fake_chat_stream(**kwargs):
+            yield Mock(type="message-start")
+            yield delta("Kyoto is ")
+            yield delta("famous for its temples.")
+            yield Mock(type="message-end")
+
+        mock_client.chat_stream = fake_chat_stream
+
+        events = self._collect(astream_travel_guidance("Tell me about Kyoto"))
+
+        assert [e["type"] for e in events] == ["delta", "delta", "done"]
+        assert events[0]["text"] == "Kyoto is "
+        assert events[-1]["response"] == "Kyoto is famous for its temples."
+        messages = events[-1]["messages"]
+        assert len(messages) == 3
+        assert messages[1]["content"] == "Tell me about Kyoto"
+        assert messages[2]["content"] == "Kyoto is famous for its temples."
+
+    @patch('core.llm_service.co_v2_async')
+    def test_astream_travel_guidance_api_error(self, mock_client):
+        """Test stream yields a single error event when the API call fails."""
+        mock_client.chat_stream = Mock(side_effect=Exception("API Error: Unavailable"))
+
+        events = self._collect(astream_travel_guidance("Tell me about Kyoto"))
+
+        assert len(events) == 1
+        assert events[0]["type"] == "error"
+        assert "API Error: Unavailable" in events[0]["response"]
+        assert events[0]["messages"][0]["role"] == "system"
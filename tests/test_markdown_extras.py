@@ -0,0 +1,43 @@
+from unittest.mock import patch
+
+from django.utils.safestring import SafeString
+
+from travel_app.templatetags import markdown_extras
+from travel_app.templatetags.markdown_extras import markdown_format, render_markdown
+
+
+class TestMarkdownRendering:
+    """Test the render-once markdown pipeline."""
+
+    def test_renders_markdown_with_extensions(self):
+        """Test markdown is converted to safe HTML with the 'extra' extensions."""
+        html = markdown_format("**Paris**\n\n| City | Sight |\n| --- | --- |\n| Paris | Louvre |")
+        assert isinstance(html, SafeString)
+        assert "<strong>Paris</strong>" in html
+        assert "<table>" in html
+
+    def test_empty_text(self):
+        assert markdown_format("") == ""
+        assert markdown_format(None) == ""
+
+    def test_converter_is_reused(self):
+        """Test the converter is built once per thread and reset between documents."""
+        with patch('travel_app.templatetags.markdown_extras.markdown.Markdown',
+                   wraps=markdown_extras.markdown.Markdown) as markdown_cls:
+            markdown_extras._converters.__dict__.clear()
+            first = render_markdown("[^1]: first footnote\n\nSee this[^1]")
+            second = render_markdown("Plain paragraph")
+
+        assert markdown_cls.call_count == 1
+        assert "footnote" in first
+        # State from the previous document does not leak into the next one
+        assert "footnote" not in second
+
+    def test_html_is_cached_by_content(self):
+        """Test identical content is only parsed once."""
+        with patch.object(markdown_extras, '_get_converter', wraps=markdown_extras._get_converter) as get_converter:
+            first = render_markdown("# Tokyo")
+            second = render_markdown("# Tokyo")
+
+        assert first == second == "<h1>Tokyo</h1>"
+        get_converter.assert_called_once()
@@ -0,0 +1,74 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+from core.llm_service import get_travel_guidance
+from travel_app.templatetags.markdown_extras import render_markdown
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _mock_chat_response(text, input_tokens=12, output_tokens=34):
+    mock_response = Mock()
+    mock_response.message.content = [Mock(text=text)]
+    mock_response.usage.tokens.input_tokens = input_tokens
+    mock_response.usage.tokens.output_tokens = output_tokens
+    return mock_response
+
+
+class TestLLMMetrics:
+    """Test instrumentation of the chat call and caches."""
+
+    @patch('core.llm_service.co_v2')
+    def test_chat_latency_tokens_and_cache(self, mock_client):
+        mock_client.chat.return_value = _mock_chat_response("Visit Porto.")
+        calls = _sample('llm_call_duration_seconds_count', backend='command-a', operation='chat', outcome='success')
+        input_tokens = _sample('llm_tokens_total', direction='input')
+        hits = _sample('cache_requests_total', cache='llm_responses', result='hit')
+
+        get_travel_guidance("Where should I go in Portugal?")
+        get_travel_guidance("Where should I go in Portugal?")
+
+        assert _sample('llm_call_duration_seconds_count', backend='command-a', operation='chat', outcome='success') == calls + 1
+        assert _sample('llm_tokens_total', direction='input') == input_tokens + 12
+        assert _sample('cache_requests_total', cache='llm_responses', result='hit') == hits + 1
+        assert _sample('llm_calls_in_flight') == 0
+
+    @patch('core.llm_service.co_v2')
+    def test_chat_errors_by_type(self, mock_client):
+        mock_client.chat.side_effect = ValueError("bad request")
+        errors = _sample('llm_call_errors_total', backend='command-a', operation='chat', error='ValueError')
+
+        get_travel_guidance("Where should I go in Portugal?")
+
+        assert _sample('llm_call_errors_total', backend='command-a', operation='chat', error='ValueError') == errors + 1
+
+    def test_markdown_render_time(self):
+        renders = _sample('markdown_render_duration_seconds_count')
+
+        render_markdown("**Lisbon** and _Porto_")
+        render_markdown("**Lisbon** and _Porto_")
+
+        assert _sample('markdown_render_duration_seconds_count') == renders + 1
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+    """Test the Prometheus scrape endpoint."""
+
+    @patch('travel_app.views.get_travel_guidance')
+    def test_exposes_request_and_session_metrics(self, mock_service, client):
+        mock_service.return_value = ("Visit the Louvre.", [])
+        client.post('/', {'user_message': 'Paris?'}, HTTP_HX_REQUEST='true')
+
+        response = client.get('/api/metrics/')
+
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        body = response.content.decode()
+        assert 'session_size_bytes_count' in body
+        assert 'http_request_duration_seconds_count{method="POST",status="200",view="travel-guidance"}' in body
+        assert 'http_requests_in_flight{view="api-1.0.0:metrics"} 1.0' in body
@@ -0,0 +1,246 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from core.llm_service import (
+    aget_travel_guidance,
+    get_travel_guidance,
+    stream_travel_guidance,
+)
+from core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientCaller,
+    is_retryable,
+    resilient_chat,
+)
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def _mock_chat_response(text):
+    mock_response = Mock()
+    mock_response.message.content = [Mock(text=text)]
+    return mock_response
+
+
+@pytest.fixture(autouse=True)
+def fast_policy(settings):
+    settings.LLM_RETRY_ATTEMPTS = 3
+    settings.LLM_RETRY_BASE_DELAY = 0
+    settings.LLM_CIRCUIT_FAILURE_THRESHOLD = 3
+    settings.LLM_CIRCUIT_RESET_TIMEOUT = 30
+    settings.LLM_HEDGE_ENABLED = False
+
+
+class TestIsRetryable:
+    """Test classification of transient errors."""
+
+    def test_transient_errors(self):
+        assert is_retryable(TimeoutError())
+        assert is_retryable(ConnectionError())
+        assert is_retryable(UpstreamError(429))
+        assert is_retryable(UpstreamError(503))
+
+    def test_permanent_errors(self):
+        assert not is_retryable(UpstreamError(400))
+        assert not is_retryable(ValueError("bad request"))
+
+
+class TestResilientCaller:
+    """Test retries, circuit breaking and hedging."""
+
+    def test_retries_transient_errors_then_succeeds(self):
+        caller = ResilientCaller()
+        fn = Mock(side_effect=[UpstreamError(503), TimeoutError(), "ok"])
+
+        assert caller.call(fn) == "ok"
+        assert fn.call_count == 3
+        assert caller.stats()["retries"] == 2
+
+    def test_passes_attempt_deadline(self, settings):
+        settings.LLM_ATTEMPT_TIMEOUT = 12.5
+        fn = Mock(return_value="ok")
+
+        ResilientCaller().call(fn)
+
+        fn.assert_called_once_with(12.5)
+
+    def test_does_not_retry_permanent_errors(self):
+        caller = ResilientCaller()
+        fn = Mock(side_effect=UpstreamError(400))
+
+        with pytest.raises(UpstreamError):
+            caller.call(fn)
+        assert fn.call_count == 1
+
+    def test_gives_up_after_max_attempts(self):
+        caller = ResilientCaller()
+        fn = Mock(side_effect=UpstreamError(502))
+
+        with pytest.raises(UpstreamError):
+            caller.call(fn)
+        assert fn.call_count == 3
+
+    def test_async_retries_and_times_out_slow_attempts(self, settings):
+        settings.LLM_ATTEMPT_TIMEOUT = 0.05
+        caller = ResilientCaller()
+        calls = []
+
+        async def attempt(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                await asyncio.sleep(1)
+            return "ok"
+
+        assert asyncio.run(caller.acall(attempt)) == "ok"
+        assert len(calls) == 2
+
+    def test_hedges_slow_attempt(self, settings):
+        settings.LLM_HEDGE_ENABLED = True
+        settings.LLM_HEDGE_MIN_SAMPLES = 1
+        settings.LLM_HEDGE_MIN_DELAY = 0.01
+        caller = ResilientCaller()
+        caller.latency.record(0.01)
+        release = threading.Event()
+        calls = []
+
+        def fn(timeout):
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(2)
+                return "slow"
+            return "fast"
+
+        try:
+            assert caller.call(fn) == "fast"
+        finally:
+            release.set()
+        assert caller.stats()["hedges"] == 1
+
+    def test_async_hedge_cancels_loser(self, settings):
+        settings.LLM_HEDGE_ENABLED = True
+        settings.LLM_HEDGE_MIN_SAMPLES = 1
+        settings.LLM_HEDGE_MIN_DELAY = 0.01
+        caller = ResilientCaller()
+        caller.latency.record(0.01)
+        cancelled = []
+
+        async def attempt(timeout):
+            if not cancelled:
+                cancelled.append(False)
+                try:
+                    await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    cancelled[0] = True
+                    raise
+            return "fast"
+
+        assert asyncio.run(caller.acall(attempt)) == "fast"
+        assert cancelled == [True]
+
+
+class TestCircuitBreaker:
+    """Test the closed/open/half-open cycle."""
+
+    def test_opens_after_consecutive_failures_and_fails_fast(self):
+        caller = ResilientCaller()
+        fn = Mock(side_effect=UpstreamError(503))
+
+        with pytest.raises(UpstreamError):
+            caller.call(fn)
+        assert caller.breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            caller.call(fn)
+        assert fn.call_count == 3
+
+    def test_half_open_trial_closes_circuit(self, settings):
+        breaker = CircuitBreaker()
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        settings.LLM_CIRCUIT_RESET_TIMEOUT = 0
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        # Only one trial call is let through at a time
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_trial_reopens_circuit(self, settings):
+        settings.LLM_CIRCUIT_RESET_TIMEOUT = 0
+        breaker = CircuitBreaker()
+        for _ in range(3):
+            breaker.record_failure()
+        breaker.before_call()
+
+        breaker.record_failure()
+
+        assert breaker.state == CircuitBreaker.OPEN
+
+    def test_cancelled_trial_releases_circuit(self, settings):
+        """Test a half-open trial cancelled mid-call lets the next trial through."""
+        caller = ResilientCaller()
+        for _ in range(3):
+            caller.breaker.record_failure()
+        settings.LLM_CIRCUIT_RESET_TIMEOUT = 0
+
+        async def hang(timeout):
+            await asyncio.sleep(10)
+
+        async def cancel_trial():
+            task = asyncio.ensure_future(caller.acall(hang))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_trial())
+
+        assert caller.call(Mock(return_value="ok")) == "ok"
+        assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+class TestLLMServiceResilience:
+    """Test the resilience policy around the Cohere chat call."""
+
+    @patch('core.llm_service.co_v2')
+    def test_retries_transient_chat_errors(self, mock_client):
+        mock_client.chat.side_effect = [UpstreamError(429), _mock_chat_response("Visit Lisbon.")]
+
+        response, _ = get_travel_guidance("Where should I go in spring?")
+
+        assert response == "Visit Lisbon."
+        assert mock_client.chat.call_count == 2
+        assert mock_client.chat.call_args.kwargs["request_options"]["max_retries"] == 0
+
+    @patch('core.llm_service.co_v2_async')
+    def test_async_open_circuit_returns_error(self, mock_client):
+        mock_client.chat = AsyncMock(side_effect=UpstreamError(503))
+        asyncio.run(aget_travel_guidance("Where should I go in spring?"))
+
+        response, _ = asyncio.run(aget_travel_guidance("Where should I go in autumn?"))
+
+        assert "temporarily unavailable" in response
+        assert mock_client.chat.call_count == 3
+        assert resilient_chat.stats()["circuit_state"] == CircuitBreaker.OPEN
+
+    @patch('core.llm_service.co_v2')
+    def test_stream_fails_fast_while_circuit_open(self, mock_client):
+        for _ in range(3):
+            resilient_chat.breaker.record_failure()
+
+        events = list(stream_travel_guidance("Where should I go in spring?"))
+
+        assert events[-1]["type"] == "error"
+        mock_client.chat_stream.assert_not_called()
@@ -0,0 +1,185 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock, patch
+
+import numpy as np
+import pytest
+
+from core.llm_service import SYSTEM_MESSAGE, aget_travel_guidance, get_travel_guidance
+from core.semantic_cache import HashingEmbedder, SemanticIndex, semantic_cache
+
+
+def _mock_chat_response(text):
+    mock_response = Mock()
+    mock_response.message.content = [Mock(text=text)]
+    return mock_response
+
+
+class TestHashingEmbedder:
+    """Test the offline hashing embedder."""
+
+    def test_embeddings_are_unit_length_and_deterministic(self):
+        """Test vectors are normalized and stable between calls."""
+        embedder = HashingEmbedder(dim=256)
+        vectors = embedder.embed(["Top sights in Paris", "Top sights in Paris", ""])
+        assert vectors.shape == (3, 256)
+        assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+        assert np.array_equal(vectors[0], vectors[1])
+        assert not vectors[2].any()
+
+    def test_paraphrases_score_higher_than_unrelated(self):
+        """Test paraphrased questions are closer than unrelated ones."""
+        embedder = HashingEmbedder()
+        a, b, c = embedder.embed([
+            "What are the top sights in Paris?",
+            "Which sights in Paris should I see?",
+            "Best ramen restaurants in Tokyo",
+        ])
+        assert a @ b > a @ c
+
+
+class TestSemanticIndex:
+    """Test the NumPy-backed vector index."""
+
+    def test_batched_search_returns_nearest(self):
+        """Test each query is matched to its nearest stored vector."""
+        index = SemanticIndex(dim=2, capacity=4)
+        index.add(np.array([1.0, 0.0], dtype=np.float32), "east")
+        index.add(np.array([0.0, 1.0], dtype=np.float32), "north")
+
+        indices, scores = index.search(np.array([[0.0, 1.0], [0.8, 0.6]], dtype=np.float32))
+
+        assert [index.answers[i] for i in indices] == ["north", "east"]
+        assert np.allclose(scores, [1.0, 0.8])
+
+    def test_capacity_overwrites_oldest(self):
+        """Test the oldest entries are replaced once the index is full."""
+        index = SemanticIndex(dim=2, capacity=2)
+        for answer in ["first", "second", "third"]:
+            index.add(np.array([1.0, 0.0], dtype=np.float32), answer)
+        assert index.size == 2
+        assert sorted(index.answers) == ["second", "third"]
+
+    def test_save_and_load_round_trip(self, tmp_path):
+        """Test the index persists to disk and loads back."""
+        path = tmp_path / "semantic-index.npz"
+        index = SemanticIndex(dim=2, capacity=4)
+        index.add(np.array([1.0, 0.0], dtype=np.float32), "east")
+        index.save(path)
+
+        restored = SemanticIndex(dim=2, capacity=4)
+        restored.load(path)
+
+        assert restored.size == 1
+        assert restored.answers[0] == "east"
+        assert np.array_equal(restored.vectors[0], index.vectors[0])
+
+    def test_failed_save_keeps_previous_index(self, tmp_path):
+        """Test a save interrupted mid-write leaves the last complete index in place."""
+        path = tmp_path / "semantic-index.npz"
+        index = SemanticIndex(dim=2, capacity=4)
+        index.add(np.array([1.0, 0.0], dtype=np.float32), "east")
+        index.save(path)
+
+        index.add(np.array([0.0, 1.0], dtype=np.float32), "north")
+        with patch("core.semantic_cache.np.savez", side_effect=OSError("disk full")), pytest.raises(OSError):
+            index.save(path)
+
+        restored = SemanticIndex(dim=2, capacity=4)
+        restored.load(path)
+        assert restored.answers[:restored.size] == ["east"]
+        assert [p.name for p in tmp_path.iterdir()] == ["semantic-index.npz"]
+
+
+class TestSemanticCachedTravelGuidance:
+    """Test the semantic cache integration in the LLM service."""
+
+    @pytest.fixture(autouse=True)
+    def enable_semantic_cache(self, settings):
+        settings.LLM_SEMANTIC_CACHE_ENABLED = True
+        settings.LLM_SEMANTIC_CACHE_THRESHOLD = 0.6
+
+    @patch('core.llm_service.co_v2')
+    def test_paraphrased_first_turn_reuses_answer(self, mock_client):
+        """Test a near-duplicate first-turn question is answered from the semantic cache."""
+        mock_client.chat.return_value = _mock_chat_response("See the Eiffel Tower and the Louvre.")
+
+        get_travel_guidance("What are the top sights in Paris?")
+        response, messages = get_travel_guidance("Top sights in Paris please")
+
+        assert response == "See the Eiffel Tower and the Louvre."
+        assert messages[-1]["content"] == response
+        mock_client.chat.assert_called_once()
+        assert semantic_cache.stats()["hits"] == 1
+
+    @patch('core.llm_service.co_v2')
+    def test_unrelated_question_misses(self, mock_client):
+        """Test questions below the similarity threshold go to the LLM."""
+        mock_client.chat.side_effect = [
+            _mock_chat_response("See the Eiffel Tower."),
+            _mock_chat_response("Try Ichiran ramen."),
+        ]
+
+        get_travel_guidance("What are the top sights in Paris?")
+        response, _ = get_travel_guidance("Best ramen restaurants in Tokyo")
+
+        assert response == "Try Ichiran ramen."
+        assert mock_client.chat.call_count == 2
+
+    @patch('core.llm_service.co_v2')
+    def test_follow_up_questions_are_not_semantically_cached(self, mock_client):
+        """Test only first-turn questions use the semantic cache."""
+        mock_client.chat.side_effect = [
+            _mock_chat_response("See the Eiffel Tower."),
+            _mock_chat_response("Le Comptoir is great."),
+        ]
+        history = [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": "Tell me about Lyon"},
+            {"role": "assistant", "content": "Lyon is lovely."},
+        ]
+
+        get_travel_guidance("What are the top sights in Paris?")
+        response, _ = get_travel_guidance("Top sights in Paris please", history)
+
+        assert response == "Le Comptoir is great."
+        assert mock_client.chat.call_count == 2
+
+    @patch('core.llm_service.co_v2')
+    def test_index_persists_to_configured_path(self, mock_client, tmp_path, settings):
+        """Test the index is written to disk once the persist interval is reached."""
+        mock_client.chat.return_value = _mock_chat_response("See the Eiffel Tower.")
+        path = tmp_path / "semantic-index.npz"
+        settings.LLM_SEMANTIC_CACHE_PATH = str(path)
+        settings.LLM_SEMANTIC_CACHE_PERSIST_EVERY = 1
+
+        get_travel_guidance("What are the top sights in Paris?")
+        assert path.exists()
+
+        semantic_cache.clear()
+        response, _ = get_travel_guidance("Top sights in Paris please")
+
+        assert response == "See the Eiffel Tower."
+        mock_client.chat.assert_called_once()
+
+    @patch('core.llm_service.co_v2_async')
+    def test_async_paths_embed_off_the_event_loop(self, mock_client):
+        """Test async lookups and stores never embed on the event loop thread."""
+        mock_client.chat = AsyncMock(return_value=_mock_chat_response("See the Eiffel Tower."))
+        threads = set()
+        embed = HashingEmbedder.embed
+
+        def tracking_embed(self, texts):
+            threads.add(threading.get_ident())
+            return embed(self, texts)
+
+        async def ask_twice():
+            await aget_travel_guidance("What are the top sights in Paris?")
+            response, _ = await aget_travel_guidance("Top sights in Paris please")
+            return response, threading.get_ident()
+
+        with patch.object(HashingEmbedder, "embed", tracking_embed):
+            response, loop_thread = asyncio.run(ask_twice())
+
+        assert response == "See the Eiffel Tower."
+        assert threads and loop_thread not in threads
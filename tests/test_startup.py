@@ -0,0 +1,48 @@
+from unittest.mock import patch
+
+from django.template import engines
+
+from core import startup
+
+
+class TestWarmUp:
+    """Test the startup warm-up routine."""
+
+    @patch('core.client.preconnect', return_value=True)
+    @patch('core.client.get_client')
+    def test_runs_every_step(self, mock_get_client, mock_preconnect):
+        report = startup.warm_up()
+
+        assert list(report) == ["imports", "urlconf", "templates", "markdown", "llm_client", "domain_filter", "preconnect"]
+        mock_get_client.assert_called_once()
+        mock_preconnect.assert_called_once()
+        assert startup.timings["templates"] == report["templates"]
+
+    @patch('core.client.get_client')
+    def test_templates_are_compiled_into_cached_loader(self, mock_get_client):
+        startup.warm_up(connect=False)
+
+        cached_loader = engines['django'].engine.template_loaders[0]
+        assert "travel_app/travel_guidance.html" in " ".join(cached_loader.get_template_cache)
+
+    def test_failing_step_does_not_raise(self):
+        with patch('core.startup._build_llm_client', side_effect=RuntimeError("no API key")):
+            report = startup.warm_up(connect=False)
+
+        assert "llm_client" in report
+        assert "preconnect" not in report
+
+    def test_disabled(self, settings):
+        settings.STARTUP_WARM_UP = False
+
+        assert startup.warm_up() == {}
+
+    def test_preconnect_disabled(self, settings):
+        settings.STARTUP_PRECONNECT = False
+
+        with patch('core.client.preconnect') as preconnect:
+            assert startup.preconnect() == {}
+        preconnect.assert_not_called()
+
+    def test_format_timings(self):
+        assert startup.format_timings({"imports": 0.4123, "templates": 0.009}) == "imports=412ms, templates=9ms"
@@ -0,0 +1,39 @@
+import asyncio
+import logging
+
+from django.core.handlers.asgi import ASGIHandler
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core.staticfiles import AsyncWhiteNoiseMiddleware
+
+
+class TestAsyncWhiteNoiseMiddleware:
+    """Test static files are served without forcing the ASGI chain through threads."""
+
+    def test_no_middleware_is_adapted_under_asgi(self, settings, caplog):
+        # Django only logs adaptations in debug mode
+        settings.DEBUG = True
+        with caplog.at_level(logging.DEBUG, logger="django.request"):
+            ASGIHandler()
+
+        assert [r.getMessage() for r in caplog.records if "adapted" in r.getMessage()] == []
+
+    def test_serves_static_files_and_passes_other_requests_through(self, settings, tmp_path):
+        (tmp_path / "app.css").write_text("body { margin: 0 }")
+        settings.STATIC_ROOT = tmp_path
+        settings.WHITENOISE_AUTOREFRESH = False
+
+        async def get_response(request):
+            return HttpResponse("view")
+
+        middleware = AsyncWhiteNoiseMiddleware(get_response)
+
+        async def fetch(path):
+            response = await middleware(RequestFactory().get(path))
+            if response.streaming:
+                return b"".join(response.streaming_content)
+            return response.content
+
+        assert asyncio.run(fetch("/static/app.css")) == b"body { margin: 0 }"
+        assert asyncio.run(fetch("/")) == b"view"
@@ -1,7 +1,42 @@
+import asyncio
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pytest
 from django.http import HttpResponse
+from django.test import Client
 from unittest.mock import patch
+from core.conversation_store import ConversationStore, conversation_store
 from core.llm_service import SYSTEM_MESSAGE
+from travel_app.views import park_stream, pending_stream
+
+
+def consume(streaming_content) -> bytes:
+    """Read an async streaming response body to the end."""
+    async def read():
+        return b"".join([chunk async for chunk in streaming_content])
+    return asyncio.run(read())
+
+
+def fake_stream(*events):
+    """Stand-in for `astream_travel_guidance` yielding `events`."""
+    async def stream(user_message, messages=None):
+        for event in events:
+            yield event
+    return stream
+
+
+def seed_conversation(session, pairs):
+    """Store (user message, AI response) pairs and point the session at the conversation."""
+    conversation_id = conversation_store.new_id()
+    for user_message, ai_response in pairs:
+        conversation_store.append(conversation_id, [
+            {"role": "user", "content": user_message},
+            {"role": "assistant", "content": ai_response},
+        ])
+    session['conversation_id'] = conversation_id
+    return conversation_id
 
 
 @pytest.mark.django_db
@@ -64,12 +99,9 @@ class TestTravelGuidanceView:
         
         # Set up session with conversation history
         session = client.session
-        session['conversation_history'] = [
-            {
-                'user_message': 'What are the best places to visit in Tokyo?',
-                'ai_response': 'Here are some great places...'
-            }
-        ]
+        seed_conversation(session, [
+            ('What are the best places to visit in Tokyo?', 'Here are some great places...')
+        ])
         session.save()
         
         response = client.post('/', {
@@ -106,4 +138,290 @@ class TestTravelGuidanceView:
         assert response.status_code == 200
         mock_service.assert_called_once_with('', None)
         mock_render.assert_called_once()
-    
\ No newline at end of file
+    
+    @patch('travel_app.views.get_travel_guidance')
+    def test_htmx_post_renders_markdown_partial(self, mock_service, client):
+        """Test HTMX POST returns the conversation pair with markdown rendered to HTML."""
+        mock_service.return_value = ("Visit **Kyoto** in spring.", [])
+
+        response = client.post('/', {'user_message': 'When to visit Japan?'}, HTTP_HX_REQUEST='true')
+
+        assert response.status_code == 200
+        content = response.content.decode()
+        assert 'When to visit Japan?' in content
+        assert '<strong>Kyoto</strong>' in content
+        assert conversation_store.get(client.session['conversation_id']) == [
+            {'role': 'user', 'content': 'When to visit Japan?'},
+            {'role': 'assistant', 'content': 'Visit **Kyoto** in spring.'},
+        ]
+
+
+@pytest.mark.django_db
+class TestTravelGuidanceStreamView:
+    """Test cases for the streaming HTMX conversation flow."""
+
+    def test_post_returns_user_bubble_and_registers_stream(self, client):
+        """Test POST renders the user query immediately and parks it for the event stream."""
+        response = client.post('/stream/', {
+            'user_message': 'What are the best places to visit in Tokyo?'
+        }, HTTP_HX_REQUEST='true')
+
+        assert response.status_code == 200
+        content = response.content.decode()
+        assert 'What are the best places to visit in Tokyo?' in content
+
+        stream_id = re.search(r'/stream/([0-9a-f]+)/', content).group(1)
+        pending = pending_stream(client.session, stream_id)
+        assert pending['user_message'] == 'What are the best places to visit in Tokyo?'
+        assert pending['conversation_id'] == client.session['conversation_id']
+
+    @pytest.mark.django_db(transaction=True)
+    @patch('travel_app.views.astream_travel_guidance')
+    def test_stream_events_emits_deltas_and_persists_pair(self, mock_stream, client):
+        """Test the event stream relays deltas, renders markdown and saves the pair."""
+        mock_stream.side_effect = fake_stream(
+            {"type": "delta", "text": "**Kyoto** "},
+            {"type": "delta", "text": "is lovely."},
+            {"type": "done", "response": "**Kyoto** is lovely.", "messages": []},
+        )
+
+        session = client.session
+        conversation_id = seed_conversation(session, [('Tell me about Japan', 'Japan is great...')])
+        session.save()
+        stream_id = park_stream(session, conversation_id, 'What about Kyoto?')
+
+        response = client.get(f'/stream/{stream_id}/')
+        body = consume(response.streaming_content).decode()
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'text/event-stream'
+        mock_stream.assert_called_once_with('What about Kyoto?', [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": "Tell me about Japan"},
+            {"role": "assistant", "content": "Japan is great..."},
+        ])
+
+        frames = [frame for frame in body.split("\n\n") if frame]
+        assert frames[0] == 'event: delta\ndata: {"text": "**Kyoto** "}'
+        assert frames[-1].startswith('event: done\ndata: ')
+        done_data = json.loads(frames[-1].split('data: ', 1)[1])
+        assert '<strong>Kyoto</strong>' in done_data['html']
+
+        session = client.session
+        assert session['conversation_id'] == conversation_id
+        assert conversation_store.get_turns(conversation_id, 1) == [[
+            {'role': 'user', 'content': 'What about Kyoto?'},
+            {'role': 'assistant', 'content': '**Kyoto** is lovely.'},
+        ]]
+        assert pending_stream(session, stream_id) is None
+
+    def test_stream_events_unknown_stream_returns_404(self, client):
+        """Test requesting an unknown stream id returns 404."""
+        response = client.get('/stream/does-not-exist/')
+
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_stream_events_are_sent_incrementally_over_asgi(self, async_client):
+        """Test the first event reaches an ASGI client before the LLM has finished answering."""
+        async def exercise():
+            release, finished = asyncio.Event(), asyncio.Event()
+
+            async def slow_stream(user_message, messages=None):
+                yield {"type": "delta", "text": "Kyoto "}
+                await release.wait()
+                finished.set()
+                yield {"type": "done", "response": "Kyoto is lovely.", "messages": []}
+
+            content = (await async_client.post('/stream/', {'user_message': 'Kyoto?'})).content.decode()
+            stream_url = re.search(r'/stream/[0-9a-f]+/', content).group(0)
+            with patch('travel_app.views.astream_travel_guidance', side_effect=slow_stream):
+                response = await async_client.get(stream_url)
+                chunks = aiter(response.streaming_content)
+                first = await asyncio.wait_for(anext(chunks), timeout=5)
+                assert not finished.is_set()
+                release.set()
+                rest = b"".join([chunk async for chunk in chunks])
+            return first, rest
+
+        first, rest = asyncio.run(exercise())
+
+        assert first == b'event: delta\ndata: {"text": "Kyoto "}\n\n'
+        assert rest.startswith(b'event: done\ndata: ')
+
+
+@pytest.mark.django_db
+class TestConversationHistoryPagination:
+    """Test cases for the lazily loaded conversation history."""
+
+    @pytest.fixture
+    def long_history(self, client, settings):
+        settings.CONVERSATION_PAGE_SIZE = 10
+        session = client.session
+        seed_conversation(session, [(f'Question {i}', f'Answer **{i}**') for i in range(25)])
+        session.save()
+
+    def test_get_renders_only_latest_page(self, client, long_history):
+        """Test the full page renders the newest pairs and a sentinel for older ones."""
+        response = client.get('/')
+
+        content = response.content.decode()
+        assert response.status_code == 200
+        assert 'Question 24' in content
+        assert 'Question 15' in content
+        assert 'Question 14\n' not in content
+        assert '<strong>24</strong>' in content
+        assert '/history/?before=15' in content
+
+    def test_history_endpoint_returns_previous_page(self, client, long_history):
+        """Test the cursor selects the page just before it, with a sentinel for the next one."""
+        response = client.get('/history/', {'before': 15})
+
+        content = response.content.decode()
+        assert response.status_code == 200
+        assert 'Question 5\n' in content
+        assert 'Question 14\n' in content
+        assert 'Question 15\n' not in content
+        assert '/history/?before=5' in content
+
+    def test_history_endpoint_last_page_has_no_sentinel(self, client, long_history):
+        """Test the oldest page does not request any further pages."""
+        response = client.get('/history/', {'before': 5})
+
+        content = response.content.decode()
+        assert 'Question 0\n' in content
+        assert 'Question 4\n' in content
+        assert '/history/?before=' not in content
+
+    def test_history_endpoint_invalid_cursor(self, client):
+        """Test a missing or invalid cursor is rejected."""
+        assert client.get('/history/').status_code == 400
+        assert client.get('/history/', {'before': 'abc'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestConversationList:
+    """Test cases for the logged-in user's conversation list."""
+
+    @pytest.fixture
+    def traveller(self, client, django_user_model):
+        user = django_user_model.objects.create_user(username='traveller', password='secret')
+        client.force_login(user)
+        return user
+
+    def test_lists_own_conversations_by_cursor(self, client, traveller, settings):
+        settings.CONVERSATION_LIST_PAGE_SIZE = 2
+        for city in ('Lisbon', 'Porto', 'Seville'):
+            conversation_store.append(conversation_store.new_id(), [
+                {'role': 'user', 'content': f'{city}?'}, {'role': 'assistant', 'content': 'Sure.'}
+            ], user=traveller)
+
+        first = client.get('/conversations/').content.decode()
+        assert 'Seville?' in first and 'Porto?' in first and 'Lisbon?' not in first
+        assert '/conversations/?before=' in first
+
+        cursor = first.split('/conversations/?before=')[1].split('"')[0]
+        rest = client.get('/conversations/', {'before': cursor}).content.decode()
+        assert 'Lisbon?' in rest
+        assert '/conversations/?before=' not in rest
+        assert client.get('/conversations/', {'before': 'garbage'}).status_code == 400
+
+    def test_reopen_conversation(self, client, traveller):
+        conversation_id = conversation_store.new_id()
+        conversation_store.append(conversation_id, [
+            {'role': 'user', 'content': 'Lisbon?'}, {'role': 'assistant', 'content': 'Visit Alfama.'}
+        ], user=traveller)
+
+        response = client.get('/', {'conversation': conversation_id})
+
+        assert 'Visit Alfama.' in response.content.decode()
+        assert client.session['conversation_id'] == conversation_id
+
+    def test_cannot_reopen_another_users_conversation(self, client, traveller, django_user_model):
+        other = django_user_model.objects.create_user(username='other', password='secret')
+        conversation_id = conversation_store.new_id()
+        conversation_store.append(conversation_id, [
+            {'role': 'user', 'content': 'Lisbon?'}, {'role': 'assistant', 'content': 'Visit Alfama.'}
+        ], user=other)
+
+        response = client.get('/', {'conversation': conversation_id})
+
+        assert 'Visit Alfama.' not in response.content.decode()
+        assert client.session.get('conversation_id') != conversation_id
+
+    @patch('travel_app.views.get_travel_guidance')
+    def test_new_conversation_is_owned_by_user(self, mock_service, client, traveller):
+        mock_service.return_value = ('Visit Alfama.', [])
+
+        client.post('/', {'user_message': 'Lisbon?'}, headers={'HX-Request': 'true'})
+
+        page, _ = conversation_store.list_conversations(traveller)
+        assert [c.title for c in page] == ['Lisbon?']
+
+
+class TestConcurrentTurns:
+    """
+    Test parallel posts from one session all keep their turn.
+    The views run against the cache store: the in-memory SQLite test database fails concurrent
+    writers with "table is locked" instead of making them wait like a real database.
+    """
+
+    posts = 6
+
+    @pytest.fixture(autouse=True)
+    def store(self):
+        store = ConversationStore()
+        with patch('travel_app.views.conversation_store', store):
+            yield store
+
+    def _fire(self, client, send):
+        """Send `posts` requests at once with the session cookie, holding every LLM call until all have read the history."""
+        barrier = threading.Barrier(self.posts, timeout=10)
+
+        def answer(user_message, messages=None):
+            barrier.wait()
+            return f'Answer to {user_message}', []
+
+        def post(i):
+            thread_client = Client()
+            thread_client.cookies = client.cookies
+            send(thread_client, f'Question {i}')
+
+        with patch('travel_app.views.get_travel_guidance', side_effect=answer), \
+                patch('travel_app.views.astream_travel_guidance',
+                      side_effect=lambda m, messages=None: fake_stream({'type': 'done', 'response': answer(m)[0]})(m)), \
+                ThreadPoolExecutor(self.posts) as pool:
+            # Collecting the results re-raises any request's error in the test thread
+            list(pool.map(post, range(self.posts)))
+
+    def _stored_questions(self, client, store):
+        turns = store.get(client.session['conversation_id'])
+        return sorted(message['content'] for message in turns if message['role'] == 'user')
+
+    def test_parallel_first_posts_share_one_conversation(self, client, store):
+        client.session.save()
+
+        self._fire(client, lambda c, message: c.post('/', {'user_message': message}, HTTP_HX_REQUEST='true'))
+
+        assert self._stored_questions(client, store) == [f'Question {i}' for i in range(self.posts)]
+
+    def test_parallel_streamed_posts_keep_every_turn(self, client, store):
+        session = client.session
+        session['conversation_id'] = store.new_id()
+        store.append(session['conversation_id'], [
+            {'role': 'user', 'content': 'Tell me about Japan'}, {'role': 'assistant', 'content': 'Japan is great...'}
+        ])
+        session.save()
+
+        def send(thread_client, message):
+            content = thread_client.post('/stream/', {'user_message': message}, HTTP_HX_REQUEST='true').content.decode()
+            stream_url = re.search(r'/stream/[0-9a-f]+/', content).group(0)
+            response = thread_client.get(stream_url)
+            assert response.status_code == 200
+            consume(response.streaming_content)
+
+        self._fire(client, send)
+
+        assert self._stored_questions(client, store) == sorted(
+            ['Tell me about Japan'] + [f'Question {i}' for i in range(self.posts)]
+        )
@@ -0,0 +1,36 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import job_pool
+
+
+class Command(BaseCommand):
+    help = "Run background travel guidance jobs from the database queue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=getattr(settings, 'JOB_WORKERS', 4),
+            help="Number of worker threads (default: JOB_WORKERS)",
+        )
+        parser.add_argument("--once", action="store_true", help="Run queued jobs until the queue is empty, then exit")
+
+    def handle(self, *args, workers, once, **options):
+        if once:
+            while job_pool.run_once():
+                pass
+            self.stdout.write(f"Processed {job_pool.stats()['processed']} jobs")
+            return
+
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+        job_pool.start(workers)
+        self.stdout.write(f"Running {workers} job workers")
+        try:
+            stopped.wait()
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write("Stopping job workers after their current jobs")
+        job_pool.stop()
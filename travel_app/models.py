@@ -1,6 +1,98 @@
+import uuid
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser  # new 
 from django.db import models
+from django.utils import timezone
 
 # new
 class User(AbstractUser):
     pass
+
+
+class Conversation(models.Model):
+    """
+    A persistent conversation, optionally owned by a user (see core.conversation_store).
+    The title and turn count are kept on the row so listing conversations never touches turns.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE, related_name="conversations"
+    )
+    title = models.CharField(max_length=200, blank=True)
+    turn_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = (
+            # A user's latest conversations, paginated by the (updated_at, id) keyset
+            models.Index(fields=["user", "-updated_at", "-id"]),
+        )
+
+    def __str__(self):
+        return self.title or str(self.id)
+
+
+class Turn(models.Model):
+    """
+    One exchange of a conversation (e.g. a user message and the assistant reply), stored as
+    zlib-compressed JSON. `index` is the turn's position in its conversation.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="turns")
+    index = models.PositiveIntegerField()
+    messages = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = (
+            # Also the index for reading a conversation's turns in order, a page at a time
+            models.UniqueConstraint(fields=["conversation", "index"], name="unique_turn_index"),
+        )
+
+    def __str__(self):
+        return f"{self.conversation_id}#{self.index}"
+
+
+class GuidanceJob(models.Model):
+    """
+    A travel guidance request run in the background by the job worker pool (see core.jobs).
+    The row is the queue entry, the lock and the result store.
+    """
+    class Status(models.TextChoices):
+        QUEUED = "queued"
+        RUNNING = "running"
+        SUCCEEDED = "succeeded"
+        FAILED = "failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.QUEUED)
+    user_message = models.TextField()
+    messages = models.JSONField(null=True, blank=True)
+    bypass_cache = models.BooleanField(default=False)
+    webhook_url = models.URLField(max_length=2000, blank=True)
+
+    response = models.TextField(blank=True)
+    result_messages = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=64, blank=True)
+
+    webhook_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    webhook_delivered_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = (
+            # Workers claim the oldest queued job and reclaim stale running ones
+            models.Index(fields=["status", "created_at"]),
+        )
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (self.Status.SUCCEEDED, self.Status.FAILED)
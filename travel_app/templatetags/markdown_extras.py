@@ -1,24 +1,63 @@
+import hashlib
+import threading
+import time
 from django import template
+from django.core.cache import caches
 from django.utils.safestring import mark_safe
 import markdown
+from core.metrics import markdown_render_duration, record_cache_lookup
 
 register = template.Library()
 
+# Markdown instances are not thread-safe, so each thread keeps its own preconfigured converters
+_converters = threading.local()
+
+
+def _get_converter(extensions: bool = True) -> markdown.Markdown:
+    """
+    Return this thread's preconfigured converter, reset for a new document.
+    """
+    name = 'extra' if extensions else 'basic'
+    md = getattr(_converters, name, None)
+    if md is None:
+        md = markdown.Markdown(extensions=['extra']) if extensions else markdown.Markdown()
+        setattr(_converters, name, md)
+    return md.reset()
+
+
+def _cache_key(text: str) -> str:
+    return f"markdown:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+def render_markdown(text: str) -> str:
+    """
+    Convert markdown text to HTML, rendering each distinct text only once.
+    Rendered HTML is cached keyed by a hash of the markdown source so later page loads
+    never re-parse the same message.
+    """
+    if not text:
+        return ""
+
+    html_cache = caches['rendered_markdown']
+    key = _cache_key(text)
+    html = html_cache.get(key)
+    record_cache_lookup('rendered_markdown', html is not None)
+    if html is None:
+        started = time.perf_counter()
+        # Configure markdown with basic extensions
+        try:
+            html = _get_converter().convert(text)
+        except Exception:
+            # Fallback to basic markdown if extensions fail
+            html = _get_converter(extensions=False).convert(text)
+        markdown_render_duration.observe(time.perf_counter() - started)
+        html_cache.set(key, html)
+    return mark_safe(html)
+
+
 @register.filter(name='markdown')
 def markdown_format(text):
     """
     Convert markdown text to HTML
     """
-    if not text:
-        return ""
-    
-    # Configure markdown with basic extensions
-    try:
-        md = markdown.Markdown(extensions=['extra'])
-        html = md.convert(text)
-        return mark_safe(html)
-    except Exception:
-        # Fallback to basic markdown if extensions fail
-        md = markdown.Markdown()
-        html = md.convert(text)
-        return mark_safe(html)
+    return render_markdown(text)
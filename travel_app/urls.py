@@ -3,5 +3,9 @@ from . import views
 
 urlpatterns = [
     path('', views.TravelGuidanceView.as_view(), name='travel-guidance'),
+    path('history/', views.ConversationHistoryView.as_view(), name='travel-guidance-history'),
+    path('conversations/', views.ConversationListView.as_view(), name='travel-guidance-conversations'),
+    path('stream/', views.TravelGuidanceStreamView.as_view(), name='travel-guidance-stream'),
+    path('stream/<str:stream_id>/', views.TravelGuidanceStreamEventsView.as_view(), name='travel-guidance-stream-events'),
 ]
 
@@ -1,8 +1,204 @@
+import uuid
+from django.conf import settings
+from django.core.cache import caches
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.views import View
-from core.llm_service import get_travel_guidance, SYSTEM_MESSAGE
+from core.admission import RateLimitExceeded, admit, client_identity, in_flight
+from core.conversation_store import conversation_store
+from core.idempotency import IdempotencyConflict, IdempotencyInProgress, idempotency, idempotency_key
+from core.llm_service import astream_travel_guidance, get_travel_guidance
+from core.metrics import aobserve_session, observe_session
+from core.streaming import format_sse_event
+from travel_app.templatetags.markdown_extras import render_markdown
+
+
+def build_llm_messages(conversation_id: str) -> list:
+    """
+    Load a stored conversation in the message format expected by the LLM.
+    Returns None for an empty history so the LLM service starts a new conversation.
+    """
+    turns = conversation_store.get(conversation_id) if conversation_id else None
+    if not turns:
+        return None
+    return conversation_store.to_llm_messages(turns)
+
+
+async def abuild_llm_messages(conversation_id: str) -> list:
+    """Async variant of `build_llm_messages`."""
+    turns = await conversation_store.aget(conversation_id) if conversation_id else None
+    if not turns:
+        return None
+    return conversation_store.to_llm_messages(turns)
+
+
+def paginate_history(conversation_id: str, before: int | None = None) -> dict:
+    """
+    Select a page of conversation pairs ending just before the `before` cursor.
+    The cursor is the index of the oldest pair already rendered, which is stable because
+    the history is append-only. The newest page is returned when no cursor is given, and
+    only the turns on the page are read from the store.
+    
+    Returns:
+        dict: Template context with the page of pairs and the cursor for older pairs
+    """
+    page_size = getattr(settings, 'CONVERSATION_PAGE_SIZE', 10)
+    length = (conversation_store.length(conversation_id) if conversation_id else None) or 0
+    end = length if before is None else max(0, min(before, length))
+    start = max(0, end - page_size)
+    turns = conversation_store.get_turns(conversation_id, start, end) if end > start else []
+    return {
+        'conversation_page': [
+            {'user_message': user['content'], 'ai_response': assistant['content']}
+            for user, assistant in turns
+        ],
+        'older_cursor': start,
+        'has_older': start > 0,
+    }
+
+
+def session_state():
+    """Cache shared by all workers for per-session state kept outside the session blob."""
+    return caches[getattr(settings, 'SESSION_CACHE_ALIAS', 'default')]
+
+
+def _allocation_key(session) -> str:
+    return f"session-conversation:{session.session_key}"
+
+
+def session_conversation_id(session) -> str:
+    """
+    Return the session's conversation ID, allocating one on first use.
+
+    Concurrent first requests of a session would otherwise each allocate an ID, and the last
+    session save would leave the other turns in a conversation nothing points at. The first ID
+    is claimed with an atomic cache `add`, so every request of the session agrees on it.
+    """
+    conversation_id = session.get('conversation_id')
+    if conversation_id is not None:
+        return conversation_id
+    if session.session_key is None:
+        session.save()
+    state, key = session_state(), _allocation_key(session)
+    state.add(key, conversation_store.new_id(), getattr(settings, 'SESSION_CONVERSATION_CLAIM_TTL', 300))
+    conversation_id = session['conversation_id'] = state.get(key)
+    return conversation_id
+
+
+def start_new_conversation(session):
+    """Point the session at a fresh conversation, replacing any claimed first ID."""
+    session.pop('conversation_id', None)
+    if session.session_key is not None:
+        session_state().delete(_allocation_key(session))
+
+
+def save_conversation_pair(conversation_id: str, user_message: str, response: str, user=None):
+    """
+    Append a pair to a conversation, creating the conversation on the first turn (owned by
+    `user` when logged in). Appends are atomic per conversation, so concurrent turns are all
+    kept and the session, which only holds the conversation ID, is never rewritten.
+    """
+    conversation_store.append(conversation_id, [
+        {'role': 'user', 'content': user_message},
+        {'role': 'assistant', 'content': response},
+    ], user=user)
+
+
+async def asave_conversation_pair(conversation_id: str, user_message: str, response: str, user=None):
+    """Async variant of `save_conversation_pair`."""
+    await conversation_store.aappend(conversation_id, [
+        {'role': 'user', 'content': user_message},
+        {'role': 'assistant', 'content': response},
+    ], user=user)
+
+
+def park_stream(session, conversation_id: str, user_message: str) -> str:
+    """
+    Park a message until its event stream picks it up.
+
+    Pending messages are cached under their own key rather than in the session, so concurrent
+    posts of one session cannot overwrite each other's pending message.
+
+    Returns:
+        str: Stream ID for the event stream URL
+    """
+    if session.session_key is None:
+        session.save()
+    stream_id = uuid.uuid4().hex
+    session_state().set(f"pending-stream:{stream_id}", {
+        'session_key': session.session_key,
+        'conversation_id': conversation_id,
+        'user_message': user_message,
+    }, getattr(settings, 'PENDING_STREAM_TTL', 300))
+    return stream_id
+
+
+def pending_stream(session, stream_id: str):
+    """Return a parked message of this session as a dict, or None if unknown or expired."""
+    pending = session_state().get(f"pending-stream:{stream_id}")
+    if pending is None or pending['session_key'] != session.session_key:
+        return None
+    return pending
+
+
+async def apending_stream(session, stream_id: str):
+    """Async variant of `pending_stream`."""
+    pending = await session_state().aget(f"pending-stream:{stream_id}")
+    if pending is None or pending['session_key'] != session.session_key:
+        return None
+    return pending
+
+
+async def adiscard_stream(stream_id: str):
+    """Forget a parked message once its answer is stored."""
+    await session_state().adelete(f"pending-stream:{stream_id}")
+
+
+def rate_limited_response(exc: RateLimitExceeded) -> HttpResponse:
+    """Build the 429 response for a request that was not admitted."""
+    response = HttpResponse(exc.detail, status=429, content_type='text/plain')
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def idempotency_error_response(exc: Exception) -> HttpResponse:
+    """Build the 409 (still running) or 422 (key reused) response for an idempotency key."""
+    if isinstance(exc, IdempotencyInProgress):
+        response = HttpResponse(exc.detail, status=409, content_type='text/plain')
+        response['Retry-After'] = str(exc.retry_after)
+        return response
+    return HttpResponse(exc.detail, status=422, content_type='text/plain')
+
+
+def run_idempotent(request, scope: str, user_message: str, fn, store=None) -> tuple:
+    """
+    Run `fn()` once per form idempotency key, replaying its result to retries of the submit.
+    Keys are scoped per view and client, so another session sending the same key and message
+    never gets this client's answer. The first submit of a conversation has no session yet,
+    so it is created here and the response's cookie carries it to the retry.
+
+    Returns:
+        tuple: (result, replayed)
+    """
+    key = idempotency_key(request)
+    if not key:
+        return fn(), False
+    if request.session.session_key is None:
+        request.session.save()
+    scope = f"{scope}:{client_identity(request)}"
+    return idempotency.run(scope, key, idempotency.fingerprint(user_message), fn, store=store)
+
+
+def history_page_context(conversation_id: str, **extra) -> dict:
+    """Build the full page context - only the most recent pairs are rendered up front."""
+    page = paginate_history(conversation_id)
+    return {
+        **page,
+        'has_conversation': bool(page['conversation_page']),
+        **extra,
+    }
 
 
 class TravelGuidanceView(View):
@@ -15,40 +211,34 @@ class TravelGuidanceView(View):
         """Handle GET requests - show the form"""
         # Check if restart parameter is present - otherwise a refresh after a conversation will maintain the conversation history
         if request.GET.get('restart') == 'true':
-            request.session.pop('conversation_history', None)
+            start_new_conversation(request.session)
+        # Reopen a conversation picked from the conversation list
+        conversation_id = request.GET.get('conversation')
+        if conversation_id and conversation_store.length(conversation_id) is not None \
+                and conversation_store.can_access(conversation_id, request.user):
+            request.session['conversation_id'] = conversation_id
             
-        return render(request, self.template_name, {
-            'conversation_history': request.session.get('conversation_history', []),
-            'messages': None
-        })
+        return render(request, self.template_name, history_page_context(
+            request.session.get('conversation_id'),
+            messages=None
+        ))
     
     def post(self, request):
         """Handle POST requests - process travel guidance"""
         user_message = request.POST.get('user_message', '')
         
-        # Build conversation context from session history
-        conversation_history = request.session.get('conversation_history', [])
-        messages = None
-        
-        if conversation_history:
-            # Convert session history to proper message format for LLM
-            messages = [{"role": "system", "content": SYSTEM_MESSAGE}]
-            
-            for conversation in conversation_history:
-                messages.append({"role": "user", "content": conversation['user_message']})
-                messages.append({"role": "assistant", "content": conversation['ai_response']})
-        
-        response, updated_messages = get_travel_guidance(user_message, messages)
-        
-        # Store conversation in session for persistence
-        if 'conversation_history' not in request.session:
-            request.session['conversation_history'] = []
-        
-        request.session['conversation_history'].append({
-            'user_message': user_message,
-            'ai_response': response
-        })
-        request.session.modified = True
+        try:
+            # A resubmitted form replays the stored answer without appending the pair again
+            (response, updated_messages), _ = run_idempotent(
+                request, 'travel-guidance-view', user_message, lambda: self._answer(request, user_message),
+                store=lambda result: bool(result[1]) and result[1][-1]['role'] == 'assistant'
+            )
+        except RateLimitExceeded as e:
+            return rate_limited_response(e)
+        except (IdempotencyConflict, IdempotencyInProgress) as e:
+            return idempotency_error_response(e)
+        # Render the markdown once at write time - the cached HTML is reused on every page load
+        response_html = render_markdown(response)
         
         # Handle HTMX requests with template partial
         if request.headers.get('HX-Request'):
@@ -56,12 +246,150 @@ class TravelGuidanceView(View):
                 'travel_app/partials/conversation_pair.html',
                 {
                     'user_message': user_message,
-                    'ai_response': response
+                    'ai_response_html': response_html
                 }
             )
             return HttpResponse(conversation_html)
         
+        return render(request, self.template_name, history_page_context(
+            request.session.get('conversation_id'),
+            messages=updated_messages
+        ))
+
+    def _answer(self, request, user_message):
+        admit(request)
+        # Build conversation context from the stored history
+        conversation_id = session_conversation_id(request.session)
+        messages = build_llm_messages(conversation_id)
+        with in_flight.slot():
+            response, updated_messages = get_travel_guidance(user_message, messages)
+
+        # Append the pair to the stored conversation - the session only keeps its ID
+        save_conversation_pair(conversation_id, user_message, response, user=request.user)
+        observe_session(request.session)
+        return response, updated_messages
+
+
+class ConversationHistoryView(View):
+    """
+    HTMX endpoint returning older conversation pairs as the user scrolls up.
+    """
+    template_name = 'travel_app/partials/conversation_history_page.html'
+
+    def get(self, request):
+        """Handle GET requests - render the page of pairs before the cursor"""
+        try:
+            before = int(request.GET.get('before', ''))
+        except ValueError:
+            return HttpResponse(status=400)
+
+        return render(request, self.template_name, paginate_history(
+            request.session.get('conversation_id'), before=before
+        ))
+
+
+class ConversationListView(View):
+    """
+    HTMX endpoint listing the logged-in user's conversations, most recent first.
+    Pages are selected by keyset cursor, and each page ends with a sentinel loading the next.
+    """
+    template_name = 'travel_app/partials/conversation_list.html'
+
+    def get(self, request):
+        """Handle GET requests - render the page of conversations after the cursor"""
+        before = request.GET.get('before') or None
+        try:
+            conversations, next_cursor = conversation_store.list_conversations(
+                request.user, before=before, limit=getattr(settings, 'CONVERSATION_LIST_PAGE_SIZE', 20)
+            )
+        except ValueError:
+            return HttpResponse(status=400)
+
         return render(request, self.template_name, {
-            'conversation_history': request.session.get('conversation_history', []),
-            'messages': updated_messages
+            'conversations': conversations,
+            'next_cursor': next_cursor,
+            'is_first_page': before is None,
         })
+
+
+class TravelGuidanceStreamView(View):
+    """
+    Streaming variant of the HTMX conversation flow.
+    A POST returns the user bubble straight away together with an empty AI response
+    container that subscribes to the stream events endpoint. The AI response is then
+    streamed as it is generated and the finished pair is appended to the stored conversation.
+    """
+    partial_template_name = 'travel_app/partials/conversation_pair_stream.html'
+
+    def post(self, request):
+        """Handle POST requests - register the pending message and render the user bubble"""
+        user_message = request.POST.get('user_message', '')
+        try:
+            # A resubmitted form gets the same stream back instead of registering a second one
+            conversation_html, _ = run_idempotent(
+                request, 'travel-guidance-stream', user_message, lambda: self._register(request, user_message)
+            )
+        except RateLimitExceeded as e:
+            return rate_limited_response(e)
+        except (IdempotencyConflict, IdempotencyInProgress) as e:
+            return idempotency_error_response(e)
+        return HttpResponse(conversation_html)
+
+    def _register(self, request, user_message):
+        admit(request)
+        stream_id = park_stream(request.session, session_conversation_id(request.session), user_message)
+
+        return render_to_string(self.partial_template_name, {
+            'user_message': user_message,
+            'stream_url': reverse('travel-guidance-stream-events', args=[stream_id]),
+        })
+
+
+class TravelGuidanceStreamEventsView(View):
+    """
+    Server-Sent Events endpoint streaming the AI response for a pending message.
+    The view is async so that under ASGI each event is sent as soon as the LLM produces it;
+    a synchronous iterator would be consumed in full before the first byte went out.
+    """
+
+    async def get(self, request, stream_id):
+        """Handle GET requests - stream the AI response as SSE"""
+        pending = await apending_stream(request.session, stream_id)
+        if pending is None:
+            raise Http404("Unknown or expired stream")
+
+        response = StreamingHttpResponse(
+            self._event_stream(request, stream_id, pending),
+            content_type='text/event-stream'
+        )
+        # Disable caching and proxy buffering so events are flushed as they are produced
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def _event_stream(self, request, stream_id, pending):
+        try:
+            # The slot is taken inside the body, so it is released even if the client goes away
+            async with in_flight.aslot():
+                async for frame in self._llm_events(request, stream_id, pending):
+                    yield frame
+        except RateLimitExceeded as e:
+            # Headers are already sent, so report the rejection as an error event instead of a 429
+            yield format_sse_event('error', {'html': e.detail})
+
+    async def _llm_events(self, request, stream_id, pending):
+        conversation_id, user_message = pending['conversation_id'], pending['user_message']
+        messages = await abuild_llm_messages(conversation_id)
+
+        async for event in astream_travel_guidance(user_message, messages):
+            if event['type'] == 'delta':
+                yield format_sse_event('delta', {'text': event['text']})
+                continue
+
+            # Final event - render markdown once and persist the finished pair
+            response = event['response']
+            await asave_conversation_pair(conversation_id, user_message, response, user=await request.auser())
+            await adiscard_stream(stream_id)
+            await aobserve_session(request.session)
+
+            yield format_sse_event(event['type'], {'html': str(render_markdown(response))})
@@ -0,0 +1,83 @@
+"""
+Gunicorn configuration for the production ASGI profile.
+
+    gunicorn -c python:travel_copilot.gunicorn_conf travel_copilot.asgi:application
+
+The app is preloaded and warmed up once in the master (imports, URLconf, templates, markdown)
+so forked workers start hot and share those pages copy-on-write. Each worker drops the
+connections and clients it inherited, pre-connects to the LLM API itself and, with
+`JOB_WORKERS_IN_PROCESS`, starts background job worker threads.
+"""
+import os
+import shutil
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+bind = os.environ.get("GUNICORN_BIND", ":8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "uvicorn.workers.UvicornWorker")
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+preload_app = _env_bool("GUNICORN_PRELOAD", True)
+
+
+def on_starting(server):
+    """Start with an empty Prometheus multiprocess directory - stale files would skew the metrics."""
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def when_ready(server):
+    """Warm up the preloaded app in the master before any worker is forked."""
+    if server.cfg.preload_app:
+        from core.startup import format_timings, warm_up
+
+        # No connections before forking - they would be shared by every worker
+        server.log.info("Warm-up in master: %s", format_timings(warm_up(connect=False)))
+
+
+def post_fork(server, worker):
+    """Drop database connections and LLM clients inherited from the master."""
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        from core.client import reset_clients
+
+        for connection in connections.all(initialized_only=True):
+            connection.close()
+        reset_clients()
+
+
+def post_worker_init(worker):
+    """
+    Warm up the worker - only the pre-connect is left when the master already warmed up -
+    and start its background job threads.
+    """
+    from django.conf import settings
+
+    from core.jobs import job_pool
+    from core.startup import format_timings, preconnect, warm_up
+
+    report = preconnect() if worker.cfg.preload_app else warm_up()
+    worker.log.info("Warm-up in worker %s: %s", worker.pid, format_timings(report))
+    if settings.JOB_WORKERS_IN_PROCESS:
+        job_pool.start(settings.JOB_WORKERS_IN_PROCESS)
+
+
+def worker_exit(server, worker):
+    """Let background jobs in progress finish - unfinished ones are requeued once stale."""
+    from core.jobs import job_pool
+
+    job_pool.stop(timeout=worker.cfg.graceful_timeout)
+
+
+def child_exit(server, worker):
+    """Remove a dead worker's live gauges (e.g. in-flight requests) from the aggregated metrics."""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
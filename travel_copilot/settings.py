@@ -20,10 +20,6 @@ env_path = BASE_DIR / '.env'
 if env_path.exists() and not os.getenv('DOCKER_CONTAINER'):
     load_dotenv(dotenv_path=env_path)
 
-# Set default API key for build/migration scenarios
-if not os.getenv('COHERE_API_KEY'):
-    os.environ['COHERE_API_KEY'] = 'build-dummy-key-for-migrations'
-
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -72,9 +68,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.staticfiles.AsyncWhiteNoiseMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -88,8 +85,14 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR /'travel_app/templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process (and pre-compiled by core.startup)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -109,6 +112,211 @@ WSGI_APPLICATION = 'travel_copilot.wsgi.application'
 DATABASES = {
     "default": env.dj_db_url("DATABASE_URL", default="sqlite:///db.sqlite3"),
 }
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Concurrent workers write sessions and conversations through the database cache -
+    # take the write lock up front so writers wait for each other instead of failing
+    DATABASES["default"].setdefault("OPTIONS", {}).setdefault("transaction_mode", "IMMEDIATE")
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# The LLM response cache has its own alias so its backend, size and TTL can be tuned
+# independently (e.g. LLM_CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "llm_responses": {
+        "BACKEND": env.str("LLM_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("LLM_CACHE_LOCATION", default="llm-responses"),
+        "TIMEOUT": env.int("LLM_CACHE_TTL", default=3600),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("LLM_CACHE_MAX_ENTRIES", default=1000),
+        },
+    },
+    # Conversation history when CONVERSATION_STORE is the cache store - use a shared backend
+    # (e.g. DatabaseCache) when running more than one worker process
+    "conversations": {
+        "BACKEND": env.str("CONVERSATION_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("CONVERSATION_CACHE_LOCATION", default="conversations"),
+        "TIMEOUT": env.int("CONVERSATION_TTL", default=86400),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("CONVERSATION_MAX_ENTRIES", default=10000),
+        },
+    },
+    # HTML rendered from AI responses, keyed by a hash of the markdown source - share this
+    # backend between worker processes in production, or each worker renders every answer again
+    "rendered_markdown": {
+        "BACKEND": env.str("MARKDOWN_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("MARKDOWN_CACHE_LOCATION", default="rendered-markdown"),
+        "TIMEOUT": env.int("MARKDOWN_CACHE_TTL", default=604800),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("MARKDOWN_CACHE_MAX_ENTRIES", default=5000),
+        },
+    },
+    # Sessions only hold small pointers (e.g. the conversation ID) - share this backend
+    # between worker processes in production like the conversation store
+    "sessions": {
+        "BACKEND": env.str("SESSION_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("SESSION_CACHE_LOCATION", default="sessions"),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("SESSION_CACHE_MAX_ENTRIES", default=100000),
+        },
+    },
+    # Per-client rate limit buckets - must be shared by all worker processes in production
+    "rate_limits": {
+        "BACKEND": env.str("RATE_LIMIT_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("RATE_LIMIT_CACHE_LOCATION", default="rate_limits"),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("RATE_LIMIT_MAX_ENTRIES", default=100000),
+        },
+    },
+    # Results and in-progress locks for Idempotency-Key retries - must be shared by all
+    # worker processes in production, or a retry landing on another worker runs again
+    "idempotency": {
+        "BACKEND": env.str("IDEMPOTENCY_CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": env.str("IDEMPOTENCY_CACHE_LOCATION", default="idempotency"),
+        "OPTIONS": {
+            "MAX_ENTRIES": env.int("IDEMPOTENCY_MAX_ENTRIES", default=100000),
+        },
+    },
+}
+
+# Exact-match LLM response cache (see core.cache)
+LLM_RESPONSE_CACHE_ENABLED = env.bool("LLM_RESPONSE_CACHE_ENABLED", default=True)
+
+# Semantic (near-duplicate) cache for first-turn questions (see core.semantic_cache)
+LLM_SEMANTIC_CACHE_ENABLED = env.bool("LLM_SEMANTIC_CACHE_ENABLED", default=False)
+LLM_SEMANTIC_CACHE_THRESHOLD = env.float("LLM_SEMANTIC_CACHE_THRESHOLD", default=0.9)
+LLM_SEMANTIC_CACHE_MAX_ENTRIES = env.int("LLM_SEMANTIC_CACHE_MAX_ENTRIES", default=10000)
+LLM_SEMANTIC_CACHE_EMBEDDER = env.str("LLM_SEMANTIC_CACHE_EMBEDDER", default="core.semantic_cache.HashingEmbedder")
+LLM_SEMANTIC_CACHE_PATH = env.str("LLM_SEMANTIC_CACHE_PATH", default=None)
+LLM_SEMANTIC_CACHE_PERSIST_EVERY = env.int("LLM_SEMANTIC_CACHE_PERSIST_EVERY", default=20)
+
+# Local pre-filter for out-of-domain first-turn questions (see core.domain_filter): "off",
+# "shadow" (score and compare with the LLM's answer only) or "enforce" (refuse without an LLM call)
+# Keep "shadow" until `python -m benchmarks.domain_filter` shows no false refusals on held-out questions
+DOMAIN_FILTER_MODE = env.str("DOMAIN_FILTER_MODE", default="shadow")
+DOMAIN_FILTER_THRESHOLD = env.float("DOMAIN_FILTER_THRESHOLD", default=0.98)
+
+
+# Coalesce concurrent identical LLM requests into one upstream call (see core.coalesce)
+LLM_COALESCE_ENABLED = env.bool("LLM_COALESCE_ENABLED", default=True)
+
+# Token budget for the history sent to the LLM - older turns are folded into a rolling summary
+# (see core.context_window)
+LLM_CONTEXT_WINDOW_ENABLED = env.bool("LLM_CONTEXT_WINDOW_ENABLED", default=True)
+LLM_CONTEXT_MAX_TOKENS = env.int("LLM_CONTEXT_MAX_TOKENS", default=6000)
+LLM_CONTEXT_SUMMARY_MAX_TOKENS = env.int("LLM_CONTEXT_SUMMARY_MAX_TOKENS", default=400)
+LLM_CONTEXT_SUMMARIZER = env.str("LLM_CONTEXT_SUMMARIZER", default="core.context_window.extractive_summary")
+
+
+# Cohere HTTP client (see core.client) - built lazily with a keep-alive connection pool
+LLM_API_BASE_URL = env.str("LLM_API_BASE_URL", default=None)
+LLM_HTTP_TIMEOUT = env.float("LLM_HTTP_TIMEOUT", default=60.0)
+LLM_HTTP_CONNECT_TIMEOUT = env.float("LLM_HTTP_CONNECT_TIMEOUT", default=5.0)
+LLM_HTTP_MAX_CONNECTIONS = env.int("LLM_HTTP_MAX_CONNECTIONS", default=100)
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = env.int("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", default=20)
+LLM_HTTP_KEEPALIVE_EXPIRY = env.float("LLM_HTTP_KEEPALIVE_EXPIRY", default=30.0)
+
+# LLM backends by name (see core.backends) - BACKEND is a dotted class path, MODEL and OPTIONS
+# are passed to it. The router sends short first-turn questions to the fast backend when enabled
+# and falls back to the other backend when one is slow or failing.
+LLM_BACKENDS = {
+    "command-a": {"BACKEND": "core.llm_service.CohereBackend", "MODEL": "command-a-03-2025"},
+    "command-r7b": {"BACKEND": "core.llm_service.CohereBackend", "MODEL": "command-r7b-12-2024"},
+    "local": {"BACKEND": "core.backends.LocalBackend", "OPTIONS": {"LATENCY": env.float("LLM_LOCAL_LATENCY", default=0.0)}},
+}
+LLM_DEFAULT_BACKEND = env.str("LLM_DEFAULT_BACKEND", default="command-a")
+LLM_ROUTER_ENABLED = env.bool("LLM_ROUTER_ENABLED", default=False)
+LLM_ROUTER_FAST_BACKEND = env.str("LLM_ROUTER_FAST_BACKEND", default="command-r7b")
+LLM_ROUTER_FAST_MAX_TOKENS = env.int("LLM_ROUTER_FAST_MAX_TOKENS", default=48)
+LLM_ROUTER_EWMA_ALPHA = env.float("LLM_ROUTER_EWMA_ALPHA", default=0.2)
+LLM_ROUTER_DEGRADED_LATENCY = env.float("LLM_ROUTER_DEGRADED_LATENCY", default=15.0)
+LLM_ROUTER_DEGRADED_FAILURES = env.int("LLM_ROUTER_DEGRADED_FAILURES", default=3)
+# Seconds a degraded backend is only used as a fallback before one request probes it again
+LLM_ROUTER_PROBE_INTERVAL = env.float("LLM_ROUTER_PROBE_INTERVAL", default=30.0)
+
+# Resilience policy for the chat call (see core.resilience): per-attempt deadline, retries with
+# jittered exponential backoff, circuit breaker and optional p95-delayed hedged requests
+LLM_ATTEMPT_TIMEOUT = env.float("LLM_ATTEMPT_TIMEOUT", default=30.0)
+LLM_RETRY_ATTEMPTS = env.int("LLM_RETRY_ATTEMPTS", default=3)
+LLM_RETRY_BASE_DELAY = env.float("LLM_RETRY_BASE_DELAY", default=0.5)
+LLM_RETRY_MAX_DELAY = env.float("LLM_RETRY_MAX_DELAY", default=8.0)
+LLM_CIRCUIT_FAILURE_THRESHOLD = env.int("LLM_CIRCUIT_FAILURE_THRESHOLD", default=5)
+LLM_CIRCUIT_RESET_TIMEOUT = env.float("LLM_CIRCUIT_RESET_TIMEOUT", default=30.0)
+LLM_HEDGE_ENABLED = env.bool("LLM_HEDGE_ENABLED", default=False)
+LLM_HEDGE_MIN_DELAY = env.float("LLM_HEDGE_MIN_DELAY", default=0.5)
+LLM_HEDGE_MIN_SAMPLES = env.int("LLM_HEDGE_MIN_SAMPLES", default=20)
+
+# Admission control for the LLM endpoints (see core.admission): per-client token buckets
+# (rate in NINJA_DEFAULT_THROTTLE_RATES format) and a per-process cap on in-flight LLM calls
+LLM_RATE_LIMIT_ENABLED = env.bool("LLM_RATE_LIMIT_ENABLED", default=True)
+LLM_RATE_LIMIT = env.str("LLM_RATE_LIMIT", default="30/m")
+LLM_RATE_LIMIT_BURST = env.int("LLM_RATE_LIMIT_BURST", default=10)
+# X-API-Key values that get their own bucket - any other key is ignored and the caller is
+# identified by session or IP, so random keys cannot be used to dodge the limit
+LLM_RATE_LIMIT_API_KEYS = env.list("LLM_RATE_LIMIT_API_KEYS", default=[])
+LLM_MAX_IN_FLIGHT = env.int("LLM_MAX_IN_FLIGHT", default=32)
+LLM_ADMISSION_QUEUE_TIMEOUT = env.float("LLM_ADMISSION_QUEUE_TIMEOUT", default=2.0)
+LLM_ADMISSION_RETRY_AFTER = env.int("LLM_ADMISSION_RETRY_AFTER", default=1)
+
+# Batch travel guidance endpoint limits
+LLM_BATCH_MAX_ITEMS = env.int("LLM_BATCH_MAX_ITEMS", default=100)
+LLM_BATCH_MAX_CONCURRENCY = env.int("LLM_BATCH_MAX_CONCURRENCY", default=8)
+
+# Number of conversation pairs rendered per page in the web UI - older pairs load on scroll
+CONVERSATION_PAGE_SIZE = env.int("CONVERSATION_PAGE_SIZE", default=10)
+
+# Stored conversation turns are zlib-compressed JSON (see core.conversation_store)
+CONVERSATION_COMPRESSION_LEVEL = env.int("CONVERSATION_COMPRESSION_LEVEL", default=6)
+
+# Conversations persist in the database, owned by the logged-in user and listable; set
+# core.conversation_store.ConversationStore to keep them in the "conversations" cache instead
+CONVERSATION_STORE = env.str("CONVERSATION_STORE", default="core.conversation_store.DatabaseConversationStore")
+# Number of conversations per page of a user's conversation list
+CONVERSATION_LIST_PAGE_SIZE = env.int("CONVERSATION_LIST_PAGE_SIZE", default=20)
+
+# Web UI state kept in the sessions cache beside (not inside) the session: how long a session's
+# first conversation ID claim and a message waiting for its event stream are kept
+SESSION_CONVERSATION_CLAIM_TTL = env.int("SESSION_CONVERSATION_CLAIM_TTL", default=300)
+PENDING_STREAM_TTL = env.int("PENDING_STREAM_TTL", default=300)
+
+# Background jobs (see core.jobs): worker threads for `manage.py run_job_workers`, and per
+# web worker process when JOB_WORKERS_IN_PROCESS > 0 (started by the gunicorn config)
+JOB_WORKERS = env.int("JOB_WORKERS", default=4)
+JOB_WORKERS_IN_PROCESS = env.int("JOB_WORKERS_IN_PROCESS", default=0)
+JOB_POLL_INTERVAL = env.float("JOB_POLL_INTERVAL", default=1.0)
+JOB_STALE_AFTER = env.int("JOB_STALE_AFTER", default=600)
+JOB_MAX_ATTEMPTS = env.int("JOB_MAX_ATTEMPTS", default=2)
+JOB_RESULT_TTL = env.int("JOB_RESULT_TTL", default=86400)
+JOB_WEBHOOK_TIMEOUT = env.float("JOB_WEBHOOK_TIMEOUT", default=10.0)
+JOB_WEBHOOK_ATTEMPTS = env.int("JOB_WEBHOOK_ATTEMPTS", default=3)
+JOB_WEBHOOK_RETRY_DELAY = env.float("JOB_WEBHOOK_RETRY_DELAY", default=1.0)
+JOB_WEBHOOK_SECRET = env.str("JOB_WEBHOOK_SECRET", default=None)
+# Webhook hosts that may resolve to private addresses (e.g. an internal receiver) - any other
+# host must resolve to public addresses only
+JOB_WEBHOOK_ALLOWED_HOSTS = env.list("JOB_WEBHOOK_ALLOWED_HOSTS", default=[])
+
+# Idempotency keys (see core.idempotency): how long results are replayed, how long a running
+# request holds its key, and how long a concurrent duplicate waits for it before a 409
+IDEMPOTENCY_WINDOW = env.int("IDEMPOTENCY_WINDOW", default=86400)
+IDEMPOTENCY_LOCK_TIMEOUT = env.int("IDEMPOTENCY_LOCK_TIMEOUT", default=300)
+IDEMPOTENCY_WAIT_TIMEOUT = env.float("IDEMPOTENCY_WAIT_TIMEOUT", default=120.0)
+IDEMPOTENCY_POLL_INTERVAL = env.float("IDEMPOTENCY_POLL_INTERVAL", default=0.1)
+IDEMPOTENCY_RETRY_AFTER = env.int("IDEMPOTENCY_RETRY_AFTER", default=1)
+
+# Startup warm-up (see core.startup): pre-import, pre-compile templates and pre-connect to
+# the LLM API before the first request
+STARTUP_WARM_UP = env.bool("STARTUP_WARM_UP", default=True)
+STARTUP_PRECONNECT = env.bool("STARTUP_PRECONNECT", default=True)
+STARTUP_PRECONNECT_TIMEOUT = env.float("STARTUP_PRECONNECT_TIMEOUT", default=5.0)
+
+# Sessions are cache-backed - they only point at the stored conversation, so nothing
+# grows with conversation length or is rewritten to the database on every turn
+SESSION_ENGINE = env.str("SESSION_ENGINE", default="django.contrib.sessions.backends.cache")
+SESSION_CACHE_ALIAS = "sessions"
 
 
 # Password validation